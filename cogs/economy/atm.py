@@ -9,9 +9,11 @@ from typing import Optional
 
 from utils.database import (
     get_wallet, supabase, get_config,
-    save_panel_id, get_panel_id, get_embed_from_db, update_wallet
+    get_embed_from_db, update_wallet
 )
 from utils.helpers import format_embed_from_db
+from utils.sticky_panel import sticky_panels
+from utils.user_locks import user_locks, BUSY_MESSAGE
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +28,12 @@ class TransferAmountModal(ui.Modal, title="송금 금액 입력"):
         self.currency_icon = get_config("CURRENCY_ICON", "🪙")
 
     async def on_submit(self, interaction: discord.Interaction):
+        if user_locks.is_busy(self.sender.id):
+            return await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True, delete_after=3)
+        async with user_locks.hold(self.sender.id):
+            await self._transfer(interaction)
+
+    async def _transfer(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True, thinking=True)
         try:
             amount_to_send = int(self.amount.value)
@@ -113,31 +121,13 @@ class Atm(commands.Cog):
 
     async def regenerate_panel(self, channel: discord.TextChannel, panel_key: str = "panel_atm", last_transfer_log: Optional[discord.Embed] = None):
         embed_key = "panel_atm"
-        
-        if panel_info := get_panel_id(panel_key):
-            old_message_id = panel_info.get('message_id')
-            old_channel_id = panel_info.get('channel_id')
-            
-            if old_message_id and old_channel_id and (old_channel := self.bot.get_channel(old_channel_id)):
-                try:
-                    message_to_delete = await old_channel.fetch_message(old_message_id)
-                    await message_to_delete.delete()
-                except (discord.NotFound, discord.Forbidden):
-                    logger.warning(f"이전 ATM 패널(ID: {old_message_id})을 원래 위치인 채널 #{old_channel.name}에서도 찾을 수 없었습니다.")
-        
-        if last_transfer_log:
-            try: await channel.send(embed=last_transfer_log)
-            except Exception as e: logger.error(f"ATM 송금 로그 메시지 전송 실패: {e}")
 
-        if not (embed_data := await get_embed_from_db(embed_key)):
-            return
+        async def build_panel():
+            if not (embed_data := await get_embed_from_db(embed_key)):
+                return None
+            return discord.Embed.from_dict(embed_data), AtmPanelView(self)
 
-        embed = discord.Embed.from_dict(embed_data)
-        view = AtmPanelView(self)
-        
-        new_message = await channel.send(embed=embed, view=view)
-        await save_panel_id(panel_key, new_message.id, channel.id)
-        logger.info(f"✅ {panel_key} 패널을 성공적으로 생성했습니다. (채널: #{channel.name})")
+        await sticky_panels.request(channel, panel_key, build_panel, log_embed=last_transfer_log, force=last_transfer_log is None)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Atm(bot))
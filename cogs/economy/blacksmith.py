@@ -7,14 +7,17 @@ import logging
 import asyncio
 from typing import Optional, Dict
 from datetime import datetime, timezone, timedelta
+from collections import defaultdict
 
 from utils.database import (
-    get_inventory, update_inventory, get_user_gear, set_user_gear,
+    get_inventory, update_inventory, update_inventory_many, get_user_gear, set_user_gear,
     get_wallet, update_wallet, supabase, get_config,
     save_panel_id, get_panel_id, get_embed_from_db,
     get_id
 )
 from utils.helpers import format_embed_from_db
+from utils.game_events import publish_activity
+from utils.user_locks import user_locks, BUSY_MESSAGE
 
 logger = logging.getLogger(__name__)
 
@@ -360,16 +363,34 @@ class Blacksmith(commands.Cog):
         if view.value is not True:
             return await interaction.edit_original_response(content="업그레이드가 취소되었습니다.", view=None)
 
+        # 확인을 기다리는 동안은 Lock을 잡지 않고, 재확인부터 차감/등록까지만 직렬화합니다.
+        if user_locks.is_busy(user_id):
+            return await interaction.edit_original_response(content=BUSY_MESSAGE, view=None)
+        async with user_locks.hold(user_id):
+            await self._commit_upgrade(interaction, target_tool, recipe, gear_key)
+
+    async def _commit_upgrade(self, interaction: discord.Interaction, target_tool: str, recipe: Dict, gear_key: str):
+        user_id = interaction.user.id
+        # 확인 창이 떠 있는 동안 다른 업그레이드를 시작했거나 장비/코인이 바뀌었을 수 있으므로 다시 확인합니다.
+        upgrade_status, gear, wallet = await asyncio.gather(self.get_user_upgrade_status(user_id), get_user_gear(interaction.user), get_wallet(user_id))
+        if upgrade_status:
+            return await interaction.edit_original_response(content="❌ 이미 다른 도구를 업그레이드하는 중입니다.", view=None)
+        if gear.get(gear_key) != recipe['requires_tool']:
+            return await interaction.edit_original_response(content=f"❌ 이 업그레이드를 하려면 먼저 **{recipe['requires_tool']}**(을)를 장착해야 합니다.", view=None)
+        if wallet.get('balance', 0) < recipe['requires_coins']:
+            return await interaction.edit_original_response(content="❌ 코인이 부족합니다.", view=None)
+
         try:
-            tasks = [
+            # 도구와 재료는 한 번에 차감하며, 하나라도 부족하면 아무것도 차감되지 않습니다.
+            material_deltas = defaultdict(int, {recipe['requires_tool']: -1})
+            for item, qty in recipe['requires_items'].items(): material_deltas[item] -= qty
+            if not await update_inventory_many(user_id, material_deltas):
+                return await interaction.edit_original_response(content="❌ 재료가 부족하여 업그레이드를 시작할 수 없습니다.", view=None)
+
+            await asyncio.gather(
                 update_wallet(interaction.user, -recipe['requires_coins']),
-                set_user_gear(user_id, **{gear_key: "맨손"}),
-                update_inventory(user_id, recipe['requires_tool'], -1)
-            ]
-            for item, qty in recipe['requires_items'].items():
-                tasks.append(update_inventory(user_id, item, -qty))
-            
-            await asyncio.gather(*tasks)
+                set_user_gear(user_id, **{gear_key: "맨손"})
+            )
 
             completion_time = datetime.now(timezone.utc) + timedelta(hours=24)
             await supabase.table('blacksmith_upgrades').insert({
@@ -377,6 +398,7 @@ class Blacksmith(commands.Cog):
                 "target_tool_name": target_tool,
                 "completion_timestamp": completion_time.isoformat()
             }).execute()
+            publish_activity(user_id, "blacksmith_upgrade")
             
             await interaction.edit_original_response(content="✅ 업그레이드를 시작했습니다! 24시간 후에 완료됩니다.", view=None)
             
@@ -13,14 +13,18 @@ from utils.helpers import coerce_item_emoji
 logger = logging.getLogger(__name__)
 
 from utils.database import (
-    get_inventory, get_wallet, supabase, get_id, get_item_database,
+    get_inventory, get_wallet, get_id, get_item_database,
+    get_buyable_items, get_item_names_in_category,
     get_config,
-    get_aquarium, get_fishing_loot, sell_fish_from_db,
-    save_panel_id, get_panel_id, get_embed_from_db,
+    get_aquarium_page, get_aquarium_summary, sell_fishes_by_filter,
+    get_fishing_loot_by_name, get_fish_sell_price, sell_fish_from_db,
+    save_panel_id, get_panel_id, get_embed_from_db, db_deadline,
     update_inventory, update_wallet, get_farm_data, expand_farm_db,
     save_config_to_db, log_activity
 )
 from utils.helpers import format_embed_from_db
+from utils.game_events import publish_activity
+from utils.user_locks import user_locks, BUSY_MESSAGE
 
 async def delete_after(message: discord.WebhookMessage, delay: int):
     await asyncio.sleep(delay)
@@ -85,17 +89,10 @@ class BuyItemView(ShopViewBase):
         self.items_per_page = 20
 
     async def _filter_items_for_user(self):
-        item_db = get_item_database()
-        
         target_categories = [self.category]
         if self.category == "아이템":
             target_categories.append("입장권")
-            
-        all_items_in_category = sorted(
-            [(n, d) for n, d in item_db.items() if d.get('buyable') and d.get('category', '').strip() in target_categories],
-            key=lambda item: int(item[1].get('price') or 0) # [수정] 가격 정렬 시 None 안전 처리
-        )
-        self.items_in_category = all_items_in_category
+        self.items_in_category = get_buyable_items(*target_categories)
 
     async def build_embed(self) -> discord.Embed:
         wallet = await get_wallet(self.user.id)
@@ -211,7 +208,11 @@ class BuyItemView(ShopViewBase):
         item_data = get_item_database().get(item_name)
         if not item_data: return
         try:
-            inventory = await get_inventory(self.user); wallet = await get_wallet(self.user.id)
+            # 아직 응답 전이므로 조회가 인터랙션 응답 시간(3초)을 넘기지 않도록 제한합니다.
+            with db_deadline(interaction):
+                inventory, wallet = await asyncio.gather(get_inventory(self.user), get_wallet(self.user.id))
+            if inventory is None or wallet is None:
+                return await interaction.response.send_message("❌ 정보를 불러오지 못했습니다. 잠시 후 다시 시도해주세요.", ephemeral=True, delete_after=5)
             price = item_data.get('current_price', item_data.get('price', 0))
             if wallet.get('balance', 0) < price:
                 return await interaction.response.send_message("❌ 코인이 부족하여 아이템을 구매할 수 없습니다.", ephemeral=True, delete_after=5)
@@ -231,16 +232,27 @@ class BuyItemView(ShopViewBase):
         modal = QuantityModal(f"{item_name} 구매", max_buyable); await interaction.response.send_modal(modal); await modal.wait()
         if modal.value is None: return
         quantity, total_price = modal.value, price * modal.value
-        current_wallet = await get_wallet(self.user.id)
-        if current_wallet.get('balance', 0) < total_price:
-            return await interaction.followup.send("❌ 코인이 부족하여 아이템을 구매할 수 없습니다.", ephemeral=True)
-        await update_inventory(str(self.user.id), item_name, quantity); await update_wallet(self.user, -total_price)
+        # 수량 입력을 기다리는 동안은 Lock을 잡지 않고, 잔액 확인부터 차감까지만 직렬화합니다.
+        if user_locks.is_busy(self.user.id):
+            return await interaction.followup.send(BUSY_MESSAGE, ephemeral=True)
+        async with user_locks.hold(self.user.id):
+            current_wallet = await get_wallet(self.user.id)
+            if current_wallet.get('balance', 0) < total_price:
+                return await interaction.followup.send("❌ 코인이 부족하여 아이템을 구매할 수 없습니다.", ephemeral=True)
+            await update_inventory(str(self.user.id), item_name, quantity); await update_wallet(self.user, -total_price)
+        publish_activity(self.user.id, "item_purchase", item_name=item_name)
         if item_name == "가마솥": await save_config_to_db(f"kitchen_ui_update_request_{self.user.id}", time.time())
         new_wallet = await get_wallet(self.user.id)
         success_message = f"✅ **{item_name}** {quantity}개를 `{total_price:,}`{self.currency_icon}에 구매했습니다.\n(잔액: `{new_wallet.get('balance', 0):,}`{self.currency_icon})"
         msg = await interaction.followup.send(success_message, ephemeral=True); asyncio.create_task(delete_after(msg, 10)); await self.update_view(interaction)
 
     async def handle_single_purchase(self, interaction: discord.Interaction, item_name: str, item_data: Dict, price: int, wallet: Dict):
+        if user_locks.is_busy(self.user.id):
+            return await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True, delete_after=3)
+        async with user_locks.hold(self.user.id):
+            await self._single_purchase(interaction, item_name, item_data, price)
+
+    async def _single_purchase(self, interaction: discord.Interaction, item_name: str, item_data: Dict, price: int):
         # ▼▼▼ [수정] 역할 카테고리는 즉시 지급 처리 ▼▼▼
         if item_data.get('category') == '역할':
             await interaction.response.defer(ephemeral=True)
@@ -258,6 +270,8 @@ class BuyItemView(ShopViewBase):
             
             if role in self.user.roles:
                 return await interaction.followup.send(f"ℹ️ 이미 **{role.name}** 역할을 가지고 있습니다.", ephemeral=True)
+            if (await get_wallet(self.user.id)).get('balance', 0) < price:
+                return await interaction.followup.send("❌ 코인이 부족하여 아이템을 구매할 수 없습니다.", ephemeral=True)
 
             # 돈 차감 및 역할 지급 (인벤토리 추가 X)
             try:
@@ -279,8 +293,12 @@ class BuyItemView(ShopViewBase):
                 return await interaction.followup.send("❌ 구매 처리 중 오류가 발생했습니다.", ephemeral=True)
         # ▲▲▲ [수정 완료] ▲▲▲
         await interaction.response.defer(ephemeral=True)
+        # 선택 시점의 잔액은 Lock 밖에서 읽은 값이므로, Lock 안에서 다시 확인합니다.
+        if (await get_wallet(self.user.id)).get('balance', 0) < price:
+            return await interaction.followup.send("❌ 코인이 부족하여 아이템을 구매할 수 없습니다.", ephemeral=True)
         await update_inventory(str(self.user.id), item_name, 1)
         await update_wallet(self.user, -price)
+        publish_activity(self.user.id, "item_purchase", item_name=item_name)
         
         # (기타 기존 코드 유지...)
         if (id_key := item_data.get('id_key')) and (role_id := get_id(id_key)) and (role := interaction.guild.get_role(role_id)):
@@ -320,74 +338,133 @@ class BuyCategoryView(ShopViewBase):
         category = interaction.data['custom_id'].split('buy_category_')[-1]
         item_view = BuyItemView(self.user, category); item_view.message = self.message; await item_view.update_view(interaction)
 
+class FishFilterSellModal(ui.Modal, title="조건으로 일괄 판매"):
+    species = ui.TextInput(label="어종 (비워두면 전체)", placeholder="예: 붕어", required=False, max_length=50)
+    min_size = ui.TextInput(label="최소 크기 (cm)", placeholder="예: 10", required=False, max_length=8)
+    max_size = ui.TextInput(label="최대 크기 (cm)", placeholder="예: 50", required=False, max_length=8)
+    max_value = ui.TextInput(label="판매가 상한 (이 가격 이하만 판매)", placeholder="예: 500", required=False, max_length=10)
+
+    def __init__(self):
+        super().__init__()
+        self.filters: Optional[Dict[str, Any]] = None
+
+    async def on_submit(self, i: discord.Interaction):
+        try:
+            self.filters = {
+                'species': self.species.value.strip() or None,
+                'min_size': float(self.min_size.value) if self.min_size.value.strip() else None,
+                'max_size': float(self.max_size.value) if self.max_size.value.strip() else None,
+                'max_value': int(self.max_value.value) if self.max_value.value.strip() else None,
+            }
+            await i.response.defer(ephemeral=True)
+        except ValueError:
+            await i.response.send_message("크기와 가격에는 숫자만 입력해주세요.", ephemeral=True, delete_after=5)
+        self.stop()
+
 class SellFishView(ShopViewBase):
     def __init__(self, user: discord.Member):
         super().__init__(user)
         self.fish_data_map: Dict[str, Dict[str, Any]] = {}
-        self.all_fish = []
+        self.summary: Optional[List[Dict[str, Any]]] = None
+        self.pages: List[List[Dict[str, Any]]] = []
+        self.page_cursors: List[Optional[int]] = [None]
+        self.has_next_page = False
         self.page_index = 0
         self.items_per_page = 20
 
     async def refresh_view(self, interaction: discord.Interaction):
-        self.all_fish = []
+        self.summary = None
+        self.pages, self.page_cursors, self.has_next_page = [], [None], False
         self.page_index = 0
         await self.update_view(interaction)
 
+    @property
+    def total_fish(self) -> int:
+        return sum(int(row.get('fish_count', 0)) for row in self.summary or [])
+
     async def build_embed(self) -> discord.Embed:
-        balance = (await get_wallet(self.user.id)).get('balance', 0)
+        balance_task = get_wallet(self.user.id)
+        if self.summary is None:
+            wallet, self.summary = await asyncio.gather(balance_task, get_aquarium_summary(self.user.id))
+            self.summary = self.summary or []
+        else:
+            wallet = await balance_task
+        balance = wallet.get('balance', 0)
         embed = discord.Embed(title="🎣 판매함 - 물고기", description=f"현재 소지금: `{balance:,}`{self.currency_icon}\n판매할 물고기를 아래 메뉴에서 선택해주세요.", color=discord.Color.blue())
+        if self.summary:
+            loot_by_name = get_fishing_loot_by_name()
+            lines = [
+                f"{coerce_item_emoji(loot_by_name.get(row['name'], {}).get('emoji', '🐟'))} **{row['name']}** × {row['fish_count']} "
+                f"({row.get('min_size', 0)}~{row.get('max_size', 0)}cm)"
+                for row in sorted(self.summary, key=lambda r: -int(r.get('fish_count', 0)))[:15]
+            ]
+            if len(self.summary) > 15: lines.append(f"...외 {len(self.summary) - 15}종")
+            embed.add_field(name=f"🐠 어항 요약 (총 {self.total_fish}마리)", value="\n".join(lines), inline=False)
         embed.set_footer(text="매일 00:05(KST)에 시세 변동")
         return embed
 
+    def _price_page(self, fish_on_page: List[Dict[str, Any]]):
+        """새로 불러온 페이지의 물고기 판매가를 한 번만 계산해 둡니다."""
+        loot_by_name = get_fishing_loot_by_name()
+        for fish in fish_on_page:
+            self.fish_data_map[str(fish['id'])] = {
+                'price': get_fish_sell_price(fish['name'], fish['size']),
+                'name': fish['name'],
+                'emoji': coerce_item_emoji(loot_by_name.get(fish['name'], {}).get('emoji', '🐟'))
+            }
+
+    async def _load_page(self, page_index: int) -> List[Dict[str, Any]]:
+        """
+        id 기준 키셋 페이지네이션으로 현재 페이지만 불러옵니다.
+        한 번 불러온 페이지는 View에 보관하고, 다음 페이지 존재 여부는 1개를 더 조회해 판단합니다.
+        """
+        if page_index < len(self.pages):
+            self.has_next_page = page_index + 1 < len(self.page_cursors)
+            return self.pages[page_index]
+        rows = await get_aquarium_page(self.user.id, after_id=self.page_cursors[page_index], limit=self.items_per_page + 1) or []
+        fish_on_page, self.has_next_page = rows[:self.items_per_page], len(rows) > self.items_per_page
+        self.pages.append(fish_on_page)
+        if self.has_next_page: self.page_cursors.append(fish_on_page[-1]['id'])
+        self._price_page(fish_on_page)
+        return fish_on_page
+
     async def build_components(self):
         self.clear_items()
-        if not self.all_fish:
-            self.all_fish = await get_aquarium(str(self.user.id))
-        
-        loot_res = await supabase.table('fishing_loots').select('*').execute()
-        if not (loot_res and loot_res.data):
+        fish_on_page = await self._load_page(self.page_index)
+
+        if fish_on_page and not get_fishing_loot_by_name():
             self.add_item(ui.Button(label="오류: 가격 정보를 불러올 수 없습니다.", disabled=True))
             return
-        loot_db = {loot['name']: loot for loot in loot_res.data}
-
-        self.fish_data_map.clear()
-        start_index = self.page_index * self.items_per_page
-        end_index = start_index + self.items_per_page
-        fish_on_page = self.all_fish[start_index:end_index]
 
         options = []
-        if fish_on_page:
-            for fish in fish_on_page:
-                fish_id = str(fish['id'])
-                loot_info = loot_db.get(fish['name'], {})
-                base_value = loot_info.get('current_base_value')
-                if base_value is None: base_value = loot_info.get('base_value', 0)
-                size_bonus = fish['size'] * loot_info.get('size_multiplier', 0)
-                price = int(base_value + size_bonus)
-                
-                self.fish_data_map[fish_id] = {'price': price, 'name': fish['name']}
-                label = f"{fish['name']} ({fish['size']}cm)"
-                description = f"판매가: {price:,}{self.currency_icon}"
-                emoji = coerce_item_emoji(loot_info.get('emoji', '🐟'))
-                options.append(discord.SelectOption(label=label, value=fish_id, description=description, emoji=emoji))
-        
+        for fish in fish_on_page:
+            fish_id = str(fish['id'])
+            fish_info = self.fish_data_map[fish_id]
+            label = f"{fish['name']} ({fish['size']}cm)"
+            description = f"판매가: {fish_info['price']:,}{self.currency_icon}"
+            options.append(discord.SelectOption(label=label, value=fish_id, description=description, emoji=fish_info['emoji']))
+
         if options:
             select = ui.Select(placeholder=f"판매할 물고기 선택... ({len(fish_on_page)}마리)", options=options, min_values=1, max_values=len(options))
             select.callback = self.on_select
             self.add_item(select)
         else:
             self.add_item(ui.Button(label="판매할 물고기가 없습니다.", disabled=True))
-        
+
         sell_button = ui.Button(label="선택한 물고기 판매", style=discord.ButtonStyle.success, disabled=True, custom_id="sell_fish_confirm")
         sell_button.callback = self.sell_fish
         self.add_item(sell_button)
-        
-        total_pages = math.ceil(len(self.all_fish) / self.items_per_page)
-        if total_pages > 1:
+        bulk_button = ui.Button(label="조건으로 일괄 판매", style=discord.ButtonStyle.primary, emoji="🧺", disabled=not fish_on_page, custom_id="sell_fish_by_filter")
+        bulk_button.callback = self.sell_by_filter
+        self.add_item(bulk_button)
+
+        if self.page_index > 0 or self.has_next_page:
+            total_pages = max(1, math.ceil(self.total_fish / self.items_per_page))
             prev_button = ui.Button(label="◀ 이전", custom_id="prev_page", disabled=(self.page_index == 0), row=2)
             prev_button.callback = self.pagination_callback
             self.add_item(prev_button)
-            next_button = ui.Button(label="다음 ▶", custom_id="next_page", disabled=(self.page_index >= total_pages - 1), row=2)
+            self.add_item(ui.Button(label=f"{self.page_index + 1} / {max(total_pages, self.page_index + 1)}", disabled=True, row=2))
+            next_button = ui.Button(label="다음 ▶", custom_id="next_page", disabled=not self.has_next_page, row=2)
             next_button.callback = self.pagination_callback
             self.add_item(next_button)
 
@@ -407,6 +484,12 @@ class SellFishView(ShopViewBase):
         await interaction.response.edit_message(view=self)
 
     async def sell_fish(self, interaction: discord.Interaction):
+        if user_locks.is_busy(self.user.id):
+            return await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True, delete_after=3)
+        async with user_locks.hold(self.user.id):
+            await self._sell_fish(interaction)
+
+    async def _sell_fish(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         select_menu = next((c for c in self.children if isinstance(c, ui.Select)), None)
         if not select_menu or not select_menu.values:
@@ -428,6 +511,32 @@ class SellFishView(ShopViewBase):
         except Exception as e:
             await self.handle_error(interaction, e)
 
+    async def sell_by_filter(self, interaction: discord.Interaction):
+        modal = FishFilterSellModal()
+        await interaction.response.send_modal(modal)
+        await modal.wait()
+        if not modal.filters: return
+        if user_locks.is_busy(self.user.id):
+            return await interaction.followup.send(BUSY_MESSAGE, ephemeral=True)
+
+        try:
+            # 판매와 활동 기록은 RPC 한 번(한 트랜잭션)으로 처리됩니다.
+            async with user_locks.hold(self.user.id):
+                result = await sell_fishes_by_filter(self.user.id, **modal.filters)
+            if result is None:
+                return await self.handle_error(interaction, RuntimeError("sell_fishes_by_filter 실패"), "❌ 일괄 판매 중 오류가 발생했습니다.")
+            if not result['sold_count']:
+                msg = await interaction.followup.send("조건에 맞는 물고기가 없습니다.", ephemeral=True)
+                asyncio.create_task(delete_after(msg, 5))
+                return
+            new_balance = (await get_wallet(self.user.id)).get('balance', 0)
+            success_message = f"✅ 물고기 {result['sold_count']}마리를 `{result['total_value']:,}`{self.currency_icon}에 일괄 판매했습니다.\n(잔액: `{new_balance:,}`{self.currency_icon})"
+            msg = await interaction.followup.send(success_message, ephemeral=True)
+            asyncio.create_task(delete_after(msg, 10))
+            await self.refresh_view(interaction)
+        except Exception as e:
+            await self.handle_error(interaction, e)
+
     async def go_back(self, interaction: discord.Interaction):
         await interaction.response.defer()
         view = SellCategoryView(self.user)
@@ -462,9 +571,9 @@ class SellStackableView(ShopViewBase):
         
         if not self.all_items:
             inventory = await get_inventory(self.user)
-            item_db = get_item_database()
+            names_in_category = get_item_names_in_category(self.category)
             self.all_items = sorted(
-                [(name, qty) for name, qty in inventory.items() if item_db.get(name, {}).get('category', '').strip() == self.category],
+                [(name, qty) for name, qty in inventory.items() if name in names_in_category],
                 key=lambda x: x[0]
             )
         
@@ -533,9 +642,15 @@ class SellStackableView(ShopViewBase):
             
         quantity_to_sell = modal.value
         total_price = item_info['price'] * quantity_to_sell
+        if user_locks.is_busy(self.user.id):
+            return await interaction.followup.send(BUSY_MESSAGE, ephemeral=True)
         try:
-            await update_inventory(str(self.user.id), selected_item, -quantity_to_sell)
-            await update_wallet(self.user, total_price)
+            async with user_locks.hold(self.user.id):
+                # 수량 입력 중에 다른 판매/사용으로 재고가 줄었을 수 있으므로 Lock 안에서 다시 확인합니다.
+                if (await get_inventory(self.user) or {}).get(selected_item, 0) < quantity_to_sell:
+                    return await interaction.followup.send("❌ 판매할 아이템이 부족합니다.", ephemeral=True)
+                await update_inventory(str(self.user.id), selected_item, -quantity_to_sell)
+                await update_wallet(self.user, total_price)
             new_balance = (await get_wallet(self.user.id)).get('balance', 0)
             success_message = f"✅ **{selected_item}** {quantity_to_sell}개를 `{total_price:,}`{self.currency_icon}에 판매했습니다.\n(잔액: `{new_balance:,}`{self.currency_icon})"
             msg = await interaction.followup.send(success_message, ephemeral=True); asyncio.create_task(delete_after(msg, 10))
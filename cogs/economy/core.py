@@ -5,25 +5,30 @@ from discord.ext import commands, tasks
 import random
 import asyncio
 import logging
-import time
 from datetime import datetime, timezone, timedelta, time as dt_time
-from typing import Dict, Optional, List, Deque, Set
+from typing import Dict, Optional, Deque, Set
 from collections import deque, defaultdict
 
 from utils.database import (
     get_wallet, update_wallet, get_id, supabase, get_embed_from_db, get_config,
     save_config_to_db, get_all_user_stats, log_activity, get_cooldown, set_cooldown,
-    get_user_gear, load_all_data_from_db, ensure_user_gear_exists,
-    load_bot_configs_from_db, delete_config_from_db, get_item_database, get_fishing_loot,
-    get_user_pet, add_xp_to_pet_db, update_inventory 
+    get_user_gear, load_all_data_from_db, get_all_gear_user_ids, bulk_create_user_gear,
+    load_bot_configs_from_db, load_embed_templates_from_db, delete_config_from_db,
+    get_user_pet, add_xp_to_pet_db, update_inventory, get_db_pool_stats, get_db_retry_stats,
+    register_item_in_cache
 )
 from utils.helpers import format_embed_from_db
+from utils.sticky_panel import sticky_panels
+from utils.market_engine import run_daily_repricing
+from utils.user_locks import user_locks
+from utils.game_events import game_events, publish_activity, level_up_from_result, pet_level_up_from_result
 
 logger = logging.getLogger(__name__)
 
 KST = timezone(timedelta(hours=9))
 KST_MONTHLY_RESET = dt_time(hour=0, minute=2, tzinfo=KST)
 KST_MIDNIGHT_AGGREGATE = dt_time(hour=0, minute=5, tzinfo=KST)
+GEAR_RECONCILE_CHUNK_SIZE = 500
 
 class EconomyCore(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -47,7 +52,9 @@ class EconomyCore(commands.Cog):
         self.update_market_prices.start()
         self.monthly_whale_reset.start()
         self.unified_request_dispatcher.start()
+        self.db_pool_monitor.start()
         self.initial_setup_done = False
+        self.gear_reconcile_task: Optional[asyncio.Task] = None
         logger.info("EconomyCore Cog가 성공적으로 초기화되었습니다.")
 
     @commands.Cog.listener()
@@ -57,7 +64,9 @@ class EconomyCore(commands.Cog):
         logger.info("EconomyCore: 봇이 준비되었습니다. 데이터베이스 초기화를 시작합니다.")
         await load_all_data_from_db()
         logger.info("EconomyCore: 데이터베이스 설정 로딩 완료.")
-        await self._ensure_all_members_have_gear()
+        # 멤버 장비 정보 보정은 봇 응답을 막지 않도록 백그라운드에서 진행합니다.
+        if not self.gear_reconcile_task or self.gear_reconcile_task.done():
+            self.gear_reconcile_task = self.bot.loop.create_task(self._ensure_all_members_have_gear())
         self.initial_setup_done = True
 
     async def cog_load(self):
@@ -80,10 +89,16 @@ class EconomyCore(commands.Cog):
             logger.error(f"[초기화] DB의 SERVER_ID ('{server_id_str}')가 올바른 숫자가 아닙니다.")
             return
         logger.info(f"[초기화] 대상 서버: {guild.name} (ID: {guild.id})")
-        tasks = [ensure_user_gear_exists(member.id) for member in guild.members if not member.bot]
-        if tasks:
-            logger.info(f"[초기화] 총 {len(tasks)}명의 멤버 정보를 확인 및 생성합니다.")
-            await asyncio.gather(*tasks)
+        member_ids = {member.id for member in guild.members if not member.bot}
+        existing_ids = await get_all_gear_user_ids()
+        if existing_ids is None:
+            logger.error("[초기화] 기존 장비 정보를 조회하지 못해 멤버 확인을 건너뜁니다.")
+            return
+        missing_ids = sorted(member_ids - existing_ids)
+        if missing_ids:
+            logger.info(f"[초기화] 총 {len(member_ids)}명 중 {len(missing_ids)}명의 장비 정보를 생성합니다.")
+            for i in range(0, len(missing_ids), GEAR_RECONCILE_CHUNK_SIZE):
+                await bulk_create_user_gear(missing_ids[i:i + GEAR_RECONCILE_CHUNK_SIZE])
         logger.info("[초기화] 모든 멤버의 장비 정보 확인 작업이 완료되었습니다.")
 
     async def load_configs(self):
@@ -102,7 +117,9 @@ class EconomyCore(commands.Cog):
         self.update_market_prices.cancel()
         self.monthly_whale_reset.cancel()
         if self.log_sender_task: self.log_sender_task.cancel()
+        if self.gear_reconcile_task: self.gear_reconcile_task.cancel()
         self.unified_request_dispatcher.cancel()
+        self.db_pool_monitor.cancel()
 
     @tasks.loop(seconds=10.0)
     async def unified_request_dispatcher(self):
@@ -154,7 +171,8 @@ class EconomyCore(commands.Cog):
 
             if 'config_reload' in requests_by_prefix:
                 logger.info("[CONFIG] 설정 새로고침 요청 감지...")
-                await load_bot_configs_from_db()
+                await asyncio.gather(load_bot_configs_from_db(), load_embed_templates_from_db())
+                sticky_panels.invalidate()
                 for cog in self.bot.cogs.values():
                     if hasattr(cog, 'load_configs'):
                         await cog.load_configs()
@@ -323,6 +341,7 @@ class EconomyCore(commands.Cog):
                             "description": f"구매 후 사용하면 {role_name} 역할을 획득합니다."
                         }
                         await supabase.table('items').upsert(item_data, on_conflict="name").execute()
+                        register_item_in_cache(item_data)
                         
                         # 2. USABLE_ITEMS 설정 업데이트 (사용 가능하게)
                         usable_items = get_config("USABLE_ITEMS", {})
@@ -352,6 +371,42 @@ class EconomyCore(commands.Cog):
     async def before_unified_dispatcher(self):
         await self.bot.wait_until_ready()
 
+    @tasks.loop(minutes=5)
+    async def db_pool_monitor(self):
+        stats = get_db_pool_stats(reset_peak=True)
+        if not stats.get('total_requests'): return
+        log = logger.warning if stats['peak_in_flight'] >= stats['max_connections'] else logger.info
+        log(
+            f"[DB 풀] 최대 동시 요청 {stats['peak_in_flight']}/{stats['max_connections']}, "
+            f"대기 발생 {stats['saturated_requests']}회, 누적 요청 {stats['total_requests']}회 (오류 {stats['total_errors']}회), "
+            f"지연 평균 {stats['latency_avg_ms']:.0f}ms / p95 {stats['latency_p95_ms']:.0f}ms"
+        )
+        retry_stats = get_db_retry_stats()
+        if retry_stats.get('retries') or retry_stats.get('transient_failures') or retry_stats.get('permanent_failures'):
+            logger.info(
+                f"[DB 재시도] 호출 {retry_stats.get('calls', 0)}회, 재시도 {retry_stats.get('retries', 0)}회, "
+                f"일시적 실패 {retry_stats.get('transient_failures', 0)}회 (마감 초과 {retry_stats.get('deadline_exceeded', 0)}회), "
+                f"영구 실패 {retry_stats.get('permanent_failures', 0)}회, 차단 {retry_stats.get('short_circuited', 0)}회, "
+                f"서킷 열림 {retry_stats.get('circuit_opened', 0)}회"
+            )
+        lock_stats = user_locks.stats()
+        if lock_stats['contended'] or lock_stats['rejected'] or lock_stats['timeouts']:
+            logger.info(
+                f"[유저 Lock] 획득 {lock_stats['acquired']}회, 경합 {lock_stats['contended']}회, 중복 클릭 거절 {lock_stats['rejected']}회, "
+                f"시간 초과 {lock_stats['timeouts']}회, 현재 키 {lock_stats['active_keys']}개 (최대 {lock_stats['peak_keys']}개), "
+                f"최대 대기 {lock_stats['max_wait_ms']:.0f}ms / 최대 점유 {lock_stats['max_hold_ms']:.0f}ms"
+            )
+        for sub in game_events.stats():
+            if sub['dropped'] or sub['errors'] or sub['queued']:
+                logger.info(
+                    f"[이벤트 버스] {sub['name']}({sub['event']}) 처리 {sub['handled']}/{sub['delivered']}건, 대기 {sub['queued']}건 (최대 {sub['max_depth']}건), "
+                    f"드롭 {sub['dropped']}건, 오류 {sub['errors']}건, 처리 평균 {sub['avg_handle_ms']:.0f}ms / 최대 {sub['max_handle_ms']:.0f}ms, 최대 대기 {sub['max_wait_ms']:.0f}ms"
+                )
+
+    @db_pool_monitor.before_loop
+    async def before_db_pool_monitor(self):
+        await self.bot.wait_until_ready()
+
     async def coin_log_sender(self):
         await self.bot.wait_until_ready()
         while not self.bot.is_closed():
@@ -400,24 +455,19 @@ class EconomyCore(commands.Cog):
                 user_chat_counts[user_id] += log.get('amount', 0)
 
             for user_id, count in user_chat_counts.items():
+                publish_activity(user_id, 'chat', amount=count)
                 user = self.bot.get_user(user_id)
                 if not user: continue
 
                 xp_to_add = self.xp_from_chat * count
                 if xp_to_add > 0:
                     xp_res = await supabase.rpc('add_xp', {'p_user_id': str(user_id), 'p_xp_to_add': xp_to_add, 'p_source': 'chat'}).execute()
-                    if xp_res.data:
-                        await self.handle_level_up_event(user, xp_res.data)
+                    if event := level_up_from_result(user_id, xp_res.data):
+                        await game_events.publish_wait(event)
                     
                     pet_xp_res = await add_xp_to_pet_db(user_id, xp_to_add)
-                    
-                    if pet_xp_res and pet_xp_res[0].get('leveled_up'):
-                        new_level = pet_xp_res[0].get('new_level')
-                        points = pet_xp_res[0].get('points_awarded')
-                        
-                        if pet_cog := self.bot.get_cog("PetSystem"):
-                            await pet_cog.notify_pet_level_up(user_id, new_level, points)
-                            await pet_cog.check_and_process_auto_evolution({user_id})
+                    if pet_event := pet_level_up_from_result(user_id, pet_xp_res):
+                        await game_events.publish_wait(pet_event)
 
                 stats = await get_all_user_stats(user_id)
                 daily_stats = stats.get('daily', {})
@@ -486,6 +536,7 @@ class EconomyCore(commands.Cog):
             logs_to_insert = [{'user_id': str(uid), 'activity_type': 'voice', 'amount': 1, 'xp_earned': xp_per_minute} for uid in users_to_reward]
             if logs_to_insert:
                 await supabase.table('user_activities').insert(logs_to_insert).execute()
+                for uid in users_to_reward: publish_activity(uid, 'voice', amount=1)
                 
                 xp_update_tasks = [supabase.rpc('add_xp', {'p_user_id': str(uid), 'p_xp_to_add': xp_per_minute, 'p_source': 'voice'}).execute() for uid in users_to_reward]
                 pet_xp_tasks = [add_xp_to_pet_db(uid, xp_per_minute) for uid in users_to_reward]
@@ -495,23 +546,12 @@ class EconomyCore(commands.Cog):
                     asyncio.gather(*pet_xp_tasks, return_exceptions=True)
                 )
 
-                for i, result in enumerate(xp_results):
-                    if not isinstance(result, Exception) and hasattr(result, 'data') and result.data:
-                        user = self.bot.get_user(list(users_to_reward)[i])
-                        if user: await self.handle_level_up_event(user, result.data)
-                
-                pet_cog = self.bot.get_cog("PetSystem")
                 users_list = list(users_to_reward)
-
-                for i, result in enumerate(pet_xp_results):
-                    user_id_from_list = users_list[i]
-                    
-                    if not isinstance(result, Exception) and result and isinstance(result, list) and result[0].get('leveled_up'):
-                        if pet_cog:
-                            new_level = result[0].get('new_level')
-                            points = result[0].get('points_awarded')
-                            await pet_cog.notify_pet_level_up(user_id_from_list, new_level, points)
-                            await pet_cog.check_and_process_auto_evolution({user_id_from_list})
+                for user_id_from_list, result, pet_result in zip(users_list, xp_results, pet_xp_results):
+                    if not isinstance(result, Exception) and (event := level_up_from_result(user_id_from_list, getattr(result, 'data', None))):
+                        await game_events.publish_wait(event)
+                    if not isinstance(pet_result, Exception) and (pet_event := pet_level_up_from_result(user_id_from_list, pet_result)):
+                        await game_events.publish_wait(pet_event)
 
         except Exception as e:
             logger.error(f"[음성 활동 추적] 순찰 중 오류 발생: {e}", exc_info=True)
@@ -522,16 +562,6 @@ class EconomyCore(commands.Cog):
     async def before_voice_activity_tracker(self):
         await self.bot.wait_until_ready()
 
-    async def handle_level_up_event(self, user: discord.User, result_data: List[Dict]):
-        if not result_data or not result_data[0].get('leveled_up'): return
-        new_level = result_data[0].get('new_level')
-        logger.info(f"유저 {user.display_name}(ID: {user.id})가 레벨 {new_level}(으)로 레벨업했습니다.")
-        game_config = get_config("GAME_CONFIG", {})
-        job_advancement_levels = game_config.get("JOB_ADVANCEMENT_LEVELS", [50, 100])
-        if new_level in job_advancement_levels:
-            await save_config_to_db(f"job_advancement_request_{user.id}", {"level": new_level, "timestamp": time.time()})
-        await save_config_to_db(f"level_tier_update_request_{user.id}", {"level": new_level, "timestamp": time.time()})
-
     async def log_coin_activity(self, user: discord.Member, amount: int, reason: str):
         embed_data = await get_embed_from_db("log_coin_gain")
         if not embed_data: return
@@ -568,34 +598,10 @@ class EconomyCore(commands.Cog):
     async def update_market_prices(self):
         logger.info("[시장] 일일 아이템 및 물고기 가격 변동을 시작합니다.")
         try:
-            from utils.database import load_game_data_from_db
-            await load_game_data_from_db()
-            item_db, loot_db = get_item_database(), get_fishing_loot()
-            items_to_update, announcements, fish_to_update = [], [], []
-            for name, data in item_db.items():
-                if data.get('volatility', 0) > 0:
-                    old_price = data.get('current_price', data.get('price', 0))
-                    new_price = self._calculate_new_price(old_price, data['volatility'], data.get('min_price'), data.get('max_price'))
-                    if new_price != old_price:
-                        item_update_payload = {**data, 'name': name, 'current_price': new_price}
-                        items_to_update.append(item_update_payload)
-                        if abs((new_price - old_price) / old_price) > 0.25:
-                            status = "폭등 📈" if new_price > old_price else "폭락 📉"
-                            announcements.append(f" - {name}: `{old_price}` → `{new_price}`{self.currency_icon} ({status})")
-            for fish in loot_db:
-                if fish.get('volatility', 0) > 0 and 'id' in fish:
-                    old_price = fish.get('current_base_value', fish.get('base_value', 0))
-                    new_price = self._calculate_new_price(old_price, fish['volatility'], fish.get('min_price'), fish.get('max_price'))
-                    if new_price != old_price:
-                        fish_update_payload = {**fish, 'current_base_value': new_price}
-                        fish_to_update.append(fish_update_payload)
-                        if abs((new_price - old_price) / old_price) > 0.20:
-                            status = "풍어 📈" if new_price > old_price else "흉어 📉"
-                            announcements.append(f" - {fish['name']} (기본 가치): `{old_price}` → `{new_price}`{self.currency_icon} ({status})")
-            if items_to_update: await supabase.table('items').upsert(items_to_update, on_conflict="name").execute()
-            if fish_to_update: await supabase.table('fishing_loots').upsert(fish_to_update, on_conflict="id").execute()
-            if items_to_update or fish_to_update:
-                await load_game_data_from_db()
+            announcements = await run_daily_repricing(self.currency_icon)
+            if announcements is None:
+                logger.error("[시장] 시세 이력을 읽지 못했거나 변동을 DB에 반영하지 못해 이번 변동을 건너뜁니다.")
+                return
             await save_config_to_db("market_fluctuations", announcements)
             if announcements and (log_channel_id := get_id("market_log_channel_id")) and (log_channel := self.bot.get_channel(log_channel_id)):
                 embed = discord.Embed(title="📢 오늘의 주요 시세 변동 정보", description="\n".join(announcements), color=0xFEE75C)
@@ -605,10 +611,6 @@ class EconomyCore(commands.Cog):
             logger.info("[시장] 가격 변동 처리가 완료되었습니다.")
         except Exception as e:
             logger.error(f"[시장] 아이템 가격 업데이트 중 오류: {e}", exc_info=True)
-            
-    def _calculate_new_price(self, current, volatility, min_p, max_p):
-        new_price = int(current * (1 + random.uniform(-volatility, volatility)))
-        return min(max_p, max(min_p, new_price)) if min_p is not None and max_p is not None else new_price
         
     @update_market_prices.before_loop
     async def before_update_market_prices(self):
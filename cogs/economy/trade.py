@@ -9,16 +9,20 @@ import math
 import time
 from typing import Optional, Dict, List, Any
 # ▼▼▼ [핵심 수정] 아래 datetime 관련 import를 추가합니다. ▼▼▼
-from datetime import datetime, timezone, timedelta
+from datetime import datetime
 from postgrest.exceptions import APIError
 import json
+import uuid
 
 from utils.database import (
     get_inventory, get_wallet, get_item_database, get_config, supabase,
-    save_panel_id, get_panel_id, get_embed_from_db, update_inventory, update_wallet,
-    get_id
+    get_embed_from_db, update_wallet,
+    get_id, create_mail, claim_mails, get_mailbox_page, delete_mails, archive_expired_mails,
+    MAILBOX_PAGE_SIZE, MAIL_SWEEP_BATCH_SIZE
 )
 from utils.helpers import format_embed_from_db
+from utils.sticky_panel import sticky_panels
+from utils.user_locks import user_locks, LockTimeoutError, BUSY_MESSAGE
 
 logger = logging.getLogger(__name__)
 
@@ -360,34 +364,42 @@ class TradeView(ui.View):
         user1, user2, offer1, offer2 = self.initiator, self.partner, self.offers[self.initiator.id], self.offers[self.partner.id]
         
         # ▼▼▼▼▼ 핵심 수정 시작 ▼▼▼▼▼
+        # 두 사람의 다른 경제 활동(송금, 슬롯 등)과 겹치지 않도록 거래 처리 동안 두 유저의 Lock을 함께 잡습니다.
+        # 실패 처리(채널 삭제 대기)는 Lock을 푼 뒤에 합니다.
+        failure_reason = None
         try:
-            # 1. 수수료 계산
-            commission_rate = 0.05
-            commission = math.ceil((offer1['coins'] + offer2['coins']) * commission_rate)
-
-            # 2. DB 함수에 전달할 파라미터 준비
-            params = {
-                'p_user1_id': user1.id,
-                'p_user2_id': user2.id,
-                'p_user1_offer_items': json.dumps(offer1['items']),
-                'p_user2_offer_items': json.dumps(offer2['items']),
-                'p_user1_offer_coins': offer1['coins'],
-                'p_user2_offer_coins': offer2['coins'],
-                'p_commission_fee': commission
-            }
+            async with user_locks.hold_many((user1.id, user2.id)):
+                # 1. 수수료 계산
+                commission_rate = 0.05
+                commission = math.ceil((offer1['coins'] + offer2['coins']) * commission_rate)
+
+                # 2. DB 함수에 전달할 파라미터 준비
+                params = {
+                    'p_user1_id': user1.id,
+                    'p_user2_id': user2.id,
+                    'p_user1_offer_items': json.dumps(offer1['items']),
+                    'p_user2_offer_items': json.dumps(offer2['items']),
+                    'p_user1_offer_coins': offer1['coins'],
+                    'p_user2_offer_coins': offer2['coins'],
+                    'p_commission_fee': commission
+                }
             
-            # 3. 단일 RPC 함수 호출
-            response = await supabase.rpc('execute_trade', params).execute()
+                # 3. 단일 RPC 함수 호출
+                response = await supabase.rpc('execute_trade', params).execute()
             
-            # 4. 결과 확인
-            result_message = response.data
-            if result_message != '거래 성공':
-                # DB 함수가 실패 메시지를 반환하면, 해당 메시지를 표시하고 거래 실패 처리
-                return await self.fail_trade(result_message)
-
+                # 4. 결과 확인
+                result_message = response.data
+                if result_message != '거래 성공':
+                    # DB 함수가 실패 메시지를 반환하면, 해당 메시지를 표시하고 거래 실패 처리
+                    failure_reason = result_message
+
+        except LockTimeoutError:
+            failure_reason = "거래 당사자의 다른 작업이 끝나지 않았습니다. 잠시 후 다시 시도해주세요."
         except Exception as e:
             logger.error(f"거래 처리 RPC 호출 중 예외 발생: {e}", exc_info=True)
-            return await self.fail_trade("알 수 없는 오류가 발생했습니다.")
+            failure_reason = "알 수 없는 오류가 발생했습니다."
+        if failure_reason:
+            return await self.fail_trade(failure_reason)
         # ▲▲▲▲▲ 핵심 수정 종료 ▲▲▲▲▲
 
         if self.message:
@@ -463,6 +475,8 @@ class MailComposeView(ui.View):
         self.currency_icon = get_config("CURRENCY_ICON", "🪙")
         self.shipping_fee = 100
         self.message: Optional[discord.WebhookMessage] = None
+        # 재시도나 중복 클릭으로 같은 우편이 두 번 발송되지 않도록 발송 요청마다 고유 ID를 둡니다.
+        self.request_id = str(uuid.uuid4())
     
     async def start_from_selection(self):
         embed = await self.build_embed()
@@ -509,7 +523,10 @@ class MailComposeView(ui.View):
         elif custom_id == "remove_item":
             await self.handle_remove_item(interaction)
         elif custom_id == "send_mail":
-            await self.handle_send(interaction)
+            if user_locks.is_busy(self.user.id):
+                return await interaction.followup.send(BUSY_MESSAGE, ephemeral=True)
+            async with user_locks.hold(self.user.id):
+                await self.handle_send(interaction)
 
     async def handle_attach_item(self, interaction: discord.Interaction):
         view = IngredientSelectView(self)
@@ -545,55 +562,26 @@ class MailComposeView(ui.View):
                 await self.refresh()
                 return await delete_after(msg, 5)
 
-            wallet, inventory = await asyncio.gather(get_wallet(self.user.id), get_inventory(self.user))
-            if wallet.get('balance', 0) < self.shipping_fee:
-                msg = await interaction.followup.send(f"코인이 부족합니다. (배송비: {self.shipping_fee:,}{self.currency_icon})", ephemeral=True)
+            # 잔액/재고 검증, 차감, 우편과 첨부 생성은 send_mail RPC 한 번에 처리됩니다.
+            result = await create_mail(self.request_id, self.user.id, self.recipient.id, self.message_content, self.attachments["items"], self.shipping_fee)
+            if not result:
+                await self.message.edit(content="❌ 우편 발송 결과를 확인하지 못했습니다. 잠시 후 보낸 아이템과 코인을 확인해주세요.", view=None, embed=None)
+                return
+            if not result.get('ok'):
+                reason = result.get('reason')
+                error_text = f"코인이 부족합니다. (배송비: {self.shipping_fee:,}{self.currency_icon})" if reason == 'insufficient_coins' else "아이템 재고가 부족합니다."
+                msg = await interaction.followup.send(error_text, ephemeral=True)
                 await self.refresh()
                 return await delete_after(msg, 5)
-            
-            for item, qty in self.attachments["items"].items():
-                if inventory.get(item, 0) < qty:
-                    msg = await interaction.followup.send(f"아이템 재고가 부족합니다: '{item}'", ephemeral=True)
-                    await self.refresh()
-                    return await delete_after(msg, 5)
-            
-            # --- DB 작업 시작 ---
-            db_tasks = [update_wallet(self.user, -self.shipping_fee)]
-            for item, qty in self.attachments["items"].items():
-                db_tasks.append(update_inventory(self.user.id, item, -qty))
-            await asyncio.gather(*db_tasks)
-            
-            now, expires_at = datetime.now(timezone.utc), datetime.now(timezone.utc) + timedelta(days=30)
-            
-            mail_res = await supabase.table('mails').insert({
-                "sender_id": str(self.user.id), 
-                "recipient_id": str(self.recipient.id), 
-                "message": self.message_content, 
-                "sent_at": now.isoformat(), 
-                "expires_at": expires_at.isoformat()
-            }).execute()
-
-            if not mail_res.data:
-                logger.error("메일 레코드 생성 실패. 비용 및 아이템 환불 시도."); 
-                refund_tasks = [update_wallet(self.user, self.shipping_fee)]
-                for item, qty in self.attachments["items"].items():
-                    refund_tasks.append(update_inventory(self.user.id, item, qty))
-                await asyncio.gather(*refund_tasks)
-                await self.message.edit(content="❌ 우편 발송에 실패했습니다. 비용과 아이템이 모두 환불되었습니다.", view=None, embed=None)
-                return
-            
-            new_mail_id = mail_res.data[0]['id']
-            if self.attachments["items"]:
-                att_to_insert = [{"mail_id": new_mail_id, "item_name": n, "quantity": q, "is_coin": False} for n, q in self.attachments["items"].items()]
-                await supabase.table('mail_attachments').insert(att_to_insert).execute()
-            
+
             await self.message.edit(content="✅ 우편을 성공적으로 보냈습니다.", view=None, embed=None)
             
             if (panel_ch_id := get_id("trade_panel_channel_id")) and (panel_ch := self.cog.bot.get_channel(panel_ch_id)):
                 if embed_data := await get_embed_from_db("log_new_mail"):
                     log_embed = format_embed_from_db(embed_data, sender_mention=self.user.mention, recipient_mention=self.recipient.mention)
                     await panel_ch.send(content=self.recipient.mention, embed=log_embed, allowed_mentions=discord.AllowedMentions(users=True), delete_after=60.0)
-                await self.cog.regenerate_panel(panel_ch)
+                # 알림 메시지 아래로 패널만 다시 붙이면 되므로, 캐시된 패널을 쓰고 다른 재게시 요청과 합칩니다.
+                await self.cog.regenerate_panel(panel_ch, force=False)
             
         except Exception as e:
             logger.error(f"우편 발송 중 최종 단계에서 예외 발생: {e}", exc_info=True)
@@ -614,6 +602,7 @@ class MailboxView(ui.View):
         self.user = user
         self.page = 0
         self.mails_on_page: List[Dict] = []
+        self.total_mails = 0
         self.message: Optional[discord.WebhookMessage] = None
         self.currency_icon = get_config("CURRENCY_ICON", "🪙")
         self.selected_mail_ids: List[str] = []
@@ -637,12 +626,17 @@ class MailboxView(ui.View):
             self.stop()
     async def build_embed(self) -> discord.Embed:
         embed = discord.Embed(title=f"📫 {self.user.display_name}의 우편함", color=0x964B00)
-        res = await supabase.table('mails').select('*, mail_attachments(*)', count='exact').eq('recipient_id', str(self.user.id)).is_('claimed_at', None).order('sent_at', desc=True).range(self.page * 5, self.page * 5 + 4).execute()
-        self.mails_on_page = res.data if res.data else []
+        # 페이지와 전체 개수를 한 번에 받아 두고, 버튼 상태도 이 값으로 정합니다.
+        self.mails_on_page, self.total_mails = await get_mailbox_page(self.user.id, self.page) or ([], 0)
+        if not self.mails_on_page and self.page > 0 and self.total_mails:
+            # 수령/삭제/만료로 현재 페이지가 비었다면 마지막 페이지를 보여줍니다.
+            self.page = (self.total_mails - 1) // MAILBOX_PAGE_SIZE
+            self.mails_on_page, self.total_mails = await get_mailbox_page(self.user.id, self.page) or ([], 0)
         if not self.mails_on_page:
+            self.page = 0
             embed.description = "받은 편지가 없습니다."
         else:
-            embed.set_footer(text=f"페이지 {self.page + 1} / {math.ceil((res.count or 0) / 5)}")
+            embed.set_footer(text=f"페이지 {self.page + 1} / {math.ceil(self.total_mails / MAILBOX_PAGE_SIZE)}")
             for i, mail in enumerate(self.mails_on_page):
                 sender_id_int = int(mail['sender_id'])
                 sender = self.cog.bot.get_user(sender_id_int)
@@ -671,12 +665,10 @@ class MailboxView(ui.View):
         send_button = ui.Button(label="편지 보내기", style=discord.ButtonStyle.success, emoji="✉️", row=2)
         send_button.callback = self.send_mail
         self.add_item(send_button)
-        res = await supabase.table('mails').select('id', count='exact').eq('recipient_id', str(self.user.id)).is_('claimed_at', None).execute()
-        total_mails = res.count or 0
         prev_button = ui.Button(label="◀", style=discord.ButtonStyle.secondary, disabled=self.page == 0, row=2)
         prev_button.callback = self.prev_page_callback
         self.add_item(prev_button)
-        next_button = ui.Button(label="▶", style=discord.ButtonStyle.secondary, disabled=(self.page + 1) * 5 >= total_mails, row=2)
+        next_button = ui.Button(label="▶", style=discord.ButtonStyle.secondary, disabled=(self.page + 1) * MAILBOX_PAGE_SIZE >= self.total_mails, row=2)
         next_button.callback = self.next_page_callback
         self.add_item(next_button)
     async def on_mail_select(self, interaction: discord.Interaction):
@@ -684,27 +676,20 @@ class MailboxView(ui.View):
         self.selected_mail_ids = interaction.data['values']
         await self.update_view(interaction)
     async def claim_selected_mails(self, interaction: discord.Interaction):
+        if user_locks.is_busy(self.user.id):
+            return await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True, delete_after=3)
+        async with user_locks.hold(self.user.id):
+            await self._claim_selected_mails(interaction)
+
+    async def _claim_selected_mails(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        claimed_count = 0
-        total_items: Dict[str, int] = {}
-        db_tasks = []
         mail_ids_to_process = [int(mid) for mid in self.selected_mail_ids]
-        attachments_res = await supabase.table('mail_attachments').select('*').in_('mail_id', mail_ids_to_process).execute()
-        if attachments_res.data:
-            for att in attachments_res.data:
-                total_items[att['item_name']] = total_items.get(att['item_name'], 0) + att['quantity']
-            for item_name, qty in total_items.items():
-                db_tasks.append(update_inventory(self.user.id, item_name, qty))
-        try:
-            if db_tasks:
-                await asyncio.gather(*db_tasks)
-            now_iso = datetime.now(timezone.utc).isoformat()
-            await supabase.table('mails').update({'claimed_at': now_iso}).in_('id', mail_ids_to_process).execute()
-            claimed_count = len(mail_ids_to_process)
-        except Exception as e:
-            logger.error(f"우편 일괄 수령 중 DB 작업 오류: {e}", exc_info=True)
+        # 첨부 조회, 아이템 지급, 수령 표시는 claim_mails RPC 한 번에 처리됩니다.
+        if not (result := await claim_mails(self.user.id, mail_ids_to_process)):
             await interaction.followup.send("우편을 수령하는 중 오류가 발생했습니다.", ephemeral=True)
             return
+        claimed_count = result.get('claimed_count', 0)
+        total_items: Dict[str, int] = result.get('items') or {}
         if claimed_count > 0:
             item_summary = "\n".join([f"ㄴ {name}: {qty}개" for name, qty in total_items.items()])
             success_message = f"{claimed_count}개의 우편을 수령했습니다!\n\n**총 받은 아이템:**\n{item_summary or '없음'}"
@@ -717,7 +702,7 @@ class MailboxView(ui.View):
     async def delete_selected_mails(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         mail_ids_to_delete = [int(mid) for mid in self.selected_mail_ids]
-        await supabase.table('mails').delete().in_('id', mail_ids_to_delete).eq('recipient_id', str(self.user.id)).execute()
+        await delete_mails(self.user.id, mail_ids_to_delete)
         self.selected_mail_ids.clear()
         await self.update_view(interaction)
     
@@ -773,6 +758,12 @@ class TradePanelView(ui.View):
         user_select = ui.UserSelect(placeholder="거래할 상대를 선택하세요.")
         
         async def select_callback(si: discord.Interaction):
+            if user_locks.is_busy(initiator.id):
+                return await si.response.send_message(BUSY_MESSAGE, ephemeral=True, delete_after=3)
+            async with user_locks.hold(initiator.id):
+                await open_trade(si)
+
+        async def open_trade(si: discord.Interaction):
             # UserSelect 상호작용(si)에 대해 응답합니다.
             await si.response.defer(ephemeral=True, thinking=False)
 
@@ -825,6 +816,10 @@ class Trade(commands.Cog):
 
     async def cog_load(self):
         self.bot.loop.create_task(self.cleanup_stale_trades())
+        self.mail_sweeper_task = self.bot.loop.create_task(self.sweep_expired_mails())
+
+    async def cog_unload(self):
+        if (task := getattr(self, 'mail_sweeper_task', None)) and not task.done(): task.cancel()
     
     async def cleanup_stale_trades(self):
         await self.bot.wait_until_ready()
@@ -834,37 +829,34 @@ class Trade(commands.Cog):
             for tid in stale_trades:
                 if tid in self.active_trades: self.active_trades.pop(tid)
 
+    async def sweep_expired_mails(self):
+        """만료된 우편을 한 시간마다 배치 단위로 보관함으로 옮깁니다. 배치 사이에는 잠시 쉬어 다른 쿼리를 막지 않습니다."""
+        await self.bot.wait_until_ready()
+        while not self.bot.is_closed():
+            try:
+                total = 0
+                while (archived := await archive_expired_mails(MAIL_SWEEP_BATCH_SIZE)):
+                    total += archived
+                    if archived < MAIL_SWEEP_BATCH_SIZE: break
+                    await asyncio.sleep(1)
+                if total: logger.info(f"[우편 정리] 만료된 우편 {total}통을 보관함으로 옮겼습니다.")
+            except Exception as e:
+                logger.error(f"[우편 정리] 만료 우편 정리 중 오류: {e}", exc_info=True)
+            await asyncio.sleep(3600)
+
     async def register_persistent_views(self):
         self.bot.add_view(TradePanelView(self))
         logger.info("✅ 거래소의 영구 View가 성공적으로 등록되었습니다.")
 
-    async def regenerate_panel(self, channel: discord.TextChannel, panel_key: str = "panel_trade", last_log: Optional[discord.Embed] = None):
-        if last_log:
-            try: await channel.send(embed=last_log)
-            except discord.HTTPException: pass
-        
-        panel_info = get_panel_id(panel_key)
-        if panel_info and panel_info.get("message_id"):
-            try:
-                msg = await channel.fetch_message(panel_info["message_id"])
-                await msg.delete()
-                logger.info(f"이전 거래소 패널(ID: {panel_info['message_id']})을 삭제했습니다.")
-            except (discord.NotFound, discord.Forbidden):
-                logger.warning(f"이전 거래소 패널을 찾거나 삭제할 수 없습니다.")
-
-        embed_data = await get_embed_from_db(panel_key)
-        if not embed_data:
-            logger.error(f"DB에서 '{panel_key}' 임베드를 찾을 수 없어 패널을 생성할 수 없습니다.")
-            return
+    async def regenerate_panel(self, channel: discord.TextChannel, panel_key: str = "panel_trade", last_log: Optional[discord.Embed] = None, force: Optional[bool] = None):
+        async def build_panel():
+            embed_data = await get_embed_from_db(panel_key)
+            if not embed_data:
+                logger.error(f"DB에서 '{panel_key}' 임베드를 찾을 수 없어 패널을 생성할 수 없습니다.")
+                return None
+            return discord.Embed.from_dict(embed_data), TradePanelView(self)
 
-        embed = discord.Embed.from_dict(embed_data)
-        view = TradePanelView(self)
-        try:
-            new_message = await channel.send(embed=embed, view=view)
-            await save_panel_id(panel_key, new_message.id, channel.id)
-            logger.info(f"✅ '{panel_key}' 패널을 성공적으로 재생성했습니다. (채널: #{channel.name})")
-        except discord.Forbidden:
-            logger.error(f"'{channel.name}' 채널에 패널을 생성할 권한이 없습니다.")
+        await sticky_panels.request(channel, panel_key, build_panel, log_embed=last_log, force=last_log is None if force is None else force)
 
 async def setup(bot: commands.Cog):
     await bot.add_cog(Trade(bot))
@@ -13,11 +13,12 @@ from typing import Optional, Dict, List, Any
 # --- ▼▼▼▼▼ 핵심 수정 시작 ▼▼▼▼▼ ---
 from utils.database import (
     supabase, get_user_pet, get_config, get_id,
-    update_wallet, update_inventory, save_id_to_db,
+    update_wallet, update_inventories, save_id_to_db,
     log_chest_reward # log_chest_reward 함수를 import 합니다.
 )
 # --- ▲▲▲▲▲ 핵심 수정 종료 ▲▲▲▲▲ ---
 from utils.helpers import format_embed_from_db, create_bar
+from utils.game_odds import pick_boss_reward_tier, roll_boss_chest
 
 logger = logging.getLogger(__name__)
 
@@ -486,44 +487,25 @@ class BossRaid(commands.Cog):
 # ... (cogs/games/boss_raid.py 내부) ...
 
             base_chest_item = "주간 보스 보물 상자" if boss_type == 'weekly' else "월간 보스 보물 상자"
-            rare_reward_items = ["각성의 코어", "초월의 핵"]
             
             db_tasks = []
+            chest_deltas = {}
             reward_summary_for_log = {}
 
             for i, participant in enumerate(participants):
                 user_id = participant['user_id']
                 rank = i + 1
-                percentile = rank / total_participants
+                user_tier = pick_boss_reward_tier(rank, total_participants, reward_tiers)
+                chest_contents = roll_boss_chest(user_tier)
                 
-                user_tier = next((tier for tier in reward_tiers if percentile <= tier['percentile']), reward_tiers[-1])
                 
-                coins = random.randint(*user_tier['coins'])
-                xp = random.randint(*user_tier['xp'])
-                
-                rolled_items = {}
-                # [수정] 희귀 아이템 수량 로직 적용
-                if random.random() < user_tier['rare_item_chance']:
-                    rare_item = random.choice(rare_reward_items)
-                    # 설정된 수량 범위 가져오기 (없으면 기본값 1개)
-                    qty_range = user_tier.get('rare_item_qty', [1, 1])
-                    qty = random.randint(qty_range[0], qty_range[1])
-                    
-                    if qty > 0:
-                        rolled_items[rare_item] = qty
-                
-                chest_contents = {
-                    "coins": coins,
-                    "xp": xp,
-                    "items": rolled_items
-                }
-                
-                
-                db_tasks.append(update_inventory(user_id, base_chest_item, 1))
+                chest_deltas[user_id] = {base_chest_item: 1}
                 db_tasks.append(log_chest_reward(user_id, base_chest_item, chest_contents))
                 
                 reward_summary_for_log[user_id] = base_chest_item
 
+            # 참가자 전원의 보물 상자는 한 번의 호출로 지급합니다.
+            db_tasks.append(update_inventories(chest_deltas))
             await asyncio.gather(*db_tasks)
             logger.info(f"Raid ID {raid_id}의 보상 지급(보물 상자) DB 작업 {len(db_tasks)}개를 완료했습니다.")
 
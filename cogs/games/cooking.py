@@ -14,10 +14,13 @@ from collections import defaultdict
 
 from utils.database import (
     get_inventory, get_wallet, get_item_database, get_config, supabase,
-    save_panel_id, get_panel_id, get_embed_from_db, update_inventory,
-    get_id, log_activity, get_user_abilities, delete_config_from_db, save_config_to_db, update_wallet
+    save_panel_id, get_panel_id, get_embed_from_db,
+    get_id, log_activity, get_user_abilities, delete_config_from_db, save_config_to_db, update_wallet,
+    get_recipe_by_ingredients, claim_recipe_discovery, release_recipe_discovery, update_inventory_many
 )
 from utils.helpers import format_embed_from_db
+from utils.user_locks import user_locks
+from utils.game_events import publish_activity, publish_level_result
 
 logger = logging.getLogger(__name__)
 
@@ -305,16 +308,13 @@ class CookingPanelView(ui.View):
                 child.callback = self.dispatch_button_callback
     
     async def dispatch_button_callback(self, interaction: discord.Interaction):
-        # 1. 유저별 Lock을 가져오거나 생성합니다.
-        user_lock = self.cog.user_locks.setdefault(interaction.user.id, asyncio.Lock())
-        
-        # 2. Lock이 이미 점유되어 있는지 확인하고, 그렇다면 사용자에게 알립니다.
-        if user_lock.locked():
+        # 1. 유저별 Lock이 이미 점유되어 있는지 확인하고, 그렇다면 사용자에게 알립니다.
+        if user_locks.is_busy(interaction.user.id):
             await interaction.response.send_message("⏳ 이전 작업을 처리 중입니다. 잠시만 기다려주세요.", ephemeral=True, delete_after=3)
             return
 
-        # 3. Lock을 획득하고 작업을 수행합니다.
-        async with user_lock:
+        # 2. Lock을 획득하고 작업을 수행합니다.
+        async with user_locks.hold(interaction.user.id):
             custom_id = interaction.data['custom_id']
             action = custom_id.split(':')[-1]
             method_map = {"add_ingredient": self.add_ingredient_prompt, "clear_ingredients": self.clear_ingredients, "start_cooking": self.start_cooking, "claim_selected": self.claim_selected_dishes}
@@ -322,12 +322,11 @@ class CookingPanelView(ui.View):
                 await method(interaction)
 
     async def on_cauldron_select(self, interaction: discord.Interaction):
-        user_lock = self.cog.user_locks.setdefault(interaction.user.id, asyncio.Lock())
-        if user_lock.locked():
+        if user_locks.is_busy(interaction.user.id):
             await interaction.response.send_message("⏳ 이전 작업을 처리 중입니다. 잠시만 기다려주세요.", ephemeral=True, delete_after=3)
             return
             
-        async with user_lock:
+        async with user_locks.hold(interaction.user.id):
             await interaction.response.defer()
             selected_slots = [int(v) for v in interaction.data.get('values', [])]
             
@@ -342,12 +341,11 @@ class CookingPanelView(ui.View):
             await self.refresh(interaction)
     
     async def on_dish_select(self, interaction: discord.Interaction):
-        user_lock = self.cog.user_locks.setdefault(interaction.user.id, asyncio.Lock())
-        if user_lock.locked():
+        if user_locks.is_busy(interaction.user.id):
             await interaction.response.send_message("⏳ 이전 작업을 처리 중입니다. 잠시만 기다려주세요.", ephemeral=True, delete_after=3)
             return
 
-        async with user_lock:
+        async with user_locks.hold(interaction.user.id):
             await interaction.response.defer()
             self.selected_dishes_to_claim = interaction.data.get('values', [])
             await self.refresh(interaction)
@@ -405,12 +403,11 @@ class CookingPanelView(ui.View):
         await interaction.response.defer()
         selected_cauldrons = self.get_selected_cauldrons()
         
-        res = await supabase.table('recipes').select('*').execute()
-        recipes = res.data if res.data else []
         user_abilities = await get_user_abilities(self.user.id)
         
         db_updates = []
         db_tasks = []
+        consumed: Dict[str, int] = defaultdict(int)
         total_xp_earned = 0
         ingredients_consumed = True
         
@@ -427,7 +424,7 @@ class CookingPanelView(ui.View):
             xp_earned = total_ingredients_count * XP_PER_INGREDIENT
             total_xp_earned += xp_earned
             
-            matched_recipe = next((r for r in recipes if r.get('ingredients') == ingredients), None)
+            matched_recipe = get_recipe_by_ingredients(ingredients)
             now = datetime.now(timezone.utc)
             cook_time_minutes = matched_recipe['cook_time_minutes'] if matched_recipe else DEFAULT_COOK_TIME_MINUTES
             cook_time = timedelta(minutes=int(cook_time_minutes))
@@ -446,9 +443,14 @@ class CookingPanelView(ui.View):
             })
 
             if ingredients_consumed:
-                for name, qty in ingredients.items():
-                    db_tasks.append(update_inventory(self.user.id, name, -qty))
+                for name, qty in ingredients.items(): consumed[name] += qty
         
+        # 모든 솥의 재료를 한 번에 차감합니다. 하나라도 부족하면 아무것도 차감되지 않으므로 요리를 시작하지 않습니다.
+        if consumed and not await update_inventory_many(self.user.id, {name: -qty for name, qty in consumed.items()}):
+            msg = await interaction.followup.send("❌ 재료가 부족하여 요리를 시작할 수 없습니다.", ephemeral=True)
+            self.cog.bot.loop.create_task(delete_after(msg, 10))
+            return await self.refresh(interaction)
+
         if db_updates:
             db_tasks.append(supabase.table('cauldrons').upsert(db_updates).execute())
         if total_xp_earned > 0:
@@ -459,8 +461,7 @@ class CookingPanelView(ui.View):
             results = await asyncio.gather(*db_tasks, return_exceptions=True)
             for res in results:
                 if not isinstance(res, Exception) and hasattr(res, 'data') and res.data and isinstance(res.data, list) and res.data[0].get('leveled_up'):
-                    if (level_cog := self.cog.bot.get_cog("LevelSystem")):
-                        await level_cog.handle_level_up_event(self.user, res.data)
+                    publish_level_result(self.user.id, res.data)
                     break 
 
         await self.refresh(interaction)
@@ -493,10 +494,10 @@ class CookingPanelView(ui.View):
             total_claimed_items[final_result_item] += quantity_to_claim
             if result_item_base_name != FAILED_DISH_NAME:
                 await self.cog.check_and_log_recipe_discovery(interaction.user, result_item_base_name, cauldron.get('current_ingredients'))
-        for item, qty in total_claimed_items.items():
-            db_tasks.append(update_inventory(self.user.id, item, qty))
+        db_tasks.append(update_inventory_many(self.user.id, total_claimed_items))
         db_tasks.append(supabase.table('cauldrons').update({'state': 'idle', 'current_ingredients': None, 'cooking_started_at': None, 'cooking_completes_at': None, 'result_item_name': None}).in_('id', cauldron_ids_to_process).execute())
         await asyncio.gather(*db_tasks)
+        for item in total_claimed_items: publish_activity(self.user.id, "dish_cooked", item_name=item)
         claimed_summary = "\n".join([f"ㄴ {name}: {qty}개" for name, qty in total_claimed_items.items()])
         success_message = f"✅ **총 {len(cauldron_ids_to_process)}개의 요리를 받았습니다!**\n\n**획득 아이템:**\n{claimed_summary}"
         if ability_messages:
@@ -523,9 +524,6 @@ class Cooking(commands.Cog):
         self.bot = bot
         self.currency_icon = "🪙"
         self.check_completed_cooking.start()
-        # ▼▼▼▼▼ 핵심 추가 ▼▼▼▼▼
-        self.user_locks: Dict[int, asyncio.Lock] = {}
-        # ▲▲▲▲▲ 핵심 추가 ▲▲▲▲▲
 
     async def cog_load(self):
         self.currency_icon = get_config("GAME_CONFIG", {}).get("CURRENCY_ICON", "🪙")
@@ -618,10 +616,13 @@ class Cooking(commands.Cog):
             elif isinstance(ingredients, dict):
                 parsed_ingredients = ingredients
 
-            res = await supabase.table('discovered_recipes').select('id').eq('recipe_name', recipe_name).limit(1).execute()
-            if res and res.data: return
-            
-            await supabase.table('discovered_recipes').insert({'recipe_name': recipe_name, 'discoverer_id': str(user.id), 'guild_id': str(user.guild.id)}).execute()
+            # 발견 여부는 게임 데이터와 함께 불러온 메모리 목록으로 판단하므로, 이미 발견된 요리는 DB를 호출하지 않습니다.
+            if not claim_recipe_discovery(recipe_name): return
+            try:
+                await supabase.table('discovered_recipes').insert({'recipe_name': recipe_name, 'discoverer_id': str(user.id), 'guild_id': str(user.guild.id)}).execute()
+            except Exception:
+                release_recipe_discovery(recipe_name)
+                raise
             
             log_channel_id = get_id("log_recipe_discovery_channel_id")
             if not (log_channel_id and (log_channel := self.bot.get_channel(log_channel_id))): return
@@ -688,6 +689,7 @@ class Cooking(commands.Cog):
             await thread.add_user(user)
             await delete_config_from_db(f"kitchen_state_{user.id}")
             await supabase.table('user_settings').upsert({'user_id': str(user.id), 'kitchen_thread_id': thread.id, 'kitchen_selected_slots': []}).execute()
+            publish_activity(user.id, "kitchen_created")
             
             embed_data = await get_embed_from_db("cooking_thread_welcome")
             if embed_data: await thread.send(embed=format_embed_from_db(embed_data, user_name=user.display_name))
@@ -4,17 +4,19 @@ import discord
 from discord.ext import commands
 from discord import ui
 import logging
-import random
 from typing import Optional
 
 # ▼▼▼ [수정] 아래 from ... import ... 구문을 수정해주세요. ▼▼▼
 from utils.database import (
     get_wallet, update_wallet, get_config, get_panel_components_from_db,
-    save_panel_id, get_panel_id, get_embed_from_db,
+    get_embed_from_db,
     log_activity  # 'log_activity'를 괄호 안에 추가합니다.
 )
 # ▲▲▲ [수정] 완료 ▲▲▲
 from utils.helpers import format_embed_from_db
+from utils.sticky_panel import sticky_panels
+from utils.game_odds import roll_dice
+from utils.user_locks import user_locks, BUSY_MESSAGE
 
 logger = logging.getLogger(__name__)
 
@@ -82,6 +84,12 @@ class NumberSelectView(ui.View):
             self.add_item(button)
 
     async def button_callback(self, interaction: discord.Interaction):
+        if user_locks.is_busy(self.user.id):
+            return await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True, delete_after=3)
+        async with user_locks.hold(self.user.id):
+            await self._play(interaction)
+
+    async def _play(self, interaction: discord.Interaction):
         chosen_number = int(interaction.data['custom_id'].split('_')[-1])
 
         for item in self.children:
@@ -91,12 +99,7 @@ class NumberSelectView(ui.View):
         except discord.NotFound:
             return self.stop()
 
-        if random.random() < 0.30:
-            dice_result = chosen_number
-        else:
-            possible_outcomes = [1, 2, 3, 4, 5, 6]
-            possible_outcomes.remove(chosen_number)
-            dice_result = random.choice(possible_outcomes)
+        dice_result = roll_dice(chosen_number)
 
         # ▼▼▼ [추가] 게임 참여 기록을 남깁니다. ▼▼▼
         await log_activity(self.user.id, 'dice_game_play', amount=1)
@@ -177,29 +180,17 @@ class DiceGame(commands.Cog):
 
     async def regenerate_panel(self, channel: discord.TextChannel, panel_key: str = "panel_dice_game", last_game_log: Optional[discord.Embed] = None):
         embed_key = "panel_dice_game"
-        
-        if panel_info := get_panel_id(panel_key):
-            if (old_channel := self.bot.get_channel(panel_info['channel_id'])) and (old_message_id := panel_info.get('message_id')):
-                try:
-                    await (await old_channel.fetch_message(old_message_id)).delete()
-                except (discord.NotFound, discord.Forbidden): pass
-        
-        if last_game_log:
-            try: await channel.send(embed=last_game_log)
-            except Exception as e: logger.error(f"주사위 게임 로그 메시지 전송 실패: {e}")
 
-        if not (embed_data := await get_embed_from_db(embed_key)):
-            logger.warning(f"DB에서 '{embed_key}'의 임베드 데이터를 찾을 수 없어 패널 생성을 건너뜁니다.")
-            return
+        async def build_panel():
+            if not (embed_data := await get_embed_from_db(embed_key)):
+                logger.warning(f"DB에서 '{embed_key}'의 임베드 데이터를 찾을 수 없어 패널 생성을 건너뜁니다.")
+                return None
+            view = DiceGamePanelView(self)
+            await view.setup_buttons()
+            self.bot.add_view(view)
+            return discord.Embed.from_dict(embed_data), view
 
-        embed = discord.Embed.from_dict(embed_data)
-        view = DiceGamePanelView(self)
-        await view.setup_buttons()
-        self.bot.add_view(view)
-        
-        new_message = await channel.send(embed=embed, view=view)
-        await save_panel_id(panel_key, new_message.id, channel.id)
-        logger.info(f"✅ {panel_key} 패널을 성공적으로 생성했습니다. (채널: #{channel.name})")
+        await sticky_panels.request(channel, panel_key, build_panel, log_embed=last_game_log, force=last_game_log is None)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(DiceGame(bot))
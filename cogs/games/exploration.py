@@ -8,18 +8,19 @@ import random
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, List, Any
 import asyncio
-from collections import defaultdict
 import time
 import re # 정규표현식 모듈 추가
 
 from utils.database import (
-    supabase, get_user_pet, get_exploration_locations, get_exploration_loot,
+    supabase, get_user_pet, get_exploration_locations, get_exploration_loot_cache,
     start_pet_exploration, get_completed_explorations, update_exploration_message_id,
-    get_exploration_by_id, claim_and_end_exploration, update_inventory,
+    get_exploration_by_id, claim_and_end_exploration, update_inventory_many,
     update_wallet, get_id, get_config, save_panel_id, get_panel_id, get_embed_from_db,
     save_config_to_db, add_xp_to_pet_db
 )
 from utils.helpers import format_embed_from_db
+from utils.loot_tables import get_exploration_table
+from utils.game_events import publish_activity, publish_pet_level_result
 
 logger = logging.getLogger(__name__)
 
@@ -121,6 +122,7 @@ class Exploration(commands.Cog):
         if not new_exploration:
             await interaction.followup.send("❌ 탐사를 시작하는 데 실패했습니다. 다시 시도해주세요.", ephemeral=True)
             return
+        publish_activity(user.id, "pet_exploration")
         
         description_text = (
             f"펫이 **{location['name']}**(으)로 탐사를 떠났습니다.\n\n"
@@ -189,18 +191,12 @@ class Exploration(commands.Cog):
         if interaction.user.id != int(exploration_data['user_id']):
              return await interaction.followup.send("❌ 본인의 탐사 보상만 수령할 수 있습니다.", ephemeral=True)
 
-        pet_level = exploration_data.get('pets', {}).get('level', 1)
         location = exploration_data.get('exploration_locations', {})
         
         xp_reward = random.randint(location.get('base_xp_min', 0), location.get('base_xp_max', 0))
         coin_reward = random.randint(location.get('base_coin_min', 0), location.get('base_coin_max', 0))
         
-        item_rewards = defaultdict(int)
-        loot_table = get_exploration_loot(location['location_key'], pet_level)
-        for item in loot_table:
-            if random.random() < item['drop_chance']:
-                qty = random.randint(item['min_qty'], item['max_qty'])
-                item_rewards[item['item_name']] += qty
+        item_rewards = get_exploration_table(get_exploration_loot_cache(), location['location_key']).roll()
         
         db_tasks = []
         if coin_reward > 0: db_tasks.append(update_wallet(interaction.user, coin_reward))
@@ -209,8 +205,7 @@ class Exploration(commands.Cog):
         if xp_reward > 0: 
             db_tasks.append(add_xp_to_pet_db(interaction.user.id, xp_reward))
 
-        for item, qty in item_rewards.items():
-            db_tasks.append(update_inventory(interaction.user.id, item, qty))
+        if item_rewards: db_tasks.append(update_inventory_many(interaction.user.id, item_rewards))
         
         results = await asyncio.gather(*db_tasks, return_exceptions=True)
 
@@ -237,16 +232,12 @@ class Exploration(commands.Cog):
         pet_cog = self.bot.get_cog("PetSystem")
         if pet_cog:
             await pet_cog.update_pet_ui(interaction.user.id, interaction.channel, message=None)
-            
-            # 레벨업 체크
-            for res in results:
-                if isinstance(res, list) and res and res[0].get('leveled_up'):
-                    await pet_cog.notify_pet_level_up(
-                        interaction.user.id,
-                        res[0].get('new_level'),
-                        res[0].get('points_awarded')
-                    )
-                    break
+
+        # 레벨업 체크
+        for res in results:
+            if isinstance(res, list) and res and res[0].get('leveled_up'):
+                publish_pet_level_result(interaction.user.id, res, check_evolution=False)
+                break
 
     async def register_persistent_views(self):
         # 패널용 뷰 등록
@@ -16,13 +16,15 @@ from utils.database import (
     get_farm_data, create_farm, get_config, expand_farm_db,
     save_panel_id, get_panel_id, get_embed_from_db,
     supabase, get_inventory, get_user_gear, update_plot,
-    get_farmable_item_info, update_inventory, BARE_HANDS,
+    get_farmable_item_info, update_inventory, update_inventory_many, BARE_HANDS,
     check_farm_permission, grant_farm_permission, clear_plots_db,
     get_farm_owner_by_thread, get_item_database, save_config_to_db,
     get_user_abilities,
     log_activity, delete_config_from_db
 )
 from utils.helpers import format_embed_from_db
+from utils.user_locks import user_locks, LockTimeoutError, BUSY_MESSAGE
+from utils.game_events import publish_activity, publish_level_result
 
 logger = logging.getLogger(__name__)
 
@@ -180,6 +182,7 @@ class FarmActionView(ui.View):
             db_tasks.append(update_inventory(self.user.id, self.selected_item, -seeds_to_deduct))
 
         await asyncio.gather(*db_tasks)
+        publish_activity(self.farm_owner_id, "farm_plant")
         
         updated_farm_data = await get_farm_data(self.farm_owner_id)
         owner = self.cog.bot.get_user(self.farm_owner_id)
@@ -269,6 +272,14 @@ class FarmUIView(ui.View):
             self.add_item(item)
     
     async def dispatch_callback(self, interaction: discord.Interaction):
+        # 농장(스레드) 단위로 작업을 직렬화해 소유자/도우미의 동시 수확·물주기 등이 겹치지 않게 합니다.
+        farm_key = ("farm", interaction.channel.id)
+        if user_locks.is_busy(farm_key):
+            return await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True, delete_after=3)
+        async with user_locks.hold(farm_key):
+            await self._dispatch(interaction)
+
+    async def _dispatch(self, interaction: discord.Interaction):
         cid = (interaction.data or {}).get('custom_id')
 
         # ▼▼▼ [핵심 수정] 모달을 보내는 등 자체적인 초기 응답이 필요한 액션을 제외하고 defer를 호출합니다. ▼▼▼
@@ -487,10 +498,9 @@ class FarmUIView(ui.View):
             await log_activity(owner.id, 'farm_harvest', amount=total_harvested_amount, xp_earned=total_xp)
         
         db_tasks = []
-        for name, quantity in harvested.items():
-            db_tasks.append(update_inventory(str(owner.id), name, quantity))
-        for seed_name, quantity in seeds_to_add.items():
-            db_tasks.append(update_inventory(str(owner.id), seed_name, quantity))
+        inventory_deltas = defaultdict(int)
+        for name, quantity in [*harvested.items(), *seeds_to_add.items()]: inventory_deltas[name] += quantity
+        if inventory_deltas: db_tasks.append(update_inventory_many(owner.id, inventory_deltas))
 
         if plots_to_reset: db_tasks.append(clear_plots_db(plots_to_reset))
         if trees_to_update:
@@ -517,8 +527,7 @@ class FarmUIView(ui.View):
         
         for res in results:
             if isinstance(res, dict) and 'data' in res and res.data and isinstance(res.data, list) and res.data[0].get('leveled_up'):
-                if (level_cog := self.cog.bot.get_cog("LevelSystem")):
-                    await level_cog.handle_level_up_event(owner, res.data)
+                publish_level_result(owner.id, res.data)
                 break
     
     async def on_farm_invite_click(self, i: discord.Interaction):
@@ -580,7 +589,6 @@ class FarmCreationPanelView(ui.View):
 class Farm(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.thread_locks: Dict[int, asyncio.Lock] = {}
         self.daily_crop_update.start()
 
     async def safe_edit(self, message: discord.Message, **kwargs):
@@ -879,48 +887,53 @@ class Farm(commands.Cog):
         embed.description = "\n\n".join(description_parts)
         return embed
     async def update_farm_ui(self, thread: discord.Thread, user: discord.User, farm_data: Dict, force_new: bool = False, message: discord.Message = None):
-        lock = self.thread_locks.setdefault(thread.id, asyncio.Lock())
-        async with lock:
-            current_farm_data = farm_data 
-            if not (user and current_farm_data):
-                logger.warning(f"[UI UPDATE FUNC] 사용자({user.id})의 최신 농장 데이터를 가져올 수 없어 UI 업데이트를 중단합니다.")
-                return
+        try:
+            async with user_locks.hold(("farm_ui", thread.id)):
+                await self._update_farm_ui(thread, user, farm_data, force_new, message)
+        except LockTimeoutError:
+            logger.warning(f"농장 스레드({thread.id})의 이전 UI 업데이트가 끝나지 않아 이번 업데이트를 건너뜁니다.")
+
+    async def _update_farm_ui(self, thread: discord.Thread, user: discord.User, farm_data: Dict, force_new: bool = False, message: discord.Message = None):
+        current_farm_data = farm_data 
+        if not (user and current_farm_data):
+            logger.warning(f"[UI UPDATE FUNC] 사용자({user.id})의 최신 농장 데이터를 가져올 수 없어 UI 업데이트를 중단합니다.")
+            return
 
-            try:
-                message_to_edit = message
-                
-                if not message_to_edit:
-                    message_id = current_farm_data.get("farm_message_id")
-                    if message_id and not force_new:
-                        try:
-                            message_to_edit = await thread.fetch_message(message_id)
-                        except (discord.NotFound, discord.Forbidden):
-                            logger.warning(f"농장 메시지(ID: {message_id})를 찾지 못하여 새로 생성합니다.")
-                            force_new = True
-                
-                if force_new and message_to_edit:
+        try:
+            message_to_edit = message
+            
+            if not message_to_edit:
+                message_id = current_farm_data.get("farm_message_id")
+                if message_id and not force_new:
                     try:
-                        await message_to_edit.delete()
+                        message_to_edit = await thread.fetch_message(message_id)
                     except (discord.NotFound, discord.Forbidden):
-                        pass
-                    message_to_edit = None
-
-                embed = await self.build_farm_embed(current_farm_data, user)
-                view = FarmUIView(self)
-                
-                if message_to_edit:
-                    await message_to_edit.edit(embed=embed, view=view)
-                else:
-                    if force_new:
-                        if embed_data := await get_embed_from_db("farm_thread_welcome"):
-                            await thread.send(embed=format_embed_from_db(embed_data, user_name=current_farm_data.get('name') or user.display_name))
-                    
-                    new_message = await thread.send(embed=embed, view=view)
-                    await supabase.table('farms').update({'farm_message_id': new_message.id}).eq('id', current_farm_data['id']).execute()
-                
-            except Exception as e:
-                logger.error(f"농장 UI 업데이트 중 오류: {e}", exc_info=True)
+                        logger.warning(f"농장 메시지(ID: {message_id})를 찾지 못하여 새로 생성합니다.")
+                        force_new = True
+            
+            if force_new and message_to_edit:
+                try:
+                    await message_to_edit.delete()
+                except (discord.NotFound, discord.Forbidden):
+                    pass
+                message_to_edit = None
+
+            embed = await self.build_farm_embed(current_farm_data, user)
+            view = FarmUIView(self)
+            
+            if message_to_edit:
+                await message_to_edit.edit(embed=embed, view=view)
+            else:
+                if force_new:
+                    if embed_data := await get_embed_from_db("farm_thread_welcome"):
+                        await thread.send(embed=format_embed_from_db(embed_data, user_name=current_farm_data.get('name') or user.display_name))
                 
+                new_message = await thread.send(embed=embed, view=view)
+                await supabase.table('farms').update({'farm_message_id': new_message.id}).eq('id', current_farm_data['id']).execute()
+            
+        except Exception as e:
+            logger.error(f"농장 UI 업데이트 중 오류: {e}", exc_info=True)
+            
     async def create_new_farm_thread(self, interaction: discord.Interaction, user: discord.Member):
         try:
             farm_data = await get_farm_data(user.id)
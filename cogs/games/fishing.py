@@ -10,23 +10,28 @@ import time
 from typing import Optional, Set, Dict, List
 
 from utils.database import (
-    update_wallet, get_inventory, update_inventory, add_to_aquarium,
-    get_user_gear, set_user_gear, save_panel_id, get_panel_id, get_id,
-    get_embed_from_db, supabase, get_item_database, get_fishing_loot, 
+    get_inventory, get_user_gear, set_user_gear, save_panel_id, get_panel_id, get_id,
+    get_embed_from_db, get_item_database, get_fishing_loot, get_fishing_loot_by_name,
     get_config, save_config_to_db,
-    is_whale_available, set_whale_caught,
+    is_whale_available, resolve_fishing_catch,
     BARE_HANDS, DEFAULT_ROD,
-    get_user_abilities,
-    log_activity
+    get_user_abilities
 )
 from utils.helpers import format_embed_from_db
+from utils.loot_tables import get_fishing_table
+from utils.game_odds import roll_fish_size
+from utils.session_journal import session_journal
+from utils.game_events import publish_activity, publish_level_result
 
 logger = logging.getLogger(__name__)
 
 INTERMEDIATE_ROD_NAME = "철 낚싯대"
 
 class FishingGameView(ui.View):
-    def __init__(self, bot: commands.Bot, user: discord.Member, used_rod: str, used_bait: str, remaining_baits: Dict[str, int], cog_instance: 'Fishing', location_type: str, bite_range: List[float]):
+    def __init__(
+        self, bot: commands.Bot, user: discord.Member, used_rod: str, used_bait: str, remaining_baits: Dict[str, int], cog_instance: 'Fishing',
+        location_type: str, bite_range: List[float], bait_to_consume: Optional[str] = None, user_abilities: Optional[List[str]] = None
+    ):
         super().__init__(timeout=35)
         self.bot = bot; self.player = user; self.message: Optional[discord.WebhookMessage] = None
         self.game_state = "waiting"; self.game_task: Optional[asyncio.Task] = None
@@ -35,9 +40,14 @@ class FishingGameView(ui.View):
         item_db = get_item_database(); self.rod_data = item_db.get(self.used_rod, {})
         game_config = get_config("GAME_CONFIG", {}); self.bite_reaction_time = game_config.get("FISHING_BITE_REACTION_TIME", 3.0)
         self.big_catch_threshold = game_config.get("FISHING_BIG_CATCH_THRESHOLD", 70.0)
+        # 미끼는 던질 때가 아니라 결과가 정해질 때 한 번에 차감합니다. (settled: 결과 반영 여부)
+        self.bait_to_consume = bait_to_consume; self.user_abilities = user_abilities; self.settled = False
 
     async def start_game(self, interaction: discord.Interaction, embed: discord.Embed):
         self.message = await interaction.followup.send(embed=embed, view=self, ephemeral=True)
+        # 재시작 시 취소 안내를 보낼 수 있도록 채널과 메시지 ID만 저널에 남깁니다.
+        # 인터랙션 토큰은 15분간 봇 명의로 메시지를 쓸 수 있는 비밀이므로 메모리(self.message)에만 둡니다.
+        session_journal.put("fishing", self.player.id, {"channel_id": interaction.channel_id, "message_id": self.message.id})
         self.game_task = asyncio.create_task(self.game_flow())
 
     async def game_flow(self):
@@ -62,61 +72,43 @@ class FishingGameView(ui.View):
                 self.stop()
 
     async def _handle_catch_logic(self) -> tuple[discord.Embed, bool, bool, bool]:
-        all_loot = get_fishing_loot()
-        
-        # ▼▼▼ [수정] location_map 제거 및 직접 비교로 변경 ▼▼▼
-        # 기존: location_map = {"river": "강", "sea": "바다"}; current_location_name = location_map.get(self.location_type, "강")
-        # 수정: self.location_type은 이미 "river" 또는 "sea"입니다. DB 데이터도 "river", "sea"이므로 그대로 사용합니다.
-        
-        # location_type이 현재 장소(river/sea)와 같거나, null인 아이템을 포함합니다.
-        base_loot = [item for item in all_loot if item.get('location_type') == self.location_type or item.get('location_type') is None]
-        # ▲▲▲ [수정] 완료 ▲▲▲
-
+        # 장소/낚싯대/능력 조합별로 미리 만들어 둔 별칭 테이블에서 바로 뽑습니다.
         rod_data = self.rod_data; rod_tier = rod_data.get('tier', 0); rod_bonus = rod_data.get('loot_bonus', 0.0)
-        loot_pool = []; is_whale_catchable = is_whale_available()
-        for item in base_loot:
-            if item.get('name') == '고래':
-                if rod_tier >= 5 and is_whale_catchable: loot_pool.append(item)
-            else: loot_pool.append(item)
-        if not loot_pool: return (discord.Embed(title="오류", description="이 장소에서는 아무것도 낚이지 않는 것 같습니다.", color=discord.Color.red()), False, False, False)
-        
+        user_abilities = self.user_abilities if self.user_abilities is not None else await get_user_abilities(self.player.id)
+        rare_up_bonus = 0.2 if 'fish_rare_up_2' in user_abilities else 0.0
+        size_multiplier = 1.2 if 'fish_size_up_2' in user_abilities else 1.0
+        loot_table = get_fishing_table(get_fishing_loot(), self.location_type, rod_tier, rod_bonus, rare_up_bonus, is_whale_available())
+        if not loot_table: return (discord.Embed(title="오류", description="이 장소에서는 아무것도 낚이지 않는 것 같습니다.", color=discord.Color.red()), False, False, False)
+
         xp_to_add = get_config("GAME_CONFIG", {}).get("XP_FROM_FISHING", 20)
-        await log_activity(self.player.id, 'fishing_catch', xp_earned=xp_to_add)
-        
-        # ▼▼▼ [수정] self.player.id -> str(self.player.id) 로 변환 ▼▼▼
-        res = await supabase.rpc('add_xp', {
-            'p_user_id': str(self.player.id),  # 정수를 문자열로 변환하여 전달
-            'p_xp_to_add': xp_to_add, 
-            'p_source': 'fishing'
-        }).execute()
-        # ▲▲▲ [수정 완료] ▲▲▲
-        
-        if res.data: await self.fishing_cog.handle_level_up_event(self.player, res.data)
-
-        user_abilities = await get_user_abilities(self.player.id); rare_up_bonus = 0.2 if 'fish_rare_up_2' in user_abilities else 0.0
-        size_multiplier = 1.2 if 'fish_size_up_2' in user_abilities else 1.0; weights = []
-        for item in loot_pool:
-            weight = item['weight']; base_value = item.get('base_value'); 
-            if base_value is None: base_value = 0
-            if base_value > 100: weight *= (1.0 + rod_bonus + rare_up_bonus)
-            else: weight *= (1.0 + rod_bonus)
-            weights.append(weight)
-        catch_proto = random.choices(loot_pool, weights=weights, k=1)[0]
-        
+        catch_proto = loot_table.sample()
         is_whale_catch = catch_proto.get('name') == '고래'; is_big_catch, log_publicly = False, False
-        
-        embed = discord.Embed()
-        if catch_proto.get("min_size") is not None:
-            log_publicly = True
-            min_s, max_s = catch_proto["min_size"] * size_multiplier, catch_proto["max_size"] * size_multiplier
-            size = round(random.uniform(min_s, max_s), 1)
-            if is_whale_catch: await set_whale_caught()
 
+        fish_record, value, size = None, 0, None
+        if catch_proto.get("min_size") is not None:
+            size = roll_fish_size(catch_proto, size_multiplier)
             emoji_to_save = catch_proto.get('emoji', '🐠')
             if isinstance(emoji_to_save, str):
                 emoji_to_save = emoji_to_save.strip()
-            await add_to_aquarium(self.player.id, {"name": catch_proto['name'], "size": size, "emoji": emoji_to_save})
+            fish_record = {"name": catch_proto['name'], "size": size, "emoji": emoji_to_save}
+        else:
+            value = catch_proto.get('value') or 0
 
+        # 미끼 차감, 어항/지갑, XP, 활동 기록, 고래 공지 해제를 한 번의 RPC로 처리합니다.
+        self.settled = True
+        result = await resolve_fishing_catch(
+            self.player.id, self.bait_to_consume, fish_record, value, xp_to_add,
+            claim_whale=is_whale_catch and fish_record is not None
+        )
+        if result is None:
+            return (discord.Embed(title="❌ 오류 발생", description="낚시 결과를 저장하지 못했습니다. 잠시 후 다시 시도해주세요.", color=discord.Color.red()), False, False, False)
+        publish_level_result(self.player.id, result['level_result'])
+        # RPC는 물고기가 아닌 결과물을 낚았을 때도 fishing_catch 활동을 기록하므로, 퀘스트 카운터도 똑같이 셉니다.
+        publish_activity(self.player.id, "fishing_catch")
+
+        embed = discord.Embed()
+        if fish_record:
+            log_publicly = True
             is_big_catch = size >= self.big_catch_threshold
             title = "🏆 월척이다! 🏆" if is_big_catch else "🎉 낚시 성공! 🎉"
             if is_whale_catch: title = "🐋 전설의 시작, 고래를 낚다! 🐋"
@@ -124,8 +116,6 @@ class FishingGameView(ui.View):
             embed.add_field(name="어종", value=f"{catch_proto.get('emoji', '🐠')} **{catch_proto['name']}**", inline=True)
             embed.add_field(name="크기", value=f"`{size}`cm", inline=True)
         else:
-            value = catch_proto.get('value') or 0
-            if value != 0: await update_wallet(self.player, value)
             embed.title, embed.description, embed.color = catch_proto['title'], catch_proto['description'].format(user_mention=self.player.mention, value=abs(value)), int(catch_proto['color'], 16) if isinstance(catch_proto['color'], str) else catch_proto['color']
         
         if image_url := catch_proto.get('image_url'): embed.set_thumbnail(url=image_url)
@@ -172,9 +162,19 @@ class FishingGameView(ui.View):
 
     def stop(self):
         if self.game_task and not self.game_task.done(): self.game_task.cancel()
-        self.fishing_cog.active_fishing_sessions_by_user.discard(self.player.id)
+        session_journal.delete("fishing", self.player.id)
+        if not self.settled and self.bait_to_consume:
+            # 놓치거나 시간이 초과된 경우에도 미끼는 소모됩니다. 차감이 끝난 뒤에 세션을 풀어 줍니다.
+            self.settled = True
+            asyncio.create_task(self._settle_without_catch())
+        else:
+            self.fishing_cog.active_fishing_sessions_by_user.discard(self.player.id)
         super().stop()
 
+    async def _settle_without_catch(self):
+        try: await resolve_fishing_catch(self.player.id, self.bait_to_consume)
+        finally: self.fishing_cog.active_fishing_sessions_by_user.discard(self.player.id)
+
 class FishingPanelView(ui.View):
     def __init__(self, bot: commands.Bot, cog_instance: 'Fishing', panel_key: str):
         super().__init__(timeout=None)
@@ -242,9 +242,11 @@ class FishingPanelView(ui.View):
                 if random.random() < 0.2:
                     bait_saved = True
 
+            bait_to_consume = None
             if bait != "미끼 없음" and not bait_saved:
                 if inventory.get(bait, 0) > 0:
-                    await update_inventory(user.id, bait, -1)
+                    # 실제 차감은 낚시 결과와 함께 resolve_fishing_catch에서 처리합니다.
+                    bait_to_consume = bait
                     inventory[bait] = max(0, inventory.get(bait, 0) - 1)
                 else:
                     bait = "미끼 없음"
@@ -292,7 +294,7 @@ class FishingPanelView(ui.View):
             if image_url := get_config("FISHING_WAITING_IMAGE_URL"):
                 embed.set_thumbnail(url=str(image_url).strip('"'))
             
-            view = FishingGameView(self.bot, interaction.user, rod, bait, inventory, self.fishing_cog, location_type, bite_range)
+            view = FishingGameView(self.bot, interaction.user, rod, bait, inventory, self.fishing_cog, location_type, bite_range, bait_to_consume, user_abilities)
             await view.start_game(interaction, embed)
         except Exception as e:
             self.fishing_cog.active_fishing_sessions_by_user.discard(user_id)
@@ -314,19 +316,22 @@ class Fishing(commands.Cog):
     async def register_persistent_views(self):
         self.bot.add_view(FishingPanelView(self.bot, self, "panel_fishing_river"))
         self.bot.add_view(FishingPanelView(self.bot, self, "panel_fishing_sea"))
-        
-    async def handle_level_up_event(self, user: discord.Member, result_data: List[Dict]):
-        if not (result_data and result_data[0].get('leveled_up')):
-            return
-            
-        new_level = result_data[0].get('new_level')
-        
-        if level_cog := self.bot.get_cog("LevelSystem"):
-            await level_cog.handle_level_up_event(user, result_data)
-        else:
-            logger.error("LevelSystem Cog를 찾을 수 없어 레벨업 이벤트를 처리할 수 없습니다.")
-
 
+    async def recover_sessions(self):
+        """
+        재시작으로 끊긴 낚시를 정리합니다. 입질 대기는 수십 초라 이어서 진행하지 않고,
+        미끼는 결과가 정해질 때만 차감되므로 소모 없이 취소되었다고 DM으로 안내합니다.
+        (낚시 메시지는 에페메랄이라 토큰 없이는 수정할 수 없습니다.)
+        """
+        for user_id, state in session_journal.sessions("fishing").items():
+            try:
+                user = self.bot.get_user(int(user_id)) or await self.bot.fetch_user(int(user_id))
+                channel_mention = f"<#{state['channel_id']}>" if state.get('channel_id') else "낚시터"
+                embed = discord.Embed(title="🔄 낚시 중단", description=f"봇이 재시작되어 {channel_mention}에서 진행 중이던 낚시가 취소되었습니다.\n사용한 미끼는 소모되지 않았습니다.", color=discord.Color.greyple())
+                await user.send(embed=embed)
+            except (discord.NotFound, discord.Forbidden, discord.HTTPException): pass
+            session_journal.delete("fishing", user_id)
+        
     async def log_whale_catch(self, user: discord.Member, result_embed: discord.Embed):
         announcement_msg_id = get_config("whale_announcement_message_id")
         sea_fishing_channel_id = get_id("sea_fishing_panel_channel_id")
@@ -348,7 +353,7 @@ class Fishing(commands.Cog):
         if not all([fish_field, size_field]): return
 
         fish_name_raw = fish_field.value.split('**')[1] if '**' in fish_field.value else fish_field.value
-        fish_data = next((loot for loot in get_fishing_loot() if loot['name'] == fish_name_raw), None)
+        fish_data = get_fishing_loot_by_name().get(fish_name_raw)
         if not fish_data: return
 
         size_cm = float(size_field.value.strip('`cm`'))
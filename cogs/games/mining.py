@@ -8,36 +8,27 @@ import asyncio
 import time
 import random
 import json
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Set
 from datetime import datetime, timezone, timedelta
 
 from utils.database import (
     get_inventory, update_inventory, get_user_gear, BARE_HANDS,
-    save_panel_id, get_panel_id, get_id, get_embed_from_db,
-    log_activity, get_user_abilities, supabase, get_item_database
+    get_id, get_embed_from_db,
+    get_user_abilities, supabase, get_item_database,
+    checkpoint_mining_session, settle_mining_session
 )
 from utils.helpers import format_embed_from_db, format_timedelta_minutes_seconds, coerce_item_emoji
+from utils.sticky_panel import sticky_panels
+from utils.session_journal import session_journal
+from utils.game_events import publish_activity, publish_level_result
+from utils.game_odds import PICKAXE_LUCK_BONUS, ORE_DATA, ORE_XP_MAP, get_ore_table, roll_mining_yield
 
 logger = logging.getLogger(__name__)
 
 MINING_PASS_NAME = "광산 입장권"
 DEFAULT_MINE_DURATION_SECONDS = 600
 MINING_COOLDOWN_SECONDS = 10
-
-PICKAXE_LUCK_BONUS = {
-    "나무 곡괭이": 1.0, "구리 곡괭이": 1.1, "철 곡괭이": 1.25,
-    "금 곡괭이": 1.5, "다이아 곡괭이": 2.0,
-}
-
-ORE_DATA = {
-    "꽝":       {"weight": 40, "image_url": "https://saewayvzcyzueviasftu.supabase.co/storage/v1/object/public/game_assets/stone.jpg"},
-    "구리 광석": {"weight": 30, "image_url": "https://saewayvzcyzueviasftu.supabase.co/storage/v1/object/public/game_assets/cooper.jpg"},
-    "철 광석":   {"weight": 20, "image_url": "https://saewayvzcyzueviasftu.supabase.co/storage/v1/object/public/game_assets/Iron.jpg"},
-    "금 광석":    {"weight": 8,  "image_url": "https://saewayvzcyzueviasftu.supabase.co/storage/v1/object/public/game_assets/gold.jpg"},
-    "다이아몬드": {"weight": 2,  "image_url": "https://saewayvzcyzueviasftu.supabase.co/storage/v1/object/public/game_assets/diamond.jpg"}
-}
-
-ORE_XP_MAP = { "구리 광석": 10, "철 광석": 15, "금 광석": 30, "다이아몬드": 75 }
+MINING_CHECKPOINT_SECONDS = 30
 
 class MiningGameView(ui.View):
     def __init__(self, cog_instance: 'Mining', user: discord.Member, pickaxe: str, duration: int, end_time: datetime, duration_doubled: bool):
@@ -48,6 +39,9 @@ class MiningGameView(ui.View):
         self.end_time = end_time
         self.duration_doubled = duration_doubled
         self.mined_ores: Dict[str, int] = {}
+        self.xp_earned = 0
+        self.mined_count = 0
+        self.checkpoint_dirty = False
         self.luck_bonus = PICKAXE_LUCK_BONUS.get(pickaxe, 1.0)
         self.time_reduction = 0
         self.can_double_yield = False
@@ -59,6 +53,7 @@ class MiningGameView(ui.View):
         self.ui_lock = asyncio.Lock()
         self.ui_update_task = self.cog.bot.loop.create_task(self.ui_updater())
         self.initial_load_task = self.cog.bot.loop.create_task(self.load_initial_data())
+        self.checkpoint_task = self.cog.bot.loop.create_task(self.checkpoint_loop())
 
         action_button = ui.Button(label="광석 찾기", style=discord.ButtonStyle.secondary, emoji="🔍", custom_id="mine_action_button")
         action_button.callback = self.dispatch_callback
@@ -74,8 +69,28 @@ class MiningGameView(ui.View):
     def stop(self):
         if hasattr(self, 'ui_update_task') and not self.ui_update_task.done(): self.ui_update_task.cancel()
         if hasattr(self, 'initial_load_task') and not self.initial_load_task.done(): self.initial_load_task.cancel()
+        if hasattr(self, 'checkpoint_task') and not self.checkpoint_task.done(): self.checkpoint_task.cancel()
         super().stop()
 
+    def journal_state(self) -> Dict[str, Any]:
+        """재시작 후 복구에 필요한 상태를 세션 저널용 dict로 만듭니다."""
+        return {
+            "thread_id": self.message.channel.id if self.message else None, "message_id": self.message.id if self.message else None,
+            "pickaxe": self.pickaxe, "end_time": self.end_time.isoformat(), "duration_doubled": self.duration_doubled,
+            "mined_ores": self.mined_ores, "xp_earned": self.xp_earned, "mined_count": self.mined_count
+        }
+
+    async def checkpoint_loop(self):
+        """채굴 결과는 메모리에만 쌓고, 변경이 있을 때만 주기적으로 DB에 체크포인트를 남깁니다."""
+        while not self.is_finished():
+            await asyncio.sleep(MINING_CHECKPOINT_SECONDS)
+            if not self.checkpoint_dirty or self.is_finished(): continue
+            self.checkpoint_dirty = False
+            try: await checkpoint_mining_session(self.user.id, dict(self.mined_ores), self.xp_earned, self.mined_count)
+            except Exception as e:
+                self.checkpoint_dirty = True
+                logger.error(f"광산 체크포인트 저장 중 오류: {e}", exc_info=True)
+
     async def ui_updater(self):
         while not self.is_finished():
             async with self.ui_lock:
@@ -144,9 +159,7 @@ class MiningGameView(ui.View):
                 await interaction.edit_original_response(embed=self.build_embed(), view=self)
                 try:
                     await asyncio.sleep(1)
-                    ores, weights = zip(*[(k, v['weight']) for k, v in ORE_DATA.items()])
-                    new_weights = [w * self.luck_bonus if o != "꽝" else w for o, w in zip(ores, weights)]
-                    self.discovered_ore = random.choices(ores, weights=new_weights, k=1)[0]
+                    self.discovered_ore = get_ore_table(self.luck_bonus).sample()
                     if self.discovered_ore == "꽝": self.state = "discovered"; button.label = "다시 찾아보기"; button.emoji = "🔍"
                     else: self.state = "discovered"; button.label = "채굴하기"; button.style = discord.ButtonStyle.primary; button.emoji = "⛏️"
                 finally:
@@ -169,29 +182,15 @@ class MiningGameView(ui.View):
                     await interaction.edit_original_response(embed=self.build_embed(), view=self)
                     await asyncio.sleep(mining_duration)
                     if self.is_finished(): return
-                    quantity = 2 if self.can_double_yield and random.random() < 0.20 else 1
+                    quantity = roll_mining_yield(self.can_double_yield)
                     xp_earned = ORE_XP_MAP.get(self.discovered_ore, 0) * quantity
                     self.mined_ores[self.discovered_ore] = self.mined_ores.get(self.discovered_ore, 0) + quantity
-                    try:
-                        session_res = await supabase.table('mining_sessions').select('mined_ores_json').eq('user_id', str(self.user.id)).maybe_single().execute()
-                        if session_res and session_res.data:
-                            current_ores_raw = session_res.data.get('mined_ores_json'); current_ores = {}
-                            if isinstance(current_ores_raw, str):
-                                try: current_ores = json.loads(current_ores_raw)
-                                except json.JSONDecodeError: pass
-                            elif isinstance(current_ores_raw, dict): current_ores = current_ores_raw
-                            current_ores[self.discovered_ore] = current_ores.get(self.discovered_ore, 0) + quantity
-                            await supabase.table('mining_sessions').update({'mined_ores_json': current_ores}).eq('user_id', str(self.user.id)).execute()
-                    except Exception as db_error: logger.error(f"광산 채굴량 DB 업데이트 중 오류 발생: {db_error}", exc_info=True)
-                    await update_inventory(self.user.id, self.discovered_ore, quantity)
-                    await log_activity(self.user.id, 'mining', amount=quantity, xp_earned=xp_earned)
+                    # 광석/XP/활동 기록은 세션 종료 시 settle_mining_session에서 한 번에 반영됩니다.
+                    self.xp_earned += xp_earned; self.mined_count += quantity; self.checkpoint_dirty = True
+                    session_journal.put("mining", self.user.id, self.journal_state())
                     ore_info = get_item_database().get(self.discovered_ore, {}); ore_emoji = str(coerce_item_emoji(ore_info.get('emoji', '💎')))
                     self.last_result_text = f"✅ {ore_emoji} **{self.discovered_ore}** {quantity}개를 획득했습니다! (`+{xp_earned} XP`)"
                     if quantity > 1: self.last_result_text += f"\n\n✨ **풍부한 광맥** 능력으로 광석을 2개 획득했습니다!"
-                    if xp_earned > 0:
-                        res = await supabase.rpc('add_xp', {'p_user_id': self.user.id, 'p_xp_to_add': xp_earned, 'p_source': 'mining'}).execute()
-                        if res.data and (level_cog := self.cog.bot.get_cog("LevelSystem")):
-                            await level_cog.handle_level_up_event(self.user, res.data)
                     self.state = "idle"
                     button.label = "광석 찾기"; button.style = discord.ButtonStyle.secondary; button.emoji = "🔍"; button.disabled = False
                     try: await interaction.edit_original_response(embed=self.build_embed(), view=self)
@@ -216,6 +215,7 @@ class Mining(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.active_sessions: Dict[int, Dict] = {}
+        self.settling_users: Set[int] = set()
         self.active_abilities_cache: Dict[int, List[str]] = {}
         self.check_expired_mines_from_db.start()
         
@@ -230,7 +230,8 @@ class Mining(commands.Cog):
         
         for session in res.data:
             user_id = int(session['user_id'])
-            if user_id not in self.active_sessions:
+            # 정산에 실패해 남아 있는 세션도 여기서 1분마다 다시 정산을 시도합니다.
+            if user_id not in self.active_sessions or self.active_sessions[user_id].get("closing"):
                 logger.warning(f"DB에서 방치된 광산 세션(유저: {user_id})을 발견하여 안전장치로 종료합니다.")
                 await self.close_mine_session(user_id)
 
@@ -245,9 +246,10 @@ class Mining(commands.Cog):
             thread_id = self.active_sessions[user.id].get("thread_id")
             if thread := self.bot.get_channel(thread_id):
                 await interaction.followup.send(f"이미 광산에 입장해 있습니다. {thread.mention}", ephemeral=True)
-            else:
-                await self.close_mine_session(user.id)
+            elif await self.close_mine_session(user.id):
                 await interaction.followup.send("이전 광산 정보를 강제 초기화했습니다. 다시 시도해주세요.", ephemeral=True)
+            else:
+                await interaction.followup.send("이전 광산을 정산하는 중 오류가 발생했습니다. 잠시 후 다시 시도해주세요.", ephemeral=True)
             return
 
         inventory, gear, user_abilities = await asyncio.gather(get_inventory(user), get_user_gear(user), get_user_abilities(user.id))
@@ -279,6 +281,7 @@ class Mining(commands.Cog):
         embed = view.build_embed()
         message = await thread.send(embed=embed, view=view)
         view.message = message
+        session_journal.put("mining", user.id, view.journal_state())
         
         await interaction.followup.send(f"광산에 입장했습니다! {thread.mention}", ephemeral=True)
 
@@ -298,31 +301,57 @@ class Mining(commands.Cog):
                  await self.close_mine_session(user_id)
         except asyncio.CancelledError: pass
             
-    async def close_mine_session(self, user_id: int):
-        res = await supabase.table('mining_sessions').select('*').eq('user_id', str(user_id)).maybe_single().execute()
-        session_data = res.data if res and res.data else None
-        
-        if in_memory_session := self.active_sessions.pop(user_id, None):
-            if task := in_memory_session.get("task"): task.cancel()
-            if view := in_memory_session.get("view"): view.stop()
-        
+    async def close_mine_session(self, user_id: int) -> bool:
+        """
+        광산 세션을 정산하고 닫습니다. 정산했거나 이미 정산된 세션이면 True를 반환합니다.
+        정산이 DB 오류로 실패하면 메모리 세션과 저널을 그대로 두고 False를 반환합니다.
+        (1분 주기 점검이나 재시작 복구에서 다시 정산합니다.)
+        """
+        if user_id in self.settling_users: return False
+        settle_args = {}
+        if in_memory_session := self.active_sessions.get(user_id):
+            in_memory_session["closing"] = True
+            # 타이머가 직접 호출한 경우 자기 자신을 취소하면 정산 도중에 중단되므로 건너뜁니다.
+            if (task := in_memory_session.get("task")) and task is not asyncio.current_task(): task.cancel()
+            if view := in_memory_session.get("view"):
+                view.stop()
+                settle_args = {'mined_ores': dict(view.mined_ores), 'xp_earned': view.xp_earned, 'mined_count': view.mined_count}
+        elif journaled := session_journal.get("mining", user_id):
+            # 재시작으로 메모리 상태가 사라졌다면, 체크포인트보다 최신인 저널 값으로 정산합니다.
+            settle_args = {'mined_ores': journaled.get('mined_ores', {}), 'xp_earned': journaled.get('xp_earned', 0), 'mined_count': journaled.get('mined_count', 0)}
+
+        # 메모리에도 저널에도 없으면(방치된 세션) 마지막 체크포인트 기준으로 정산됩니다.
+        self.settling_users.add(user_id)
+        try: session_data = await settle_mining_session(user_id, **settle_args)
+        finally: self.settling_users.discard(user_id)
+        if session_data is None:
+            logger.error(f"[{user_id}] 광산 세션 정산 실패 (DB 오류). 채굴 기록을 유지하고 나중에 다시 정산합니다.")
+            return False
+
+        self.active_sessions.pop(user_id, None)
+        session_journal.delete("mining", user_id)
         if not session_data:
             logger.warning(f"[{user_id}] 종료할 광산 세션이 DB에 없습니다 (이미 처리됨).")
-            return
+            return True
 
         thread_id = int(session_data['thread_id'])
-        logger.info(f"[{user_id}] 광산 세션(스레드: {thread_id}) 종료 시작.")
-        await supabase.table('mining_sessions').delete().eq('user_id', str(user_id)).execute()
+        logger.info(f"[{user_id}] 광산 세션(스레드: {thread_id}) 정산 및 종료 완료.")
+
+        mined_ores_raw = session_data.get('mined_ores_json', "{}")
+        mined_ores = {}
+        if isinstance(mined_ores_raw, str):
+            try: mined_ores = json.loads(mined_ores_raw)
+            except json.JSONDecodeError: pass
+        elif isinstance(mined_ores_raw, dict):
+            mined_ores = mined_ores_raw
+
+        # mining 활동은 정산 RPC가 기록하므로, 정산이 끝난 뒤 세션 전체 채굴 횟수로 한 번만 발행합니다.
+        publish_level_result(user_id, session_data.get('level_result'))
+        if mined_count := settle_args.get('mined_count') or session_data.get('mined_count') or sum(mined_ores.values()):
+            publish_activity(user_id, "mining", amount=mined_count)
 
         user = self.bot.get_user(user_id)
         if user:
-            mined_ores_raw = session_data.get('mined_ores_json', "{}")
-            mined_ores = {}
-            if isinstance(mined_ores_raw, str):
-                try: mined_ores = json.loads(mined_ores_raw)
-                except json.JSONDecodeError: pass
-            elif isinstance(mined_ores_raw, dict):
-                mined_ores = mined_ores_raw
 
             item_db = get_item_database()
             mined_ores_lines = []
@@ -348,31 +377,57 @@ class Mining(commands.Cog):
             await asyncio.sleep(1)
             await thread.delete()
         except (discord.NotFound, discord.Forbidden): pass
+        return True
 
     async def register_persistent_views(self):
         self.bot.add_view(MiningPanelView(self))
 
+    async def recover_sessions(self):
+        """재시작 전에 진행 중이던 광산을 저널에서 되살려 View와 타이머를 다시 연결합니다."""
+        now = datetime.now(timezone.utc)
+        for user_id_str, state in session_journal.sessions("mining").items():
+            user_id = int(user_id_str)
+            if user_id in self.active_sessions: continue
+            try:
+                end_time = datetime.fromisoformat(state['end_time'])
+                remaining = int((end_time - now).total_seconds())
+                thread = None
+                if thread_id := state.get('thread_id'):
+                    try: thread = self.bot.get_channel(thread_id) or await self.bot.fetch_channel(thread_id)
+                    except (discord.NotFound, discord.Forbidden): thread = None
+                member = thread.guild.get_member(user_id) if thread else None
+                if remaining <= 5 or not thread or not member:
+                    await self.close_mine_session(user_id)
+                    continue
+
+                view = MiningGameView(self, member, state['pickaxe'], remaining, end_time, state.get('duration_doubled', False))
+                view.mined_ores = dict(state.get('mined_ores') or {})
+                view.xp_earned, view.mined_count = state.get('xp_earned', 0), state.get('mined_count', 0)
+                try:
+                    message = await thread.fetch_message(state['message_id'])
+                    await message.edit(embed=view.build_embed(), view=view)
+                except (discord.NotFound, discord.HTTPException, KeyError, TypeError):
+                    message = await thread.send(embed=view.build_embed(), view=view)
+                view.message = message
+
+                session_task = self.bot.loop.create_task(self.mine_session_timer(user_id, thread, remaining))
+                self.active_sessions[user_id] = {"thread_id": thread.id, "view": view, "task": session_task}
+                session_journal.put("mining", user_id, view.journal_state())
+                logger.info(f"[{user_id}] 광산 세션을 복구했습니다. (남은 시간: {remaining}초)")
+            except Exception as e:
+                logger.error(f"[{user_id}] 광산 세션 복구 중 오류: {e}", exc_info=True)
+
     async def regenerate_panel(self, channel: discord.TextChannel, panel_key: str = "panel_mining", last_log: Optional[discord.Embed] = None):
-        if last_log:
-            try: await channel.send(embed=last_log)
-            except discord.HTTPException as e: logger.error(f"광산 로그 전송 실패: {e}")
-        
         panel_name = panel_key.replace("panel_", "")
-        if panel_info := get_panel_id(panel_name):
-            try:
-                if old_channel := self.bot.get_channel(panel_info['channel_id']):
-                    msg = await old_channel.fetch_message(panel_info['message_id'])
-                    await msg.delete()
-            except (discord.NotFound, discord.Forbidden): pass
-        embed_data = await get_embed_from_db(panel_key)
-        if not embed_data: return logger.error(f"DB에서 '{panel_key}' 임베드를 찾을 수 없습니다.")
-        
-        embed = format_embed_from_db(embed_data)
-        
-        view = MiningPanelView(self)
-        new_message = await channel.send(embed=embed, view=view)
-        await save_panel_id(panel_name, new_message.id, channel.id)
-        logger.info(f"✅ {panel_key} 패널을 성공적으로 생성했습니다. (채널: #{channel.name})")
+
+        async def build_panel():
+            embed_data = await get_embed_from_db(panel_key)
+            if not embed_data:
+                logger.error(f"DB에서 '{panel_key}' 임베드를 찾을 수 없습니다.")
+                return None
+            return format_embed_from_db(embed_data), MiningPanelView(self)
+
+        await sticky_panels.request(channel, panel_name, build_panel, log_embed=last_log, force=last_log is None)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Mining(bot))
@@ -11,10 +11,11 @@ from typing import Optional, Dict, List, Any
 
 from utils.database import (
     supabase, get_user_pet, get_config, get_id,
-    save_panel_id, get_panel_id, get_embed_from_db,
+    get_embed_from_db,
     get_cooldown, set_cooldown, create_pvp_match, get_pvp_match, update_pvp_match
 )
 from utils.helpers import format_embed_from_db, create_bar
+from utils.sticky_panel import sticky_panels
 
 logger = logging.getLogger(__name__)
 
@@ -358,29 +359,16 @@ class PetPvP(commands.Cog, name="PetPvP"):
             except (discord.NotFound, discord.Forbidden): pass
             
     async def regenerate_panel(self, channel: discord.TextChannel, panel_key: str = "panel_pet_pvp", last_log: Optional[discord.Embed] = None):
-        if last_log:
-            try:
-                await channel.send(embed=last_log)
-            except discord.HTTPException as e:
-                logger.error(f"PvP 로그 전송 실패: {e}")
-
         panel_name = panel_key.replace("panel_", "")
-        if panel_info := get_panel_id(panel_name):
-            try:
-                if old_channel := self.bot.get_channel(panel_info['channel_id']):
-                    msg = await old_channel.fetch_message(panel_info['message_id'])
-                    await msg.delete()
-            except (discord.NotFound, discord.Forbidden): pass
-        
-        embed_data = await get_embed_from_db(panel_key)
-        if not embed_data:
-            return logger.error(f"DB에서 '{panel_key}' 임베드를 찾을 수 없습니다.")
-        
-        embed = discord.Embed.from_dict(embed_data)
-        view = PetPvPPanelView(self)
-        new_message = await channel.send(embed=embed, view=view)
-        await save_panel_id(panel_name, new_message.id, channel.id)
-        logger.info(f"✅ {panel_key} 패널을 성공적으로 생성했습니다. (채널: #{channel.name})")
+
+        async def build_panel():
+            embed_data = await get_embed_from_db(panel_key)
+            if not embed_data:
+                logger.error(f"DB에서 '{panel_key}' 임베드를 찾을 수 없습니다.")
+                return None
+            return discord.Embed.from_dict(embed_data), PetPvPPanelView(self)
+
+        await sticky_panels.request(channel, panel_name, build_panel, log_embed=last_log, force=last_log is None)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(PetPvP(bot))
@@ -14,12 +14,13 @@ from collections import defaultdict
 from postgrest.exceptions import APIError
 
 from utils.database import (
-    supabase, get_inventory, update_inventory, get_item_database,
+    supabase, get_inventory, update_inventory, update_inventory_many, get_item_database,
     save_panel_id, get_panel_id, get_embed_from_db, set_cooldown, get_cooldown,
     save_config_to_db, delete_config_from_db, get_id, get_user_pet,
     get_wallet, update_wallet, get_inventories_for_users
 )
 from utils.helpers import format_embed_from_db
+from utils.game_events import game_events, publish_activity, PetLevelUp
 
 logger = logging.getLogger(__name__)
 
@@ -385,11 +386,17 @@ class PetSystem(commands.Cog):
         self.hatch_checker.start()
         self.hunger_and_stat_decay.start()
         self.auto_refresh_pet_uis.start()
+        game_events.subscribe(PetLevelUp, self.on_pet_level_up, name="pet_level_up")
 
     def cog_unload(self):
         self.hatch_checker.cancel()
         self.hunger_and_stat_decay.cancel()
         self.auto_refresh_pet_uis.cancel()
+        game_events.unsubscribe(PetLevelUp, self.on_pet_level_up)
+
+    async def on_pet_level_up(self, event: PetLevelUp):
+        await self.notify_pet_level_up(event.user_id, event.new_level, event.points_awarded)
+        if event.check_evolution: await self.check_and_process_auto_evolution({event.user_id})
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -560,6 +567,7 @@ class PetSystem(commands.Cog):
                 'hatches_at': hatches_at.isoformat(), 'created_at': now.isoformat(), 'thread_id': thread.id
             }).execute()
             await update_inventory(user.id, egg_name, -1)
+            publish_activity(user.id, "pet_incubate")
             pet_data = pet_insert_res.data[0]
             pet_data['pet_species'] = pet_species_data
             embed = self.build_pet_ui_embed(user, pet_data)
@@ -875,8 +883,9 @@ class PetSystem(commands.Cog):
         next_stage_info = stage_info_json.get(str(next_stage_num))
         required_items = next_stage_info.get('items', {})
         
-        tasks = [update_inventory(user_id, item, -qty) for item, qty in required_items.items()]
-        await asyncio.gather(*tasks)
+        if not await update_inventory_many(user_id, {item: -qty for item, qty in required_items.items()}):
+            logger.warning(f"펫 진화 재료 차감 실패 (User: {user_id}). 진화를 진행하지 않습니다.")
+            return False
 
         res = await supabase.rpc('evolve_pet_stage', {'p_user_id': user_id}).single().execute()
 
@@ -885,8 +894,7 @@ class PetSystem(commands.Cog):
             return True
         else:
             logger.error(f"펫 진화 DB 함수 호출 실패 (User: {user_id}). 재료를 환불합니다.")
-            refund_tasks = [update_inventory(user_id, item, qty) for item, qty in required_items.items()]
-            await asyncio.gather(*refund_tasks)
+            await update_inventory_many(user_id, required_items)
             return False
 
     async def update_pet_ui(self, user_id: int, channel: discord.TextChannel, message: Optional[discord.Message] = None, is_refresh: bool = False, pet_data_override: Optional[Dict] = None):
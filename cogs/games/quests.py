@@ -4,76 +4,46 @@ import discord
 from discord.ext import commands
 from discord import ui
 import logging
-import time
-from typing import Optional, Dict, Any
-from datetime import datetime, timezone, timedelta
-import asyncio
+from typing import Optional, List
 
 from utils.database import (
-    get_all_user_stats, 
     get_config,
-    save_panel_id, get_panel_id, get_embed_from_db,
+    get_embed_from_db,
     update_wallet, set_cooldown, get_cooldown, log_activity,
-    supabase, get_id
+    supabase, get_id, has_checked_in_today, claim_daily_check_in, db_deadline
 )
 from utils.helpers import format_embed_from_db
+from utils.game_events import game_events, publish_level_result, ActivityLogged
+from utils.quest_engine import QuestDefinition, QuestProgress, quest_counters, evaluate_quests, period_key
+from utils.sticky_panel import sticky_panels
+from utils.user_locks import user_locks, BUSY_MESSAGE
 
 logger = logging.getLogger(__name__)
 
-KST = timezone(timedelta(hours=9))
-
-def get_current_week_start_end_utc() -> (str, str):
-    """현재 KST 기준의 주(월요일 시작)의 시작과 끝 시간을 UTC ISO 형식으로 반환합니다."""
-    now_kst = datetime.now(KST)
-    start_of_week_kst = now_kst - timedelta(days=now_kst.weekday())
-    start_of_week_kst = start_of_week_kst.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    end_of_week_kst = start_of_week_kst + timedelta(days=7)
-    
-    start_of_week_utc = start_of_week_kst.astimezone(timezone.utc).isoformat()
-    end_of_week_utc = end_of_week_kst.astimezone(timezone.utc).isoformat()
-    
-    return start_of_week_utc, end_of_week_utc
-
-QUEST_REWARDS = {
-    "daily": {
-        "attendance": {"coin": 50, "xp": 10},
-        "chat": {"coin": 50, "xp": 20},
-        "voice": {"coin": 100, "xp": 50},
-        "dice_game": {"coin": 30, "xp": 15},
-        "slot_machine": {"coin": 30, "xp": 15},
-        "all_complete": {"coin": 200, "xp": 100} # 모든 일일 퀘스트 완료 보너스
-    },
-    "weekly": {
-        "attendance": {"coin": 300, "xp": 150},
-        "chat": {"coin": 300, "xp": 150},
-        "voice": {"coin": 600, "xp": 300},
-        "dice_game": {"coin": 200, "xp": 100},
-        "slot_machine": {"coin": 200, "xp": 100},
-        "fishing": {"coin": 250, "xp": 120},
-        "all_complete": {"coin": 1500, "xp": 750} # 모든 주간 퀘스트 완료 보너스
-    }
-}
-
-# 새로운 일일 퀘스트 목록
-DAILY_QUESTS = {
-    "attendance": {"name": "출석 체크하기", "goal": 1},
-    "chat": {"name": "채팅 5회 입력하기", "goal": 5},
-    "voice": {"name": "음성 채널에 30분 참가하기", "goal": 30},
-    "dice_game": {"name": "주사위 게임 1회 참여하기", "goal": 1},
-    "slot_machine": {"name": "슬롯 머신 1회 참여하기", "goal": 1},
+# 퀘스트는 활동 카운터(utils.quest_engine.ACTIVITY_COUNTERS)의 목표치로 정의합니다.
+QUESTS = {
+    "daily": (
+        QuestDefinition("attendance", "출석 체크하기", "check_in_count", 1, coin=50, xp=10),
+        QuestDefinition("chat", "채팅 5회 입력하기", "chat_count", 5, coin=50, xp=20),
+        QuestDefinition("voice", "음성 채널에 30분 참가하기", "voice_minutes", 30, coin=100, xp=50),
+        QuestDefinition("dice_game", "주사위 게임 1회 참여하기", "dice_game_count", 1, coin=30, xp=15),
+        QuestDefinition("slot_machine", "슬롯 머신 1회 참여하기", "slot_machine_count", 1, coin=30, xp=15),
+    ),
+    "weekly": (
+        QuestDefinition("attendance", "출석 체크 5회하기", "check_in_count", 5, coin=300, xp=150),
+        QuestDefinition("chat", "채팅 30회 입력하기", "chat_count", 30, coin=300, xp=150),
+        QuestDefinition("voice", "음성 채널에 300분 참가하기", "voice_minutes", 300, coin=600, xp=300),
+        QuestDefinition("dice_game", "주사위 게임 5회 참여하기", "dice_game_count", 5, coin=200, xp=100),
+        QuestDefinition("slot_machine", "슬롯 머신 5회 참여하기", "slot_machine_count", 5, coin=200, xp=100),
+        QuestDefinition("fishing", "낚시 5회 성공하기", "fishing_count", 5, coin=250, xp=120),
+    ),
 }
 
-# 새로운 주간 퀘스트 목록
-WEEKLY_QUESTS = {
-    "attendance": {"name": "출석 체크 5회하기", "goal": 5},
-    "chat": {"name": "채팅 30회 입력하기", "goal": 30},
-    "voice": {"name": "음성 채널에 300분 참가하기", "goal": 300},
-    "dice_game": {"name": "주사위 게임 5회 참여하기", "goal": 5},
-    "slot_machine": {"name": "슬롯 머신 5회 참여하기", "goal": 5},
-    "fishing": {"name": "낚시 5회 성공하기", "goal": 5},
+# 모든 퀘스트 완료 보너스
+ALL_COMPLETE_REWARDS = {
+    "daily": {"coin": 200, "xp": 100},
+    "weekly": {"coin": 1500, "xp": 750},
 }
-# ▲▲▲ [수정] 완료 ▲▲▲
 
 
 class TaskBoardView(ui.View):
@@ -90,42 +60,41 @@ class TaskBoardView(ui.View):
         self.add_item(quest_button)
 
     async def check_in_callback(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
         user = interaction.user
-        
-        stats = await get_all_user_stats(user.id)
-        if stats.get('daily', {}).get('check_in_count', 0) > 0:
-            await interaction.followup.send("❌ 오늘은 이미 출석 체크를 완료했습니다.", ephemeral=True)
-            return
-
-        reward_str = get_config("DAILY_CHECK_REWARD", "100").strip('"')
-        attendance_reward = int(reward_str)
-        
-        await log_activity(user.id, 'daily_check_in', coin_earned=attendance_reward, xp_earned=0)
-        await update_wallet(user, attendance_reward)
-        
+        if has_checked_in_today(user.id):
+            return await interaction.response.send_message("❌ 오늘은 이미 출석 체크를 완료했습니다.", ephemeral=True)
+        if user_locks.is_busy(user.id):
+            return await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+
+        attendance_reward = int(get_config("DAILY_CHECK_REWARD", "100").strip('"'))
+        async with user_locks.hold(user.id):
+            with db_deadline(interaction):
+                claimed = await claim_daily_check_in(user.id, attendance_reward)
+        if claimed is None:
+            return await interaction.followup.send("❌ 출석 체크를 처리하는 중 오류가 발생했습니다. 잠시 후 다시 시도해주세요.", ephemeral=True)
+        if not claimed:
+            return await interaction.followup.send("❌ 오늘은 이미 출석 체크를 완료했습니다.", ephemeral=True)
+
         await interaction.followup.send(f"✅ 출석 체크 완료! **`{attendance_reward}`**{self.cog.currency_icon}을(를) 획득했습니다.", ephemeral=True)
 
         log_embed = None
         if embed_data := await get_embed_from_db("log_daily_check"):
             log_embed = format_embed_from_db(embed_data, user_mention=user.mention, reward=attendance_reward, currency_icon=self.cog.currency_icon)
-        
-        if log_embed:
-            try: await interaction.channel.send(embed=log_embed)
-            except Exception as e: logger.error(f"출석체크 공개 로그 메시지 전송 실패 (채널: {interaction.channel.id}): {e}")
-
             if self.cog.log_channel_id and self.cog.log_channel_id != interaction.channel.id:
                 if log_channel := self.cog.bot.get_channel(self.cog.log_channel_id):
                     try: await log_channel.send(embed=log_embed)
                     except Exception as e: logger.error(f"별도 출석체크 로그 채널로 전송 실패: {e}")
-        
-        await self.cog.regenerate_panel(interaction.channel)
+
+        # 공개 로그와 패널 재게시는 고정 패널 관리자가 모아서 처리하므로, 아침 출석이 몰려도 채널 메시지는 몇 초에 한 번만 나갑니다.
+        await self.cog.regenerate_panel(interaction.channel, last_log=log_embed)
 
     async def open_quest_view(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         view = QuestView(interaction.user, self.cog)
-        embed = await view.build_embed()
-        await view.update_components()
+        progress = await view.get_progress()
+        embed = view.build_embed(progress)
+        await view.update_components(progress)
         await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
 class QuestView(ui.View):
@@ -134,92 +103,40 @@ class QuestView(ui.View):
         self.user = user
         self.cog = cog_instance
         self.current_tab = "daily"
-        # ▼▼▼ [수정] 캐싱을 위한 속성 추가 ▼▼▼
-        self.weekly_progress_cache: Optional[Dict] = None
-        self.cache_timestamp: float = 0.0
+
+    @property
+    def cooldown_key(self) -> str:
+        return f"quest_claimed_{self.current_tab}_all_{period_key(self.current_tab)}"
+
+    async def get_progress(self) -> List[QuestProgress]:
+        """진행도는 공유 카운터 캐시에서 메모리로 평가합니다. (통계 뷰는 재시작 후 처음 한 번만 조회)"""
+        return evaluate_quests(QUESTS[self.current_tab], await quest_counters.get(self.current_tab, self.user.id))
 
     async def update_view(self, interaction: discord.Interaction):
         if not interaction.response.is_done(): await interaction.response.defer()
-        embed = await self.build_embed()
-        await self.update_components()
+        progress = await self.get_progress()
+        embed = self.build_embed(progress)
+        await self.update_components(progress)
         await interaction.edit_original_response(embed=embed, view=self)
 
-    async def _get_weekly_progress(self) -> Dict[str, int]:
-        """
-        [수정됨] 주간 활동량을 weekly_stats 뷰에서 직접 조회합니다.
-        이제 RPC를 여러 번 호출할 필요 없이, DB 뷰가 자동으로 계산한 값을 가져옵니다.
-        """
-        # 1. 캐시 확인 (30초)
-        if self.weekly_progress_cache and time.time() - self.cache_timestamp < 30:
-            return self.weekly_progress_cache
-
-        try:
-            # 2. DB의 'weekly_stats' 뷰에서 내 정보 조회
-            #    이미 DB 뷰에 채팅, 도박, 낚시 등 모든 정보가 정의되어 있으므로 한 번에 가져옵니다.
-            res = await supabase.table('weekly_stats').select('*').eq('user_id', str(self.user.id)).maybe_single().execute()
-            
-            # 3. 데이터가 없으면(이번 주 활동 없음) 빈 딕셔너리 반환
-            data = res.data if res and res.data else {}
-            
-            # 4. 캐시 업데이트 및 반환
-            self.weekly_progress_cache = data
-            self.cache_timestamp = time.time()
-            return data
-
-        except Exception as e:
-            logger.error(f"주간 퀘스트 진행 상황 조회 중 오류: {e}", exc_info=True)
-            return {}
-            
-    async def build_embed(self) -> discord.Embed:
-        if self.current_tab == "daily":
-            summary = await get_all_user_stats(self.user.id)
-            stats_to_show = summary.get("daily", {})
-        else:
-            stats_to_show = await self._get_weekly_progress()
-        
+    def build_embed(self, progress: List[QuestProgress]) -> discord.Embed:
         embed = discord.Embed(color=0x2ECC71)
         embed.set_author(name=f"{self.user.display_name}님의 퀘스트", icon_url=self.user.display_avatar.url if self.user.display_avatar else None)
-        
-        quests_to_show = DAILY_QUESTS if self.current_tab == "daily" else WEEKLY_QUESTS
-        rewards = QUEST_REWARDS[self.current_tab]
-
-        # ▼▼▼ [수정] progress_key_map에 새로운 퀘스트 종류를 추가합니다. ▼▼▼
-        progress_key_map = {
-            "attendance": "check_in_count",
-            "voice": "voice_minutes",
-            "fishing": "fishing_count",
-            "chat": "chat_count",
-            "dice_game": "dice_game_count",
-            "slot_machine": "slot_machine_count"
-        }
-        # ▲▲▲ [수정] 완료 ▲▲▲
-        
         embed.title = "📅 일일 퀘스트" if self.current_tab == "daily" else "🗓️ 주간 퀘스트"
-        all_complete = True
-        for key, quest in quests_to_show.items():
-            db_key = progress_key_map.get(key) # .get()으로 안전하게 접근
-            if not db_key: continue # 맵에 없으면 건너뜀
-
-            current = stats_to_show.get(db_key, 0)
-            goal = quest["goal"]
-            reward_coin = rewards.get(key, {}).get("coin", 0)
-            reward_xp = rewards.get(key, {}).get("xp", 0)
-            is_complete = current >= goal
-            if not is_complete: all_complete = False
-            emoji = "✅" if is_complete else "❌"
-            field_name = f"{emoji} {quest['name']}"
-            field_value = f"> ` {min(current, goal)} / {goal} `\n> **보상:** `{reward_coin:,}`{self.cog.currency_icon} + `{reward_xp:,}` XP"
-            embed.add_field(name=field_name, value=field_value, inline=False)
-        
-        if all_complete:
-            all_in_reward_coin = rewards['all_complete'].get("coin", 0)
-            all_in_reward_xp = rewards['all_complete'].get("xp", 0)
-            embed.set_footer(text=f"🎉 모든 퀘스트 완료! 추가 보상: {all_in_reward_coin:,}{self.cog.currency_icon} + {all_in_reward_xp:,} XP")
+
+        for p in progress:
+            emoji = "✅" if p.is_complete else "❌"
+            field_value = f"> ` {min(p.current, p.quest.goal)} / {p.quest.goal} `\n> **보상:** `{p.quest.coin:,}`{self.cog.currency_icon} + `{p.quest.xp:,}` XP"
+            embed.add_field(name=f"{emoji} {p.quest.name}", value=field_value, inline=False)
+
+        if all(p.is_complete for p in progress):
+            bonus = ALL_COMPLETE_REWARDS[self.current_tab]
+            embed.set_footer(text=f"🎉 모든 퀘스트 완료! 추가 보상: {bonus['coin']:,}{self.cog.currency_icon} + {bonus['xp']:,} XP")
         else:
             embed.set_footer(text="퀘스트를 완료하고 보상을 받으세요!")
         return embed
 
-    async def update_components(self):
+    async def update_components(self, progress: List[QuestProgress]):
         for item in self.children:
             if isinstance(item, ui.Button) and item.custom_id.startswith("tab_"):
                 item.style = discord.ButtonStyle.primary if item.custom_id == f"tab_{self.current_tab}" else discord.ButtonStyle.secondary
@@ -228,46 +145,11 @@ class QuestView(ui.View):
         claim_button = next((child for child in self.children if isinstance(child, ui.Button) and child.custom_id == "claim_rewards_button"), None)
         if not claim_button: return
 
-        quests_to_check = DAILY_QUESTS if self.current_tab == "daily" else WEEKLY_QUESTS
-        
-        if self.current_tab == "daily":
-            summary = await get_all_user_stats(self.user.id)
-            stats_to_check = summary.get("daily", {})
-        else:
-            stats_to_check = await self._get_weekly_progress()
-        
-        # ▼▼▼ [수정] 여기에 progress_key_map을 build_embed와 동일하게 추가합니다. ▼▼▼
-        progress_key_map = {
-            "attendance": "check_in_count",
-            "voice": "voice_minutes",
-            "fishing": "fishing_count",
-            "chat": "chat_count",
-            "dice_game": "dice_game_count",
-            "slot_machine": "slot_machine_count"
-        }
-        # ▲▲▲ [수정] 완료 ▲▲▲
-
-        all_quests_complete = True
-        for key, quest in quests_to_check.items():
-            db_key = progress_key_map.get(key) # .get()으로 안전하게 접근
-            if not db_key:
-                all_quests_complete = False
-                break
-            if stats_to_check.get(db_key, 0) < quest["goal"]:
-                all_quests_complete = False
-                break
-        
-        today_str = datetime.now(KST).strftime('%Y-%m-%d')
-        week_start_str = (datetime.now(KST) - timedelta(days=datetime.now(KST).weekday())).strftime('%Y-%m-%d')
-        period_str = today_str if self.current_tab == "daily" else week_start_str
-        cooldown_key = f"quest_claimed_{self.current_tab}_all_{period_str}"
-        already_claimed = await get_cooldown(self.user.id, cooldown_key) > 0
-
-        if already_claimed:
+        if await get_cooldown(self.user.id, self.cooldown_key) > 0:
             claim_button.label = "오늘의 보상을 받았습니다" if self.current_tab == "daily" else "이번 주 보상을 받았습니다"
             claim_button.style = discord.ButtonStyle.secondary
             claim_button.disabled = True
-        elif all_quests_complete:
+        elif all(p.is_complete for p in progress):
             claim_button.label = "완료한 퀘스트 보상 받기"
             claim_button.style = discord.ButtonStyle.success
             claim_button.disabled = False
@@ -288,62 +170,60 @@ class QuestView(ui.View):
     
     @ui.button(label="보상 받기", style=discord.ButtonStyle.success, emoji="💰", custom_id="claim_rewards_button", row=1)
     async def claim_rewards_button(self, interaction: discord.Interaction, button: ui.Button):
+        if user_locks.is_busy(self.user.id):
+            return await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True)
         await interaction.response.defer(ephemeral=True)
-        quests_to_check = DAILY_QUESTS if self.current_tab == "daily" else WEEKLY_QUESTS
-        rewards = QUEST_REWARDS[self.current_tab]
-        
-        total_coin_reward, total_xp_reward, reward_details = 0, 0, []
-
-        for key, quest in quests_to_check.items():
-            reward_info = rewards.get(key, {})
-            coin, xp = reward_info.get("coin", 0), reward_info.get("xp", 0)
-            total_coin_reward += coin; total_xp_reward += xp
-            reward_details.append(f"・{quest['name']}: `{coin:,}`{self.cog.currency_icon} + `{xp:,}` XP")
-        
-        all_complete_reward = rewards.get("all_complete", {})
-        all_coin, all_xp = all_complete_reward.get("coin", 0), all_complete_reward.get("xp", 0)
-        total_coin_reward += all_coin; total_xp_reward += all_xp
-        reward_details.append(f"・모든 퀘스트 완료 보너스: `{all_coin:,}`{self.cog.currency_icon} + `{all_xp:,}` XP")
-        
-        today_str = datetime.now(KST).strftime('%Y-%m-%d')
-        week_start_str = (datetime.now(KST) - timedelta(days=datetime.now(KST).weekday())).strftime('%Y-%m-%d')
-        period_str = today_str if self.current_tab == "daily" else week_start_str
-        cooldown_key = f"quest_claimed_{self.current_tab}_all_{period_str}"
+        async with user_locks.hold(self.user.id):
+            await self._claim_rewards(interaction)
+        await self.update_view(interaction)
+
+    async def _claim_rewards(self, interaction: discord.Interaction):
+        progress = await self.get_progress()
+        if not all(p.is_complete for p in progress):
+            return await interaction.followup.send("❌ 아직 완료하지 않은 퀘스트가 있습니다.", ephemeral=True)
+        cooldown_key = self.cooldown_key
+        if await get_cooldown(self.user.id, cooldown_key) > 0:
+            return await interaction.followup.send("❌ 이미 보상을 받았습니다.", ephemeral=True)
+
+        bonus = ALL_COMPLETE_REWARDS[self.current_tab]
+        reward_details = [f"・{p.quest.name}: `{p.quest.coin:,}`{self.cog.currency_icon} + `{p.quest.xp:,}` XP" for p in progress]
+        reward_details.append(f"・모든 퀘스트 완료 보너스: `{bonus['coin']:,}`{self.cog.currency_icon} + `{bonus['xp']:,}` XP")
+        total_coin_reward = sum(p.quest.coin for p in progress) + bonus['coin']
+        total_xp_reward = sum(p.quest.xp for p in progress) + bonus['xp']
 
         if total_coin_reward > 0 or total_xp_reward > 0:
             await log_activity(self.user.id, f"quest_claim_{self.current_tab}_all", coin_earned=total_coin_reward, xp_earned=total_xp_reward)
             if total_coin_reward > 0: await update_wallet(self.user, total_coin_reward)
             if total_xp_reward > 0:
                 xp_res = await supabase.rpc('add_xp', {'p_user_id': self.user.id, 'p_xp_to_add': total_xp_reward, 'p_source': 'quest'}).execute()
-                if xp_res.data and (level_cog := self.cog.bot.get_cog("LevelSystem")): await level_cog.handle_level_up_event(self.user, xp_res.data)
+                publish_level_result(self.user.id, xp_res.data)
             await set_cooldown(self.user.id, cooldown_key)
             details_text = "\n".join(reward_details)
             await interaction.followup.send(f"🎉 **모든 {self.current_tab} 퀘스트 보상을 받았습니다!**\n{details_text}\n\n**합계:** `{total_coin_reward:,}`{self.cog.currency_icon} 와 `{total_xp_reward:,}` XP", ephemeral=True)
         else: await interaction.followup.send("❌ 받을 수 있는 보상이 없습니다.", ephemeral=True)
-        await self.update_view(interaction)
 
 class Quests(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.currency_icon = "🪙"
         self.log_channel_id: Optional[int] = None
-    async def cog_load(self): await self.load_configs()
+    async def cog_load(self):
+        await self.load_configs()
+        game_events.subscribe(ActivityLogged, quest_counters.on_activity, name="quest_counters")
+    def cog_unload(self): game_events.unsubscribe(ActivityLogged, quest_counters.on_activity)
     async def load_configs(self):
         game_config = get_config("GAME_CONFIG", {})
         self.currency_icon = game_config.get("CURRENCY_ICON", "🪙")
         self.log_channel_id = get_id("log_daily_check_channel_id")
     async def register_persistent_views(self): self.bot.add_view(TaskBoardView(self))
-    async def regenerate_panel(self, channel: discord.TextChannel, panel_key: str = "panel_tasks", **kwargs):
-        if panel_info := get_panel_id(panel_key):
-            if (old_channel := self.bot.get_channel(panel_info['channel_id'])) and (old_message_id := panel_info.get('message_id')):
-                try: await (await channel.fetch_message(old_message_id)).delete()
-                except (discord.NotFound, discord.Forbidden): pass
-        if not (embed_data := await get_embed_from_db(panel_key)): return logger.error(f"DB에서 '{panel_key}' 임베드를 찾을 수 없어 패널을 생성할 수 없습니다.")
-        embed = discord.Embed.from_dict(embed_data)
-        view = TaskBoardView(self)
-        new_message = await channel.send(embed=embed, view=view)
-        await save_panel_id(panel_key, new_message.id, channel.id)
-        logger.info(f"✅ {panel_key} 패널을 성공적으로 생성했습니다. (채널: #{channel.name})")
+    async def regenerate_panel(self, channel: discord.TextChannel, panel_key: str = "panel_tasks", last_log: Optional[discord.Embed] = None, **kwargs):
+        async def build_panel():
+            if not (embed_data := await get_embed_from_db(panel_key)):
+                logger.error(f"DB에서 '{panel_key}' 임베드를 찾을 수 없어 패널을 생성할 수 없습니다.")
+                return None
+            return discord.Embed.from_dict(embed_data), TaskBoardView(self)
+
+        await sticky_panels.request(channel, panel_key, build_panel, log_embed=last_log, force=last_log is None)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Quests(bot))
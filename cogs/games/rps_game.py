@@ -10,9 +10,12 @@ from datetime import datetime, timezone, timedelta
 
 from utils.database import (
     get_wallet, update_wallet, get_config,
-    save_panel_id, get_panel_id, get_embed_from_db
+    get_embed_from_db
 )
 from utils.helpers import format_embed_from_db
+from utils.sticky_panel import sticky_panels
+from utils.session_journal import session_journal
+from utils.user_locks import user_locks
 
 logger = logging.getLogger(__name__)
 
@@ -102,7 +105,6 @@ class RPSGame(commands.Cog):
         self.bot = bot
         self.active_games: Dict[int, Dict] = {}
         self.currency_icon = "🪙"
-        self.user_locks: Dict[int, asyncio.Lock] = {} # defaultdict 대신 일반 dict 사용
         self.max_players = 5
         self.cleanup_stale_games.start()
     # ▲▲▲ [수정] 완료 ▲▲▲
@@ -152,12 +154,11 @@ class RPSGame(commands.Cog):
         self.max_players = int(get_config("RPS_MAX_PLAYERS", "5").strip('"'))
 
     async def create_game_lobby(self, interaction: discord.Interaction, bet_amount: int):
-        user_lock = self.user_locks.setdefault(interaction.user.id, asyncio.Lock())
-        if user_lock.locked():
+        if user_locks.is_busy(interaction.user.id):
             await interaction.followup.send("❌ 현재 다른 작업을 처리 중입니다. 잠시만 기다려주세요.", ephemeral=True)
             return
 
-        async with user_lock:
+        async with user_locks.hold(interaction.user.id):
             channel_id = interaction.channel.id
             host = interaction.user
 
@@ -187,6 +188,7 @@ class RPSGame(commands.Cog):
                 "task": self.bot.loop.create_task(self.lobby_countdown(channel_id, lobby_timeout)),
                 "created_at": datetime.now(timezone.utc)
             }
+            self.journal_game(channel_id)
             await interaction.followup.send(f"✅ 가위바위보 방을 만들었습니다! 베팅 금액: `{bet_amount}`{self.currency_icon}", ephemeral=True)
 
     async def start_new_round(self, channel_id: int):
@@ -218,6 +220,7 @@ class RPSGame(commands.Cog):
             game["game_message"] = await self.bot.get_channel(channel_id).send(embed=game_embed, view=view)
 
         game["task"] = self.bot.loop.create_task(self.choice_countdown(channel_id, choice_timeout))
+        self.journal_game(channel_id)
 
     async def resolve_round(self, channel_id: int):
         game = self.active_games.get(channel_id)
@@ -261,6 +264,7 @@ class RPSGame(commands.Cog):
     async def end_game(self, channel_id: int, winner: Optional[discord.Member]):
         game = self.active_games.pop(channel_id, None)
         if not game: return
+        session_journal.delete("rps", channel_id)
 
         if game.get("task") and not game["task"].done():
             game["task"].cancel()
@@ -292,22 +296,17 @@ class RPSGame(commands.Cog):
             refund_message = f"**✊✌️✋ 가위바위보 중지**\n> 게임이 중지되어 참가자 {player_mentions}에게 베팅 금액 `{game['bet_amount']}`{self.currency_icon}이(가) 환불되었습니다."
             log_embed = discord.Embed(description=refund_message, color=0x99AAB5)
 
-        # 게임에 참여했던 모든 유저의 lock 객체를 메모리에서 제거합니다.
-        for player in initial_players:
-            self.user_locks.pop(player.id, None)
-
         channel = self.bot.get_channel(channel_id)
         if channel:
             await self.regenerate_panel(channel, last_game_log=log_embed)
     # ▲▲▲ [수정] 완료 ▲▲▲
 
     async def handle_join(self, interaction: discord.Interaction, channel_id: int):
-        user_lock = self.user_locks.setdefault(interaction.user.id, asyncio.Lock())
-        if user_lock.locked():
+        if user_locks.is_busy(interaction.user.id):
             await interaction.response.send_message("❌ 현재 다른 작업을 처리 중입니다. 잠시만 기다려주세요.", ephemeral=True)
             return
 
-        async with user_lock:
+        async with user_locks.hold(interaction.user.id):
             game = self.active_games.get(channel_id)
             user = interaction.user
             if not game:
@@ -328,6 +327,7 @@ class RPSGame(commands.Cog):
             await update_wallet(user, -game["bet_amount"])
             game["players"][user.id] = user
             game["initial_players"].append(user)
+            self.journal_game(channel_id)
 
             lobby_timeout_str = get_config("RPS_LOBBY_TIMEOUT", "60").strip('"')
             lobby_timeout = int(lobby_timeout_str)
@@ -373,6 +373,7 @@ class RPSGame(commands.Cog):
             return
 
         game["choices"][user_id] = choice
+        self.journal_game(channel_id)
         await interaction.response.send_message(f"✅ {HAND_NAMES[choice]}을(를) 냈습니다.", ephemeral=True)
 
         if game.get("game_message"):
@@ -465,28 +466,108 @@ class RPSGame(commands.Cog):
 
         return "\n".join(lines)
 
+    def journal_game(self, channel_id: int):
+        """재시작 후 복구할 수 있도록 게임 상태를 ID 위주로 세션 저널에 기록합니다."""
+        if not (game := self.active_games.get(channel_id)): return
+        session_journal.put("rps", channel_id, {
+            "host_id": game["host_id"], "bet_amount": game["bet_amount"],
+            "player_ids": list(game["players"].keys()),
+            "initial_player_ids": [p.id for p in game["initial_players"]],
+            "lobby_message_id": game["lobby_message"].id if game.get("lobby_message") else None,
+            "game_message_id": game["game_message"].id if game.get("game_message") else None,
+            "round": game["round"], "choices": game["choices"],
+            "created_at": game["created_at"].isoformat()
+        })
+
+    async def recover_sessions(self):
+        """
+        저널에 남은 게임을 되살립니다. 메시지에 뷰를 다시 붙이고 타이머를 새로 겁니다.
+        채널/메시지/참가자를 찾을 수 없는 게임은 베팅 금액을 환불하고 종료합니다.
+        """
+        for channel_id_str, state in session_journal.sessions("rps").items():
+            channel_id = int(channel_id_str)
+            try:
+                if await self._restore_game(channel_id, state): continue
+            except Exception as e:
+                logger.error(f"가위바위보 게임(채널 {channel_id}) 복구 중 오류: {e}", exc_info=True)
+            await self._refund_unrecoverable_game(channel_id, state)
+
+    async def _restore_game(self, channel_id: int, state: Dict) -> bool:
+        if channel_id in self.active_games or not (channel := self.bot.get_channel(channel_id)): return False
+
+        members = {}
+        for uid in state["initial_player_ids"]:
+            if not (member := channel.guild.get_member(uid)):
+                try: member = await channel.guild.fetch_member(uid)
+                except discord.HTTPException: return False
+            members[uid] = member
+
+        async def fetch_message(message_id: Optional[int]) -> Optional[discord.Message]:
+            if not message_id: return None
+            try: return await channel.fetch_message(message_id)
+            except discord.HTTPException: return None
+
+        in_lobby = bool(state.get("lobby_message_id"))
+        lobby_message = await fetch_message(state.get("lobby_message_id"))
+        game_message = await fetch_message(state.get("game_message_id"))
+        if in_lobby and not lobby_message: return False
+
+        game = self.active_games[channel_id] = {
+            "host_id": state["host_id"], "bet_amount": state["bet_amount"],
+            "players": {uid: members[uid] for uid in state["player_ids"]},
+            "initial_players": list(members.values()),
+            "lobby_message": lobby_message, "game_message": game_message,
+            "round": state["round"], "choices": {int(uid): hand for uid, hand in state["choices"].items()},
+            "task": None, "created_at": datetime.fromisoformat(state["created_at"])
+        }
+
+        if in_lobby:
+            lobby_timeout = int(get_config("RPS_LOBBY_TIMEOUT", "60").strip('"'))
+            embed = self.build_lobby_embed(members[game["host_id"]], game["bet_amount"], list(game["players"].values()), lobby_timeout)
+            await lobby_message.edit(embed=embed, view=RPSLobbyView(self, channel_id))
+            game["task"] = self.bot.loop.create_task(self.lobby_countdown(channel_id, lobby_timeout))
+        elif game["choices"] and len(game["choices"]) == len(game["players"]):
+            # 모두 패를 낸 뒤 결과 처리 중에 중단된 라운드는 같은 결과로 다시 처리합니다.
+            game["task"] = self.bot.loop.create_task(self.resolve_round(channel_id))
+        else:
+            # 진행 중이던 라운드는 이미 낸 패를 유지한 채 선택 시간을 다시 줍니다.
+            choice_timeout = int(get_config("RPS_CHOICE_TIMEOUT", "45").strip('"'))
+            embed, view = self.build_game_embed(game, choice_timeout=choice_timeout), RPSGameView(self, channel_id)
+            if game_message: game["game_message"] = await game_message.edit(embed=embed, view=view)
+            else: game["game_message"] = await channel.send(embed=embed, view=view)
+            game["task"] = self.bot.loop.create_task(self.choice_countdown(channel_id, choice_timeout))
+            self.journal_game(channel_id)
+
+        logger.info(f"가위바위보 게임(채널 {channel_id}, 참가자 {len(members)}명)을 복구했습니다.")
+        return True
+
+    async def _refund_unrecoverable_game(self, channel_id: int, state: Dict):
+        self.active_games.pop(channel_id, None)
+        session_journal.delete("rps", channel_id)
+        for uid in state.get("initial_player_ids", []):
+            try:
+                user = self.bot.get_user(uid) or await self.bot.fetch_user(uid)
+                await update_wallet(user, state["bet_amount"])
+            except Exception as e:
+                logger.error(f"복구 불가 가위바위보 게임 환불 실패 (유저: {uid}, 금액: {state.get('bet_amount')}): {e}", exc_info=True)
+        if channel := self.bot.get_channel(channel_id):
+            for message_id in (state.get("lobby_message_id"), state.get("game_message_id")):
+                if not message_id: continue
+                try: await channel.get_partial_message(message_id).delete()
+                except discord.HTTPException: pass
+        logger.warning(f"가위바위보 게임(채널 {channel_id})을 복구할 수 없어 {len(state.get('initial_player_ids', []))}명에게 환불했습니다.")
+
     async def register_persistent_views(self):
         view = RPSGamePanelView(self)
         self.bot.add_view(view)
 
     async def regenerate_panel(self, channel: discord.TextChannel, panel_key: str = "panel_rps_game", last_game_log: Optional[discord.Embed] = None):
-        if last_game_log:
-            try: await channel.send(embed=last_game_log)
-            except Exception as e: logger.error(f"가위바위보 게임 로그 메시지 전송 실패: {e}")
-
-        if panel_info := get_panel_id(panel_key):
-            if (old_channel := self.bot.get_channel(panel_info['channel_id'])) and (old_message_id := panel_info.get('message_id')):
-                try: await (await old_channel.fetch_message(old_message_id)).delete()
-                except (discord.NotFound, discord.Forbidden): pass
-
-        embed_data = await get_embed_from_db(panel_key)
-        if not embed_data: return
-
-        embed = discord.Embed.from_dict(embed_data)
-        view = RPSGamePanelView(self)
+        async def build_panel():
+            embed_data = await get_embed_from_db(panel_key)
+            if not embed_data: return None
+            return discord.Embed.from_dict(embed_data), RPSGamePanelView(self)
 
-        new_message = await channel.send(embed=embed, view=view)
-        await save_panel_id(panel_key, new_message.id, channel.id)
+        await sticky_panels.request(channel, panel_key, build_panel, log_embed=last_game_log, force=last_game_log is None)
 
 class RPSGamePanelView(ui.View):
     def __init__(self, cog_instance: 'RPSGame'):
@@ -497,12 +578,11 @@ class RPSGamePanelView(ui.View):
         self.add_item(create_button)
 
     async def create_room_callback(self, interaction: discord.Interaction):
-        user_lock = self.cog.user_locks.setdefault(interaction.user.id, asyncio.Lock())
-        if user_lock.locked():
+        if user_locks.is_busy(interaction.user.id):
             await interaction.response.send_message("❌ 현재 다른 작업을 처리 중입니다. 잠시만 기다려주세요.", ephemeral=True)
             return
 
-        async with user_lock:
+        async with user_locks.hold(interaction.user.id):
             if interaction.channel.id in self.cog.active_games:
                 await interaction.response.send_message("❌ 이 채널에서는 이미 게임이 진행 중입니다.", ephemeral=True)
                 return
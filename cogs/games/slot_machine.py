@@ -11,16 +11,17 @@ from typing import Optional
 # ▼▼▼ [수정] 아래 from ... import ... 구문을 수정해주세요. ▼▼▼
 from utils.database import (
     get_wallet, update_wallet, get_config,
-    save_panel_id, get_panel_id, get_embed_from_db,
+    get_panel_id, get_embed_from_db,
     log_activity # 'log_activity'를 괄호 안에 추가합니다.
 )
 # ▲▲▲ [수정] 완료 ▲▲▲
 from utils.helpers import format_embed_from_db
+from utils.sticky_panel import sticky_panels
+from utils.game_odds import REEL_SYMBOLS, spin_slot_reels, calculate_slot_payout
+from utils.user_locks import user_locks, BUSY_MESSAGE
 
 logger = logging.getLogger(__name__)
 
-REEL_SYMBOLS = ['🍒', '🍊', '🍇', '🍋', '🔔', '5️⃣', '7️⃣']
-FRUIT_SYMBOLS = ['🍒', '🍊', '🍇', '🍋', '🔔']
 SPIN_ANIMATION_FRAMES = 5
 SPIN_ANIMATION_SPEED = 0.4
 
@@ -87,6 +88,12 @@ class SlotMachineGameView(ui.View):
 
     @ui.button(label="스핀!", style=discord.ButtonStyle.success, emoji="🔄")
     async def spin_button(self, interaction: discord.Interaction, button: ui.Button):
+        if user_locks.is_busy(self.user.id):
+            return await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True, delete_after=3)
+        async with user_locks.hold(self.user.id):
+            await self._spin(interaction, button)
+
+    async def _spin(self, interaction: discord.Interaction, button: ui.Button):
         button.disabled = True
         button.label = "회전 중..."
         await interaction.response.edit_message(embed=self.create_embed("릴이 회전 중입니다..."), view=self)
@@ -95,18 +102,7 @@ class SlotMachineGameView(ui.View):
         await log_activity(self.user.id, 'slot_machine_play', amount=1)
         # ▲▲▲ [추가] 완료 ▲▲▲
 
-        if random.random() < 0.50:
-            win_types = ['fruit', 'number', 'seven']
-            weights = [30, 15, 5]
-            chosen_win = random.choices(win_types, weights=weights, k=1)[0]
-            symbol = {'fruit': random.choice(FRUIT_SYMBOLS), 'number': '5️⃣', 'seven': '7️⃣'}[chosen_win]
-            self.final_reels = [symbol, symbol, symbol]
-        else:
-            while True:
-                reels = [random.choice(REEL_SYMBOLS) for _ in range(3)]
-                if not (reels[0] == reels[1] == reels[2]):
-                    self.final_reels = reels
-                    break
+        self.final_reels = spin_slot_reels()
 
         for i in range(3):
             for _ in range(SPIN_ANIMATION_FRAMES):
@@ -155,21 +151,7 @@ class SlotMachineGameView(ui.View):
         self.stop()
     
     def _calculate_payout(self) -> tuple[float, str]:
-        r = self.reels
-        
-        # 3개 심볼이 모두 같을 경우
-        if r[0] == r[1] == r[2]:
-            if r[0] == '7️⃣': 
-                return 4.0, "트리플 세븐 (대박!)" # 기존 2.0 -> 4.0배 (4배 잭팟)
-            if r[0] == '5️⃣': 
-                return 2.5, "숫자 맞춤"         # 기존 1.5 -> 2.5배
-            return 1.5, "과일 맞춤"             # 기존 1.0 -> 1.5배 (이제 과일만 맞춰도 이득)
-        
-        # 체리 2개 보너스
-        if r.count('🍒') == 2:
-            return 0.5, "체리 보너스"           # 기존 0.2 -> 0.5배 (절반 환급)
-
-        return 0.0, "꽝"
+        return calculate_slot_payout(self.reels)
 
     async def on_timeout(self):
         self.cog.active_sessions.discard(self.user.id)
@@ -252,27 +234,16 @@ class SlotMachine(commands.Cog):
         self.bot.add_view(SlotMachinePanelView(self))
 
     async def regenerate_panel(self, channel: discord.TextChannel, panel_key: str = "panel_slot_machine", last_game_log: Optional[discord.Embed] = None):
-        if last_game_log:
-            try: await channel.send(embed=last_game_log)
-            except Exception as e: logger.error(f"슬롯머신 게임 로그 메시지 전송 실패: {e}")
+        async def build_panel():
+            embed_data = await get_embed_from_db(panel_key)
+            if not embed_data: return None
+            return discord.Embed.from_dict(embed_data), SlotMachinePanelView(self)
 
-        if panel_info := get_panel_id(panel_key):
-            if (old_channel := self.bot.get_channel(panel_info['channel_id'])) and (old_message_id := panel_info.get('message_id')):
-                try: await (await old_channel.fetch_message(old_message_id)).delete()
-                except (discord.NotFound, discord.Forbidden): pass
+        async def on_posted(new_message: discord.Message):
+            self.panel_message = new_message
+            await self.update_panel_embed()
 
-        embed_data = await get_embed_from_db(panel_key)
-        if not embed_data: return
-
-        embed = discord.Embed.from_dict(embed_data)
-        view = SlotMachinePanelView(self)
-        
-        new_message = await channel.send(embed=embed, view=view)
-        await save_panel_id(panel_key, new_message.id, channel.id)
-        
-        self.panel_message = new_message
-        await self.update_panel_embed()
-        logger.info(f"✅ {panel_key} 패널을 성공적으로 생성했습니다. (채널: #{channel.name})")
+        await sticky_panels.request(channel, panel_key, build_panel, log_embed=last_game_log, on_posted=on_posted, force=last_game_log is None)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(SlotMachine(bot))
@@ -6,40 +6,62 @@ from discord import ui
 import logging
 import asyncio
 from typing import Optional, Dict, List
-from datetime import datetime, timezone, timedelta
 
 from utils.database import (
-    supabase, get_wallet, update_wallet, get_inventory, update_inventory,
-    get_user_gear, get_user_pet, get_farm_data, get_config,
-    save_panel_id, get_panel_id, get_embed_from_db, get_id,
-    log_activity, get_user_abilities, get_all_user_stats, get_cooldown
+    supabase, update_wallet, update_inventory_many, get_config,
+    save_panel_id, get_panel_id, get_id,
+    get_inventory, get_user_gear, get_farm_data,
+    get_tutorial_progress, add_tutorial_milestones, advance_tutorial_step
 )
-from utils.helpers import format_embed_from_db
+from utils.game_events import game_events, ActivityLogged, LevelUp
 
 logger = logging.getLogger(__name__)
 
 # 튜토리얼 단계 정의
 TUTORIAL_STEPS = {
-    1: {"title": "출석체크 하기", "desc": "<#1442264394850631731>에서 '출석 체크' 버튼을 눌러보세요.", "reward_txt": "1,000 코인", "reward": {"coin": 1000}},
-    2: {"title": "소지품 확인", "desc": "<#1442265364573585598>에서 '소지품 보기'를 눌러 내 정보를 확인하세요.", "reward_txt": "500 코인", "reward": {"coin": 500}},
-    3: {"title": "주사위 게임 도전", "desc": "<#1442266017244909688>을 1회 진행해보세요. (승패 무관)", "reward_txt": "500 코인", "reward": {"coin": 500}},
-    4: {"title": "슬롯머신 도전", "desc": "<#1442266035637063720>을 1회 돌려보세요.", "reward_txt": "500 코인", "reward": {"coin": 500}},
-    5: {"title": "일일 퀘스트 완료", "desc": "<#1442264394850631731>에서 '보상 받기'를 통해 일일 퀘스트 보상을 1회 수령하세요.", "reward_txt": "1,000 코인 + 100 XP", "reward": {"coin": 1000, "xp": 100}},
-    6: {"title": "레벨 확인", "desc": "<#1442265342272340139>에서 '상태 확인' 버튼을 눌러보세요.", "reward_txt": "100 코인", "reward": {"coin": 100}},
-    7: {"title": "낚시 준비", "desc": "<#1442264272548794440>에서 '나무 낚싯대'를 구매하고, <#1442265364573585598>-장비 탭에서 장착하세요.", "reward_txt": "일반 낚시 미끼 10개", "reward": {"item": {"일반 낚시 미끼": 10}}},
-    8: {"title": "첫 낚시와 판매", "desc": "강이나 바다에서 물고기를 잡고, <#1442264272548794440>-판매함에서 물고기를 판매하세요.", "reward_txt": "1,000 코인", "reward": {"coin": 1000}},
-    9: {"title": "농사 준비", "desc": "<#1442264272548794440>에서 '나무 괭이', '나무 물뿌리개', '호박 씨앗'을 각각 1개 이상 구매하세요.", "reward_txt": "구매 비용 환급 (1,000 코인)", "reward": {"coin": 1000}},
-    10: {"title": "농부의 시작", "desc": "<#1442265503346462922>에서 농장을 만들고, 밭을 갈아 씨앗을 심은 뒤 물을 주세요.\n(이미 농장이 있다면 바로 완료됩니다)", "reward_txt": "🎃 호박 1개 (나중에 요리에 쓰입니다!) + 광산 입장권", "reward": {"item": {"호박": 1, "광산 입장권": 1}}},
-    11: {"title": "광산 탐험", "desc": "곡괭이와 입장권을 가지고 <#1442265657402986518>에 입장하여 채굴을 시도하세요.", "reward_txt": "🥚 랜덤 펫 알 1개", "reward": {"item": {"랜덤 펫 알": 1}}},
-    12: {"title": "장비 업그레이드", "desc": "<#1442265814022750248>에서 아무 도구나 한 단계 업그레이드 하세요.\n(업그레이드를 **시작**하면 완료됩니다)", "reward_txt": "5,000 코인", "reward": {"coin": 5000}},
-    13: {"title": "펫 부화", "desc": "인큐베이터에 알을 등록하여 부화를 시작하세요.", "reward_txt": "최고급 사료 1개", "reward": {"item": {"최고급 사료": 1}}},
-    14: {"title": "주간 퀘스트 도전", "desc": "<#1442264394850631731>-주간 탭에서 주간 퀘스트 보상을 수령하세요.", "reward_txt": "10,000 코인", "reward": {"coin": 10000}},
-    15: {"title": "펫 탐사", "desc": "펫을 <#1442265905005461585> 지역으로 1회 보내보세요.", "reward_txt": "2,000 코인", "reward": {"coin": 2000}},
-    16: {"title": "요리사 데뷔", "desc": "<#1442264272548794440>에서 '가마솥'을 구매하고 나만의 <#1442265614898036777>을 만드세요.", "reward_txt": "설탕 2개 (요리 재료)", "reward": {"item": {"설탕": 2}}},
-    17: {"title": "호박죽 요리", "desc": "<#1442264272548794440>에서 '설탕'을 구매하거나 보상으로 받은 재료를 사용해 **호박죽**을 만드세요.\n(레시피: 호박 + 설탕 2개)", "reward_txt": "✨ 5,000 XP", "reward": {"xp": 5000}},
-    18: {"title": "전직의 길", "desc": "레벨 50을 달성하고 1차 전직을 완료하세요.", "reward_txt": "50,000 코인", "reward": {"coin": 50000}}
+    1: {"title": "출석체크 하기", "desc": "<#1442264394850631731>에서 '출석 체크' 버튼을 눌러보세요.", "reward_txt": "1,000 코인", "reward": {"coin": 1000}, "milestones": ("daily_check_in",)},
+    2: {"title": "소지품 확인", "desc": "<#1442265364573585598>에서 '소지품 보기'를 눌러 내 정보를 확인하세요.", "reward_txt": "500 코인", "reward": {"coin": 500}, "milestones": ()},
+    3: {"title": "주사위 게임 도전", "desc": "<#1442266017244909688>을 1회 진행해보세요. (승패 무관)", "reward_txt": "500 코인", "reward": {"coin": 500}, "milestones": ("dice_game_play",)},
+    4: {"title": "슬롯머신 도전", "desc": "<#1442266035637063720>을 1회 돌려보세요.", "reward_txt": "500 코인", "reward": {"coin": 500}, "milestones": ("slot_machine_play",)},
+    5: {"title": "일일 퀘스트 완료", "desc": "<#1442264394850631731>에서 '보상 받기'를 통해 일일 퀘스트 보상을 1회 수령하세요.", "reward_txt": "1,000 코인 + 100 XP", "reward": {"coin": 1000, "xp": 100}, "milestones": ("quest_claim_daily_all",)},
+    6: {"title": "레벨 확인", "desc": "<#1442265342272340139>에서 '상태 확인' 버튼을 눌러보세요.", "reward_txt": "100 코인", "reward": {"coin": 100}, "milestones": ()},
+    7: {"title": "낚시 준비", "desc": "<#1442264272548794440>에서 '나무 낚싯대'를 구매하고, <#1442265364573585598>-장비 탭에서 장착하세요.", "reward_txt": "일반 낚시 미끼 10개", "reward": {"item": {"일반 낚시 미끼": 10}}, "milestones": ("rod_equipped",)},
+    8: {"title": "첫 낚시와 판매", "desc": "강이나 바다에서 물고기를 잡고, <#1442264272548794440>-판매함에서 물고기를 판매하세요.", "reward_txt": "1,000 코인", "reward": {"coin": 1000}, "milestones": ("fishing_catch", "sell_fish")},
+    9: {"title": "농사 준비", "desc": "<#1442264272548794440>에서 '나무 괭이', '나무 물뿌리개', '호박 씨앗'을 각각 1개 이상 구매하세요.", "reward_txt": "구매 비용 환급 (1,000 코인)", "reward": {"coin": 1000}, "milestones": ("bought_hoe", "bought_watering_can", "bought_pumpkin_seed")},
+    10: {"title": "농부의 시작", "desc": "<#1442265503346462922>에서 농장을 만들고, 밭을 갈아 씨앗을 심은 뒤 물을 주세요.\n(이미 씨앗을 심은 밭이 있다면 바로 완료됩니다)", "reward_txt": "🎃 호박 1개 (나중에 요리에 쓰입니다!) + 광산 입장권", "reward": {"item": {"호박": 1, "광산 입장권": 1}}, "milestones": ("farm_plant",)},
+    11: {"title": "광산 탐험", "desc": "곡괭이와 입장권을 가지고 <#1442265657402986518>에 입장하여 채굴을 시도하세요.", "reward_txt": "🥚 랜덤 펫 알 1개", "reward": {"item": {"랜덤 펫 알": 1}}, "milestones": ("mining",)},
+    12: {"title": "장비 업그레이드", "desc": "<#1442265814022750248>에서 아무 도구나 한 단계 업그레이드 하세요.\n(업그레이드를 **시작**하면 완료됩니다)", "reward_txt": "5,000 코인", "reward": {"coin": 5000}, "milestones": ("blacksmith_upgrade",)},
+    13: {"title": "펫 부화", "desc": "인큐베이터에 알을 등록하여 부화를 시작하세요.", "reward_txt": "최고급 사료 1개", "reward": {"item": {"최고급 사료": 1}}, "milestones": ("pet_incubate",)},
+    14: {"title": "주간 퀘스트 도전", "desc": "<#1442264394850631731>-주간 탭에서 주간 퀘스트 보상을 수령하세요.", "reward_txt": "10,000 코인", "reward": {"coin": 10000}, "milestones": ("quest_claim_weekly_all",)},
+    15: {"title": "펫 탐사", "desc": "펫을 <#1442265905005461585> 지역으로 1회 보내보세요.", "reward_txt": "2,000 코인", "reward": {"coin": 2000}, "milestones": ("pet_exploration",)},
+    16: {"title": "요리사 데뷔", "desc": "<#1442264272548794440>에서 '가마솥'을 구매하고 나만의 <#1442265614898036777>을 만드세요.", "reward_txt": "설탕 2개 (요리 재료)", "reward": {"item": {"설탕": 2}}, "milestones": ("kitchen_created",)},
+    17: {"title": "호박죽 요리", "desc": "<#1442264272548794440>에서 '설탕'을 구매하거나 보상으로 받은 재료를 사용해 **호박죽**을 만드세요.\n(레시피: 호박 + 설탕 2개)", "reward_txt": "✨ 5,000 XP", "reward": {"xp": 5000}, "milestones": ("cooked_pumpkin_porridge",)},
+    18: {"title": "전직의 길", "desc": "레벨 50을 달성하고 1차 전직을 완료하세요.", "reward_txt": "50,000 코인", "reward": {"coin": 50000}, "milestones": ("job_advanced",)}
 }
 
+TUTORIAL_MILESTONES = frozenset(m for info in TUTORIAL_STEPS.values() for m in info['milestones'])
+
+def _is_hoe(item_name: str) -> bool:
+    """괭이인지 확인합니다. 곡괭이도 이름에 '괭이'가 들어가므로 제외합니다."""
+    return '괭이' in item_name and '곡괭이' not in item_name
+
+# 활동 이름이 곧 마일스톤인 경우 외에, 추가 정보로 판단해야 하는 마일스톤입니다.
+def _milestones_from_activity(activity_type: str, data: Dict) -> List[str]:
+    item_name = data.get('item_name') or ""
+    if activity_type == "item_purchase":
+        return [m for m, matched in (("bought_hoe", _is_hoe(item_name)), ("bought_watering_can", "물뿌리개" in item_name), ("bought_pumpkin_seed", item_name == "호박 씨앗")) if matched]
+    if activity_type == "gear_equip":
+        return ["rod_equipped"] if data.get('gear_key') == "rod" and item_name and item_name != "맨손" else []
+    if activity_type == "dish_cooked":
+        return ["cooked_pumpkin_porridge"] if item_name.endswith("호박죽") else []
+    return [activity_type] if activity_type in TUTORIAL_MILESTONES else []
+
+# user_activities에 같은 이름으로 기록되는 마일스톤입니다. (이벤트가 생기기 전의 기록도 여기서 찾을 수 있습니다)
+ACTIVITY_LOG_MILESTONES = frozenset({
+    "daily_check_in", "dice_game_play", "slot_machine_play", "fishing_catch", "sell_fish", "mining",
+    "quest_claim_daily_all", "quest_claim_weekly_all",
+})
+
 class TutorialView(ui.View):
     def __init__(self, cog: 'TutorialSystem', user: discord.Member, step_data: Dict):
         super().__init__(timeout=None)
@@ -138,92 +160,74 @@ class TutorialSystem(commands.Cog):
 
     async def cog_load(self):
         self.currency_icon = get_config("GAME_CONFIG", {}).get("CURRENCY_ICON", "🪙")
+        game_events.subscribe(ActivityLogged, self.on_activity, name="tutorial_milestones")
+
+    def cog_unload(self):
+        game_events.unsubscribe(ActivityLogged, self.on_activity)
+
+    async def on_activity(self, event: ActivityLogged):
+        """활동이 일어날 때 튜토리얼 마일스톤을 기록합니다. 이미 기록된 마일스톤은 DB를 호출하지 않습니다."""
+        if milestones := _milestones_from_activity(event.activity_type, event.data):
+            await add_tutorial_milestones(event.user_id, milestones)
 
     async def get_user_tutorial(self, user_id: int) -> Dict:
         try:
-            res = await supabase.table('user_tutorials').select('*').eq('user_id', str(user_id)).maybe_single().execute()
-            if res and res.data: return res.data
-            
-            init_res = await supabase.table('user_tutorials').insert({'user_id': str(user_id), 'current_step': 1}).execute()
-            if init_res and init_res.data: return init_res.data[0]
-            
-            return {'user_id': str(user_id), 'current_step': 1, 'is_completed': False}
+            return await get_tutorial_progress(user_id)
         except Exception as e:
             logger.error(f"튜토리얼 정보 조회 중 DB 오류 발생 (User: {user_id}): {e}", exc_info=True)
-            return {'user_id': str(user_id), 'current_step': 1, 'is_completed': False}
+            return {'user_id': str(user_id), 'current_step': 1, 'is_completed': False, 'milestones': frozenset()}
 
     async def check_step_condition(self, user: discord.Member, step: int) -> bool:
-        uid = user.id
+        """
+        해당 단계의 마일스톤이 모두 기록되었는지 확인합니다. (캐시된 진행도 한 행만 읽습니다)
+        빠진 마일스톤이 있으면 그 마일스톤만 현재 상태/활동 기록으로 한 번 확인해 기록합니다.
+        마일스톤 기록이 생기기 전에 이미 해 둔 행동(도구 구매, 농장, 부엌 등)도 이렇게 인정됩니다.
+        """
+        required = TUTORIAL_STEPS.get(step, {}).get('milestones', ())
+        if not required: return True
+        progress = await self.get_user_tutorial(user.id)
+        if not (missing := [m for m in required if m not in progress['milestones']]): return True
+        results = await asyncio.gather(*(self.milestone_from_state(user, m) for m in missing))
+        if found := [m for m, ok in zip(missing, results) if ok]:
+            await add_tutorial_milestones(user.id, found)
+        return len(found) == len(missing)
+
+    async def milestone_from_state(self, user: discord.Member, milestone: str) -> bool:
+        """마일스톤을 이미 달성한 상태인지 DB의 현재 상태로 확인합니다."""
+        uid = str(user.id)
         try:
-            if step == 1: # 출석체크
-                stats = await get_all_user_stats(uid)
-                return stats.get('daily', {}).get('check_in_count', 0) > 0
-            elif step == 2: return True # 소지품 확인
-            elif step == 3: # 주사위 게임
-                res = await supabase.table('user_activities').select('count', count='exact').eq('user_id', str(uid)).eq('activity_type', 'dice_game_play').execute()
-                return (res.count or 0) > 0 if res else False
-            elif step == 4: # 슬롯머신
-                res = await supabase.table('user_activities').select('count', count='exact').eq('user_id', str(uid)).eq('activity_type', 'slot_machine_play').execute()
-                return (res.count or 0) > 0 if res else False
-            elif step == 5: # 일일 퀘스트
-                today_str = datetime.now(timezone(timedelta(hours=9))).strftime('%Y-%m-%d')
-                return await get_cooldown(uid, f"quest_claimed_daily_all_{today_str}") > 0
-            elif step == 6: return True # 레벨 확인
-            elif step == 7: # 낚싯대 구매/장착
-                gear = await get_user_gear(user)
-                return gear.get('rod') and gear.get('rod') != "맨손"
-            elif step == 8: # 낚시 판매
-                fish = await supabase.table('user_activities').select('count', count='exact').eq('user_id', str(uid)).eq('activity_type', 'fishing_catch').execute()
-                sell = await supabase.table('user_activities').select('count', count='exact').eq('user_id', str(uid)).eq('activity_type', 'sell_fish').execute()
-                return ((fish.count or 0) > 0) and ((sell.count or 0) > 0)
-            elif step == 9: # 농사 도구 구매
-                inv = await get_inventory(user)
-                gear = await get_user_gear(user)
-                has_hoe = any('괭이' in k for k in inv) or '괭이' in gear.get('hoe', '')
-                has_can = any('물뿌리개' in k for k in inv) or '물뿌리개' in gear.get('watering_can', '')
-                has_seed = inv.get('호박 씨앗', 0) > 0
-                return has_hoe and has_can and has_seed
-            elif step == 10: # 농장 파종
-                farm = await get_farm_data(uid)
-                if not farm: return False
-                for plot in farm.get('farm_plots', []):
-                    if plot['state'] == 'planted': return True
-                return False
-            elif step == 11: # 광산
-                res = await supabase.table('user_activities').select('count', count='exact').eq('user_id', str(uid)).eq('activity_type', 'mining').execute()
-                return (res.count or 0) > 0 if res else False
-            elif step == 12: # 대장간
-                res = await supabase.table('blacksmith_upgrades').select('count', count='exact').eq('user_id', str(uid)).execute()
-                if (res.count or 0) > 0: return True
-                gear = await get_user_gear(user)
-                for g in gear.values():
-                    if any(x in g for x in ['구리', '철', '금', '다이아']): return True
-                return False
-            elif step == 13: # 펫 부화
-                res = await supabase.table('pets').select('count', count='exact').eq('user_id', str(uid)).execute()
-                return (res.count or 0) > 0 if res else False
-            elif step == 14: # 주간 퀘스트
-                now = datetime.now(timezone(timedelta(hours=9)))
-                week_str = (now - timedelta(days=now.weekday())).strftime('%Y-%m-%d')
-                return await get_cooldown(uid, f"quest_claimed_weekly_all_{week_str}") > 0
-            elif step == 15: # 펫 탐사
-                res = await supabase.table('pet_explorations').select('count', count='exact').eq('user_id', str(uid)).execute()
-                return (res.count or 0) > 0 if res else False
-            elif step == 16: # 부엌 생성
-                res = await supabase.table('user_settings').select('kitchen_thread_id').eq('user_id', str(uid)).maybe_single().execute()
-                return res.data and res.data.get('kitchen_thread_id') is not None if res else False
-            elif step == 17: # 호박죽
-                inv = await get_inventory(user)
-                return inv.get('호박죽', 0) > 0
-            elif step == 18: # 전직
-                res = await supabase.table('user_jobs').select('job_id').eq('user_id', str(uid)).execute()
-                has_job = (res.data and len(res.data) > 0) if res else False
-                
-                lvl_res = await supabase.table('user_levels').select('level').eq('user_id', str(uid)).single().execute()
-                return (lvl_res.data['level'] >= 50 and has_job) if lvl_res.data else False
+            if milestone in ACTIVITY_LOG_MILESTONES:
+                res = await supabase.table('user_activities').select('activity_type').eq('user_id', uid).eq('activity_type', milestone).limit(1).execute()
+                return bool(res and res.data)
+            if milestone in ("rod_equipped", "bought_hoe", "bought_watering_can", "bought_pumpkin_seed"):
+                inv, gear = await asyncio.gather(get_inventory(user), get_user_gear(user))
+                inv, gear = inv or {}, gear or {}
+                if milestone == "rod_equipped": return bool(gear.get('rod')) and gear.get('rod') != "맨손"
+                if milestone == "bought_hoe": return any(_is_hoe(k) for k in inv) or _is_hoe(gear.get('hoe', ''))
+                if milestone == "bought_watering_can": return any('물뿌리개' in k for k in inv) or '물뿌리개' in gear.get('watering_can', '')
+                return inv.get('호박 씨앗', 0) > 0
+            if milestone == "farm_plant":
+                farm = await get_farm_data(user.id)
+                return any(plot.get('state') == 'planted' for plot in (farm or {}).get('farm_plots', []))
+            if milestone == "blacksmith_upgrade":
+                res = await supabase.table('blacksmith_upgrades').select('user_id').eq('user_id', uid).limit(1).execute()
+                if res and res.data: return True
+                gear = await get_user_gear(user) or {}
+                return any(tier in g for g in gear.values() for tier in ('구리', '철', '금', '다이아'))
+            if milestone in ("pet_incubate", "pet_exploration"):
+                table = 'pets' if milestone == "pet_incubate" else 'pet_explorations'
+                res = await supabase.table(table).select('user_id').eq('user_id', uid).limit(1).execute()
+                return bool(res and res.data)
+            if milestone == "kitchen_created":
+                res = await supabase.table('user_settings').select('kitchen_thread_id').eq('user_id', uid).maybe_single().execute()
+                return bool(res and res.data and res.data.get('kitchen_thread_id'))
+            if milestone == "cooked_pumpkin_porridge":
+                return any(name.endswith("호박죽") for name in (await get_inventory(user) or {}))
+            if milestone == "job_advanced":
+                res = await supabase.table('user_jobs').select('job_id').eq('user_id', uid).limit(1).execute()
+                return bool(res and res.data)
         except Exception as e:
-            logger.error(f"튜토리얼 조건 검사 중 오류 (Step {step}): {e}")
-            return False
+            logger.error(f"튜토리얼 마일스톤 상태 확인 중 오류 ({milestone}, User: {uid}): {e}")
         return False
 
     async def process_reward(self, user: discord.Member, step: int) -> bool:
@@ -264,15 +268,13 @@ class TutorialSystem(commands.Cog):
                         if new_level > current_level:
                             await supabase.table('user_levels').update({'level': new_level}).eq('user_id', str(user.id)).execute()
                             
-                            # 레벨업 이벤트 핸들링 (LevelSystem Cog 활용)
-                            if level_cog := self.bot.get_cog("LevelSystem"):
-                                await level_cog.handle_level_up_event(user, [{"leveled_up": True, "new_level": new_level}])
+                            game_events.publish(LevelUp(user.id, new_level))
                 
                 except Exception as e:
                     logger.error(f"튜토리얼 XP 지급 처리 중 오류: {e}", exc_info=True)
 
             if items := reward.get('item'):
-                for name, qty in items.items(): await update_inventory(user.id, name, qty)
+                await update_inventory_many(user.id, items)
             if role_key := reward.get('role'):
                 if role_id := get_id(role_key):
                     role = user.guild.get_role(role_id)
@@ -283,11 +285,7 @@ class TutorialSystem(commands.Cog):
             next_step = step + 1
             is_finished = next_step > len(TUTORIAL_STEPS)
             
-            await supabase.table('user_tutorials').update({
-                'current_step': next_step,
-                'is_completed': is_finished,
-                'last_updated': datetime.now(timezone.utc).isoformat()
-            }).eq('user_id', str(user.id)).execute()
+            await advance_tutorial_step(user.id, next_step, is_finished)
             
             return True
         except Exception as e:
@@ -8,18 +8,20 @@ import asyncio
 import math
 from typing import Optional, Dict, List, Any
 from datetime import datetime, timezone, timedelta
+from collections import defaultdict
 from utils.helpers import coerce_item_emoji
 
 from utils.database import (
     get_inventory, get_wallet, get_aquarium, set_user_gear, get_user_gear,
     save_panel_id, get_panel_id, get_id, get_embed_from_db,
-    get_item_database, get_config, get_string, BARE_HANDS,
-    supabase, get_farm_data, expand_farm_db, update_inventory, save_config_to_db,
+    get_item_database, get_item_name_by_id_key, get_config, get_string, BARE_HANDS,
+    supabase, get_farm_data, expand_farm_db, update_inventory, update_inventory_many, save_config_to_db,
     open_boss_chest, update_wallet, add_xp_to_pet_db,
     clear_user_ability_cache 
 )
 import time
 from utils.helpers import format_embed_from_db
+from utils.game_events import publish_activity, publish_pet_level_result
 
 logger = logging.getLogger(__name__)
 
@@ -118,8 +120,7 @@ class ItemUsageView(ui.View):
     def __init__(self, parent_view: 'ProfileView'):
         super().__init__(timeout=180); self.parent_view = parent_view; self.user = parent_view.user; self.message: Optional[discord.WebhookMessage] = None
     async def get_item_name_by_id_key(self, id_key: str) -> Optional[str]:
-        try: res = await supabase.table('items').select('name').eq('id_key', id_key).single().execute(); return res.data.get('name') if res.data else None
-        except Exception: return None
+        return get_item_name_by_id_key(id_key)
     async def _update_warning_roles(self, member: discord.Member, total_count: int):
         guild = member.guild; warning_thresholds = get_config("WARNING_THRESHOLDS", [])
         if not warning_thresholds: logger.error("DB에서 WARNING_THRESHOLDS 설정을 찾을 수 없어 역할 업데이트를 건너뜁니다."); return
@@ -168,7 +169,9 @@ class ItemUsageView(ui.View):
             items = chest_contents.get("items", {})
 
             db_tasks = []
-            db_tasks.append(update_inventory(self.user.id, item_name, -1))
+            inventory_deltas = defaultdict(int, {item_name: -1})
+            for item, qty in items.items(): inventory_deltas[item] += qty
+            db_tasks.append(update_inventory_many(self.user.id, inventory_deltas))
 
             if coins > 0:
                 db_tasks.append(update_wallet(self.user, coins))
@@ -179,9 +182,6 @@ class ItemUsageView(ui.View):
 
                 pet_xp_result = await add_xp_to_pet_db(self.user.id, xp)
 
-            for item, qty in items.items():
-                db_tasks.append(update_inventory(self.user.id, item, qty))
-            
             await asyncio.gather(*db_tasks, return_exceptions=True)
                     
             reward_lines = []
@@ -199,16 +199,7 @@ class ItemUsageView(ui.View):
             )
             await interaction.followup.send(embed=result_embed, ephemeral=True)
             
-            if pet_xp_result and isinstance(pet_xp_result, list) and pet_xp_result[0].get('leveled_up'):
-                new_level = pet_xp_result[0].get('new_level')
-                points = pet_xp_result[0].get('points_awarded')
-                
-                if pet_cog := self.parent_view.cog.bot.get_cog("PetSystem"):
-
-                    await pet_cog.notify_pet_level_up(self.user.id, new_level, points)
-
-                    if thread := self.parent_view.cog.bot.get_channel(pet_xp_result[0].get('thread_id')): 
-                         await pet_cog.check_and_process_auto_evolution({self.user.id})
+            publish_pet_level_result(self.user.id, pet_xp_result)
 
             return await self.on_back(interaction, reload_data=True)
 
@@ -589,7 +580,8 @@ class GearSelectView(ui.View):
         selected_option = interaction.data['values'][0]
         if selected_option == "unequip": selected_item_name = self.default_item; self.parent_view.status_message = f"✅ {self.display_name}을(를) 해제했습니다."
         else: selected_item_name = selected_option; self.parent_view.status_message = f"✅ 장비를 **{selected_item_name}**(으)로 변경했습니다."
-        await set_user_gear(self.user.id, **{self.gear_key: selected_item_name}); await self.go_back_to_profile(interaction, reload_data=True)
+        await set_user_gear(self.user.id, **{self.gear_key: selected_item_name}); publish_activity(self.user.id, "gear_equip", gear_key=self.gear_key, item_name=selected_item_name)
+        await self.go_back_to_profile(interaction, reload_data=True)
     async def back_callback(self, interaction: discord.Interaction): await self.go_back_to_profile(interaction)
     async def go_back_to_profile(self, interaction: discord.Interaction, reload_data: bool = False):
         self.parent_view.current_page = "gear"; await self.parent_view.update_display(interaction, reload_data=reload_data)
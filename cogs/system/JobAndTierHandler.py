@@ -9,6 +9,7 @@ from typing import Dict, Any, List
 
 from utils.database import supabase, get_config, get_id, get_embed_from_db, clear_user_ability_cache # 💡 clear_user_ability_cache 임포트 추가
 from utils.helpers import format_embed_from_db
+from utils.game_events import game_events, publish_activity, LevelUp
 
 logger = logging.getLogger(__name__)
 
@@ -129,6 +130,7 @@ class JobAdvancementView(ui.View):
                     await user.add_roles(new_role, reason="전직 완료")
 
             await supabase.rpc('set_user_job_and_ability', {'p_user_id': user.id, 'p_job_id': job_id, 'p_ability_id': ability_id}).execute()
+            publish_activity(user.id, "job_advanced", job_key=self.selected_job_key)
 
             clear_user_ability_cache(user.id)
             
@@ -193,6 +195,23 @@ class JobAndTierHandler(commands.Cog):
         self.bot = bot
         self.active_views_loaded = False
         logger.info("JobAndTierHandler Cog (전직/등급 처리)가 성공적으로 초기화되었습니다.")
+
+    async def cog_load(self):
+        game_events.subscribe(LevelUp, self.on_level_up, name="job_and_tier")
+
+    def cog_unload(self):
+        game_events.unsubscribe(LevelUp, self.on_level_up)
+
+    async def on_level_up(self, event: LevelUp):
+        """레벨업 이벤트를 받아 등급 역할을 갱신하고, 전직 레벨이면 전직 안내를 시작합니다."""
+        server_id_str = get_config("SERVER_ID")
+        if not (server_id_str and (guild := self.bot.get_guild(int(server_id_str)))): return
+        if not (member := guild.get_member(event.user_id)): return
+
+        logger.info(f"유저 {member.display_name}(ID: {member.id})가 레벨 {event.new_level}(으)로 레벨업했습니다.")
+        await self.update_tier_role(member, event.new_level)
+        if event.new_level in get_config("GAME_CONFIG", {}).get("JOB_ADVANCEMENT_LEVELS", [50, 100]):
+            await self.trigger_advancement_check(member)
         
     @commands.Cog.listener()
     async def on_ready(self):
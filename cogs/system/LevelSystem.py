@@ -5,7 +5,6 @@ from discord.ext import commands, tasks
 from discord import ui
 import logging
 import asyncio
-import time
 import math
 from typing import Optional, Dict, List, Any
 from datetime import time as dt_time, timezone, timedelta
@@ -14,10 +13,11 @@ from types import SimpleNamespace
 
 from utils.database import (
     supabase, get_panel_id, save_panel_id, get_id, get_config, 
-    get_cooldown, set_cooldown, save_config_to_db,
+    get_cooldown, set_cooldown,
     get_embed_from_db, log_activity
 )
 from utils.helpers import format_embed_from_db, calculate_xp_for_level, format_timedelta_minutes_seconds
+from utils.game_events import game_events, LevelUp
 
 logger = logging.getLogger(__name__)
 
@@ -329,7 +329,7 @@ class LevelPanelView(ui.View):
                     # 3. 레벨이 올랐다면 DB 업데이트 및 이벤트 발생
                     if new_level > current_level:
                         await supabase.table('user_levels').update({'level': new_level}).eq('user_id', str(interaction.user.id)).execute()
-                        await self.cog.handle_level_up_event(interaction.user, [{"leveled_up": True, "new_level": new_level}])
+                        game_events.publish(LevelUp(interaction.user.id, new_level))
                         
                         # 잠시 대기하여 임베드 생성 시 업데이트된 정보를 반영하도록 함
                         await asyncio.sleep(0.5)
@@ -443,21 +443,8 @@ class LevelSystem(commands.Cog):
     async def load_configs(self):
         pass
     
-    async def handle_level_up_event(self, user: discord.Member, result_data: List[Dict]):
-        if not result_data or not result_data[0].get('leveled_up'): return
-        
-        new_level = result_data[0].get('new_level')
-        logger.info(f"유저 {user.display_name}(ID: {user.id})가 레벨 {new_level}(으)로 레벨업했습니다.")
-        
-        await save_config_to_db(f"level_tier_update_request_{user.id}", {"level": new_level, "timestamp": time.time()})
-        
-        game_config = get_config("GAME_CONFIG", {})
-        job_advancement_levels = game_config.get("JOB_ADVANCEMENT_LEVELS", [50, 100])
-        
-        if new_level in job_advancement_levels:
-            await save_config_to_db(f"job_advancement_request_{user.id}", {"level": new_level, "timestamp": time.time()})
-
     async def process_level_requests(self, requests_by_prefix: Dict[str, List]):
+        """다른 프로세스(관리자 대시보드 등)가 bot_configs에 남긴 등급/전직 요청을 처리합니다. 봇 내부의 레벨업은 LevelUp 이벤트로 전달됩니다."""
         server_id_str = get_config("SERVER_ID")
         if not server_id_str: return
         guild = self.bot.get_guild(int(server_id_str))
@@ -513,7 +500,7 @@ class LevelSystem(commands.Cog):
             await supabase.table('user_levels').upsert({'user_id': user.id, 'level': new_level, 'xp': new_total_xp}).execute()
             
             if leveled_up:
-                await self.handle_level_up_event(user, [{"leveled_up": True, "new_level": new_level}])
+                game_events.publish(LevelUp(user.id, new_level))
             
             logger.info(f"관리자 요청으로 {user.display_name}님의 레벨/XP가 성공적으로 업데이트되었습니다. (New Level: {new_level}, New XP: {new_total_xp})")
             return True
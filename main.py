@@ -4,12 +4,14 @@ import discord
 from discord.ext import commands
 import os
 import asyncio
+import hashlib
+import json
 import logging
 import logging.handlers
 from datetime import datetime, timezone
 from typing import Optional
 
-from utils.database import load_all_data_from_db
+from utils.database import load_all_data_from_db, get_config, save_config_to_db
 
 # --- 중앙 로깅 설정 ---
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(name)s:%(lineno)d] %(message)s')
@@ -44,9 +46,15 @@ intents.message_content = True
 intents.voice_states = True
 BOT_VERSION = "v2.3-game-stable-ko" # 게임 봇 안정화 버전 (한국어)
 
+COMMAND_SIGNATURE_CONFIG_KEY = "command_tree_signatures"
+
 class MyBot(commands.Bot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # on_ready는 재연결 시마다 다시 호출되므로, 최초 1회만 수행할 작업을 표시합니다.
+        self.configs_refreshed = False
+        self.commands_synced = False
+        self.sessions_recovered = False
         
     async def setup_hook(self):
         # 1. 모든 Cog를 로드합니다.
@@ -106,6 +114,36 @@ class MyBot(commands.Bot):
                 failed_count += 1
         logger.info(f"------ [ Cog 로드 완료 | 성공: {loaded_count} / 실패: {failed_count} ] ------")
 
+    def compute_command_signature(self, guild: Optional[discord.abc.Snowflake] = None) -> str:
+        """등록된 슬래시 명령어 트리를 정규화하여 SHA-256 해시로 반환합니다."""
+        payload = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands(guild=guild)),
+            key=lambda c: (c.get('type', 1), c.get('name', ''))
+        )
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    async def sync_commands_if_changed(self):
+        """명령어 트리의 해시가 마지막 동기화 때와 다를 때만 Discord에 동기화합니다."""
+        guild = discord.Object(id=TEST_GUILD_ID) if TEST_GUILD_ID else None
+        scope = f"guild_{TEST_GUILD_ID}" if TEST_GUILD_ID else "global"
+        signature = self.compute_command_signature(guild)
+        saved_signatures = dict(get_config(COMMAND_SIGNATURE_CONFIG_KEY, {}) or {})
+
+        if saved_signatures.get(scope) == signature:
+            logger.info(f"ℹ️ 명령어 트리에 변경 사항이 없어 동기화를 건너뜁니다. (범위: {scope})")
+            return
+
+        if guild:
+            await self.tree.sync(guild=guild)
+            logger.info(f'✅ 테스트 서버({TEST_GUILD_ID})에 명령어를 동기화했습니다.')
+        else:
+            synced = await self.tree.sync()
+            logger.info(f'✅ {len(synced)}개의 슬래시 명령어를 전체 서버에 동기화했습니다.')
+
+        saved_signatures[scope] = signature
+        await save_config_to_db(COMMAND_SIGNATURE_CONFIG_KEY, saved_signatures)
+
 bot = MyBot(command_prefix="/", intents=intents)
 
 @bot.event
@@ -117,29 +155,39 @@ async def on_ready():
     logger.info("==================================================")
     
     # on_ready에서는 데이터 로드나 View 등록을 하지 않습니다. setup_hook에서 모두 처리됩니다.
+    # 재연결로 on_ready가 다시 호출되면 설정 새로고침과 명령어 동기화를 건너뜁니다.
+    # (설정 변경은 config_reload 요청으로 반영됩니다.)
+    if not bot.configs_refreshed:
+        logger.info("------ [ 모든 Cog 설정 새로고침 시작 ] ------")
+        refreshed_cogs_count = 0
+        for cog_name, cog in bot.cogs.items():
+            if hasattr(cog, 'load_configs'):
+                try: 
+                    await cog.load_configs()
+                    refreshed_cogs_count += 1
+                except Exception as e: 
+                    logger.error(f"❌ '{cog_name}' Cog 설정 새로고침 중 오류: {e}", exc_info=True)
+        bot.configs_refreshed = True
+        logger.info(f"✅ 총 {refreshed_cogs_count}개의 Cog 설정이 새로고침되었습니다.")
+        logger.info("------ [ 모든 Cog 설정 새로고침 완료 ] ------")
+    else:
+        logger.info("ℹ️ 재연결이 감지되어 Cog 설정 새로고침을 건너뜁니다.")
     
-    logger.info("------ [ 모든 Cog 설정 새로고침 시작 ] ------")
-    refreshed_cogs_count = 0
-    for cog_name, cog in bot.cogs.items():
-        if hasattr(cog, 'load_configs'):
-            try: 
-                await cog.load_configs()
-                refreshed_cogs_count += 1
-            except Exception as e: 
-                logger.error(f"❌ '{cog_name}' Cog 설정 새로고침 중 오류: {e}", exc_info=True)
-    logger.info(f"✅ 총 {refreshed_cogs_count}개의 Cog 설정이 새로고침되었습니다.")
-    logger.info("------ [ 모든 Cog 설정 새로고침 완료 ] ------")
-    
-    try:
-        if TEST_GUILD_ID:
-            guild = discord.Object(id=TEST_GUILD_ID)
-            await bot.tree.sync(guild=guild)
-            logger.info(f'✅ 테스트 서버({TEST_GUILD_ID})에 명령어를 동기화했습니다.')
-        else:
-            synced = await bot.tree.sync()
-            logger.info(f'✅ {len(synced)}개의 슬래시 명령어를 전체 서버에 동기화했습니다.')
-    except Exception as e: 
-        logger.error(f'❌ 명령어 동기화 중 오류가 발생했습니다: {e}', exc_info=True)
+    # 재시작 전에 진행 중이던 게임 세션(광산/낚시/가위바위보)은 첫 on_ready에서 한 번만 복구합니다.
+    if not bot.sessions_recovered:
+        bot.sessions_recovered = True
+        for cog_name, cog in bot.cogs.items():
+            if hasattr(cog, 'recover_sessions'):
+                try: await cog.recover_sessions()
+                except Exception as e:
+                    logger.error(f"❌ '{cog_name}' Cog 세션 복구 중 오류: {e}", exc_info=True)
+
+    if not bot.commands_synced:
+        try:
+            await bot.sync_commands_if_changed()
+            bot.commands_synced = True
+        except Exception as e: 
+            logger.error(f'❌ 명령어 동기화 중 오류가 발생했습니다: {e}', exc_info=True)
 
 async def main():
     async with bot:
@@ -4,13 +4,22 @@ import asyncio
 import logging
 import time
 import json
+import heapq
+import random
 import discord
-from functools import wraps
+import httpx
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps, lru_cache
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Callable, Any, List, Optional
+from typing import Dict, Callable, Any, List, Optional, Tuple
 from collections import defaultdict
 from postgrest.exceptions import APIError
 from supabase import create_client, AsyncClient
+from supabase.lib.client_options import AsyncClientOptions
+from utils.db_transport import create_http_client, get_pool_stats
+from utils.helpers import EmbedTemplate, compile_template
+from utils.game_events import publish_activity
 # ▼▼▼ [수정] SystemExit 추가 ▼▼▼
 from sys import exit 
 
@@ -22,7 +31,14 @@ try:
     key: str = os.environ.get("SUPABASE_KEY")
     if not url or not key:
         raise ValueError("SUPABASE_URL 또는 SUPABASE_KEY 환경 변수가 설정되지 않았습니다.")
-    supabase = AsyncClient(supabase_url=url, supabase_key=key)
+    # 모든 요청이 하나의 커넥션 풀(keep-alive, HTTP/2)을 재사용하도록 공유 클라이언트를 주입합니다.
+    _http_client = create_http_client()
+    try:
+        options = AsyncClientOptions(httpx_client=_http_client)
+    except TypeError:
+        logger.warning("설치된 supabase 버전이 httpx_client 주입을 지원하지 않아 기본 전송 설정을 사용합니다.")
+        options = AsyncClientOptions()
+    supabase = AsyncClient(supabase_url=url, supabase_key=key, options=options)
     logger.info("✅ Supabase 비동기 클라이언트가 성공적으로 생성되었습니다.")
 except Exception as e:
     logger.critical(f"❌ Supabase 클라이언트 생성에 실패했습니다: {e}", exc_info=True)
@@ -34,9 +50,22 @@ _bot_configs_cache: Dict[str, Any] = {}
 _channel_id_cache: Dict[str, int] = {}
 _item_database_cache: Dict[str, Dict[str, Any]] = {}
 _fishing_loot_cache: List[Dict[str, Any]] = []
+_fishing_loot_by_name: Dict[str, Dict[str, Any]] = {}
+_buyable_items_by_category: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+_item_names_by_category: Dict[str, frozenset] = {}
+_item_name_by_id_key: Dict[str, str] = {}
+_recipes_by_signature: Dict[Tuple[Tuple[str, int], ...], Dict[str, Any]] = {}
+_discovered_recipe_names: set = set()
+_unread_mail_counts: Dict[int, int] = {}
 _user_abilities_cache: Dict[int, tuple[List[str], float]] = {}
+_tutorial_progress_cache: Dict[int, Dict[str, Any]] = {}
+_daily_check_in_cache: Dict[str, Any] = {"date": None, "users": set()}
 _exploration_locations_cache: List[Dict[str, Any]] = []
 _exploration_loot_cache: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+_embed_cache: Dict[str, EmbedTemplate] = {}
+_missing_embed_keys: set = set()
+_panel_components_cache: Dict[str, List[Dict[str, Any]]] = {}
+_template_cache_version = 0
 _initial_load_complete = False
 
 
@@ -44,17 +73,140 @@ _initial_load_complete = False
 KST = timezone(timedelta(hours=9))
 BARE_HANDS = "맨손"
 DEFAULT_ROD = "평범한 낚싯대"
+DEFAULT_GEAR_SETUP = {"rod": BARE_HANDS, "bait": "미끼 없음", "hoe": BARE_HANDS, "watering_can": BARE_HANDS, "pickaxe": BARE_HANDS}
+
+# --- DB 호출 재시도 정책 ---
+# 일시적 오류(네트워크, 타임아웃, 5xx, 동시성 충돌)만 지수 백오프 + 지터로 재시도하고,
+# 영구적 오류(제약 조건 위반, 잘못된 입력, 코드 오류)는 즉시 실패 처리합니다.
+# 연속 실패가 누적되면 서킷 브레이커가 열려 일정 시간 동안 DB 호출을 바로 건너뜁니다.
+DEFAULT_CALL_DEADLINE = 10.0
+INTERACTION_RESPONSE_WINDOW = 3.0
+INTERACTION_FOLLOWUP_WINDOW = 15 * 60.0
+INTERACTION_DEADLINE_MARGIN = 0.3
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_OPEN_SECONDS = 15.0
+
+# SQLSTATE 중 재시도해도 결과가 같은 클래스 (데이터 오류, 제약 조건 위반, 구문/권한 오류, 사용자 정의 예외)
+_PERMANENT_SQLSTATE_PREFIXES = ("22", "23", "42", "P0", "PGRST")
+_TRANSIENT_SQLSTATES = {"40001", "40P01", "55P03", "57014", "57P01", "53300"}
+
+_retry_stats: Dict[str, int] = defaultdict(int)
+_call_deadline: ContextVar[Optional[float]] = ContextVar("db_call_deadline", default=None)
+
+class _CircuitBreaker:
+    def __init__(self, threshold: int, open_seconds: float):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+
+    def is_open(self) -> bool:
+        return time.monotonic() < self.opened_until
+
+    def record_success(self):
+        if self.consecutive_failures >= self.threshold:
+            logger.info("[DB] 서킷 브레이커가 닫혔습니다. DB 호출을 정상 재개합니다.")
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.threshold and not self.is_open():
+            self.opened_until = time.monotonic() + self.open_seconds
+            _retry_stats["circuit_opened"] += 1
+            logger.warning(f"[DB] 연속 {self.consecutive_failures}회 일시적 오류로 서킷 브레이커를 {self.open_seconds:.0f}초간 엽니다.")
+
+_circuit_breaker = _CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_OPEN_SECONDS)
+
+def is_transient_error(error: BaseException) -> bool:
+    """재시도로 해결될 수 있는 일시적 오류인지 판별합니다."""
+    if isinstance(error, APIError):
+        code = str(error.code or "")
+        if code in _TRANSIENT_SQLSTATES or code.startswith(("08", "53")):
+            return True
+        if code.startswith(_PERMANENT_SQLSTATE_PREFIXES):
+            return False
+        # 코드가 없거나 HTTP 상태 코드만 있는 경우(502 HTML 응답 등)는 게이트웨이 문제로 간주합니다.
+        return not code or code in ("429",) or code.startswith("5")
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ConnectionError, OSError))
+
+def may_have_reached_server(error: BaseException) -> bool:
+    """요청을 보낸 뒤 응답만 잃었을 수 있는 오류인지 판별합니다. 이 경우 쓰기는 이미 반영되었을 수 있습니다."""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return False
+    return isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException, httpx.ReadError, httpx.WriteError, httpx.RemoteProtocolError))
+
+def deadline_for_interaction(interaction: discord.Interaction) -> float:
+    """인터랙션 응답 가능 시간(응답 전 3초, 응답/defer 후 15분)에 맞춘 monotonic 마감 시각을 계산합니다."""
+    window = INTERACTION_FOLLOWUP_WINDOW if interaction.response.is_done() else INTERACTION_RESPONSE_WINDOW
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    return time.monotonic() + max(0.0, window - elapsed - INTERACTION_DEADLINE_MARGIN)
+
+@contextmanager
+def db_deadline(interaction: Optional[discord.Interaction] = None, seconds: Optional[float] = None):
+    """블록 안의 DB 호출이 재시도를 포함해 마감 시각을 넘기지 않도록 제한합니다."""
+    deadline = deadline_for_interaction(interaction) if interaction else time.monotonic() + (seconds or DEFAULT_CALL_DEADLINE)
+    if (outer := _call_deadline.get()) is not None:
+        deadline = min(deadline, outer)
+    token = _call_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _call_deadline.reset(token)
+
+def get_db_retry_stats() -> Dict[str, Any]:
+    """재시도/실패/서킷 브레이커 카운터를 반환합니다."""
+    return {**_retry_stats, "circuit_open": _circuit_breaker.is_open(), "consecutive_failures": _circuit_breaker.consecutive_failures}
 
-def supabase_retry_handler(retries: int = 3, delay: int = 2):
+def supabase_retry_handler(retries: int = 3, base_delay: float = 0.25, max_delay: float = 2.0, deadline: float = DEFAULT_CALL_DEADLINE, idempotent: bool = True):
+    """
+    일시적 오류를 재시도하는 데코레이터입니다. 실패하면 None을 반환합니다.
+    idempotent=False는 다시 보내면 중복 반영되는 쓰기(증감 RPC, 키 없는 insert 등)에 지정합니다.
+    이런 호출은 요청이 서버에 닿았을 수 있는 오류(응답 대기 시간 초과, 연결 끊김)에서는 재전송하지 않습니다.
+    """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def wrapper(*args: Any, **kwargs: Any) -> Any:
             if not supabase: return None
+            if _circuit_breaker.is_open():
+                _retry_stats["short_circuited"] += 1
+                return None
+            call_deadline = time.monotonic() + deadline
+            if (ctx_deadline := _call_deadline.get()) is not None:
+                call_deadline = min(call_deadline, ctx_deadline)
+            _retry_stats["calls"] += 1
             for attempt in range(retries):
-                try: return await func(*args, **kwargs)
+                if (remaining := call_deadline - time.monotonic()) <= 0:
+                    _retry_stats["deadline_exceeded"] += 1
+                    logger.error(f"'{func.__name__}' 함수 실행 전에 마감 시각이 지나 호출을 건너뜁니다. (시도 {attempt + 1}/{retries})")
+                    return None
+                try:
+                    # 한 번의 시도도 마감 시각을 넘기지 않도록 남은 시간으로 제한합니다. (초과 시 일시적 오류로 처리)
+                    result = await asyncio.wait_for(func(*args, **kwargs), remaining)
+                    _circuit_breaker.record_success()
+                    return result
                 except Exception as e:
-                    logger.error(f"'{func.__name__}' 함수 실행 중 오류 발생 (시도 {attempt + 1}/{retries}): {e}", exc_info=True)
-                    if attempt < retries - 1: await asyncio.sleep(delay)
+                    if not is_transient_error(e):
+                        _retry_stats["permanent_failures"] += 1
+                        logger.error(f"'{func.__name__}' 함수 실행 중 재시도 불가능한 오류 발생: {e}", exc_info=True)
+                        return None
+                    _circuit_breaker.record_failure()
+                    if not idempotent and may_have_reached_server(e):
+                        _retry_stats["ambiguous_failures"] += 1
+                        logger.error(f"'{func.__name__}' 함수의 요청이 서버에 반영되었는지 알 수 없어 다시 보내지 않습니다: {e!r}")
+                        return None
+                    backoff = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+                    out_of_time = time.monotonic() + backoff >= call_deadline
+                    if attempt >= retries - 1 or out_of_time or _circuit_breaker.is_open():
+                        _retry_stats["transient_failures"] += 1
+                        if out_of_time: _retry_stats["deadline_exceeded"] += 1
+                        logger.error(f"'{func.__name__}' 함수 실행 중 일시적 오류 발생 (시도 {attempt + 1}/{retries}, 재시도 중단): {e}", exc_info=True)
+                        return None
+                    _retry_stats["retries"] += 1
+                    logger.warning(f"'{func.__name__}' 함수 실행 중 일시적 오류 발생 (시도 {attempt + 1}/{retries}), {backoff:.2f}초 후 재시도합니다: {e}")
+                    await asyncio.sleep(backoff)
             return None
         return wrapper
     return decorator
@@ -68,7 +220,8 @@ async def load_all_data_from_db():
         load_bot_configs_from_db(), 
         load_channel_ids_from_db(), 
         load_game_data_from_db(),
-        load_exploration_data_from_db()
+        load_exploration_data_from_db(),
+        load_embed_templates_from_db()
     )
     logger.info("------ [ 모든 DB 데이터 캐시 로드 완료 ] ------")
     _initial_load_complete = True
@@ -98,16 +251,84 @@ async def load_channel_ids_from_db():
         _channel_id_cache = {item['channel_key']: int(item['channel_id']) for item in response.data if item.get('channel_id') and item['channel_id'] != '0'}
         logger.info(f"✅ {len(_channel_id_cache)}개의 채널/역할 ID를 DB에서 로드했습니다.")
 
+def _build_item_indexes(item_db: Dict[str, Dict[str, Any]]):
+    """상점/판매 화면용 인덱스(카테고리별 구매 목록, 카테고리별 이름 집합, id_key → 이름)를 만듭니다."""
+    buyable: Dict[str, List[Tuple[str, Dict[str, Any]]]] = defaultdict(list)
+    names: Dict[str, set] = defaultdict(set)
+    by_id_key: Dict[str, str] = {}
+    for name, data in item_db.items():
+        category = (data.get('category') or '').strip()
+        names[category].add(name)
+        if data.get('buyable'): buyable[category].append((name, data))
+        if id_key := data.get('id_key'): by_id_key[id_key] = name
+    for items in buyable.values():
+        items.sort(key=lambda item: int(item[1].get('price') or 0))
+    return dict(buyable), {category: frozenset(n) for category, n in names.items()}, by_id_key
+
+def _set_item_database(item_db: Dict[str, Dict[str, Any]]):
+    """아이템 캐시와 인덱스를 한 번에 교체하여, 읽는 쪽이 서로 어긋난 상태를 보지 않도록 합니다."""
+    global _item_database_cache, _buyable_items_by_category, _item_names_by_category, _item_name_by_id_key
+    indexes = _build_item_indexes(item_db)
+    _item_database_cache = item_db
+    _buyable_items_by_category, _item_names_by_category, _item_name_by_id_key = indexes
+
+def register_item_in_cache(item: Dict[str, Any]):
+    """DB에 새로 추가/수정한 아이템 한 개를 전체 리로드 없이 캐시와 인덱스에 반영합니다."""
+    data = dict(item)
+    _set_item_database({**_item_database_cache, data.pop('name'): data})
+
+def recipe_signature(ingredients: Any) -> Tuple[Tuple[str, int], ...]:
+    """재료 구성을 순서와 무관한 해시 가능한 값((이름, 수량) 정렬 튜플)으로 바꿉니다. JSON 문자열도 받습니다."""
+    if isinstance(ingredients, str):
+        try: ingredients = json.loads(ingredients)
+        except json.JSONDecodeError: return ()
+    if not isinstance(ingredients, dict): return ()
+    return tuple(sorted((name, int(qty)) for name, qty in ingredients.items() if int(qty or 0) > 0))
+
+def _set_recipes(recipes: List[Dict[str, Any]]):
+    global _recipes_by_signature
+    index: Dict[Tuple[Tuple[str, int], ...], Dict[str, Any]] = {}
+    for recipe in recipes:
+        if not (signature := recipe_signature(recipe.get('ingredients'))): continue
+        if (existing := index.get(signature)) is not None:
+            logger.warning(f"레시피 '{recipe.get('result_item_name')}'의 재료 구성이 '{existing.get('result_item_name')}'와 같아 무시합니다.")
+            continue
+        index[signature] = recipe
+    _recipes_by_signature = index
+
+def get_recipe_by_ingredients(ingredients: Any) -> Optional[Dict[str, Any]]:
+    return _recipes_by_signature.get(recipe_signature(ingredients))
+
+def claim_recipe_discovery(recipe_name: str) -> bool:
+    """서버에서 처음 발견된 레시피라면 발견 목록에 넣고 True를 반환합니다. (같은 프로세스 안의 동시 발견은 한 번만 통과)"""
+    if recipe_name in _discovered_recipe_names: return False
+    _discovered_recipe_names.add(recipe_name)
+    return True
+
+def release_recipe_discovery(recipe_name: str):
+    """발견 기록 저장에 실패했을 때 다음 요리에서 다시 시도할 수 있도록 되돌립니다."""
+    _discovered_recipe_names.discard(recipe_name)
+
 @supabase_retry_handler()
 async def load_game_data_from_db():
-    global _item_database_cache, _fishing_loot_cache
-    item_response = await supabase.table('items').select('*').execute()
+    global _fishing_loot_cache, _fishing_loot_by_name, _discovered_recipe_names
+    item_response, loot_response, recipe_response, discovered_response = await asyncio.gather(
+        supabase.table('items').select('*').execute(),
+        supabase.table('fishing_loots').select('*').execute(),
+        supabase.table('recipes').select('*').execute(),
+        supabase.table('discovered_recipes').select('recipe_name').execute()
+    )
     if item_response and item_response.data:
-        _item_database_cache = {item.pop('name'): item for item in item_response.data}
-    loot_response = await supabase.table('fishing_loots').select('*').execute()
+        _set_item_database({item.pop('name'): item for item in item_response.data})
     if loot_response and loot_response.data:
         _fishing_loot_cache = loot_response.data
-    logger.info(f"✅ 게임 데이터를 DB에서 로드했습니다. (아이템: {len(_item_database_cache)}개, 낚시: {len(_fishing_loot_cache)}개)")
+        # 이름 인덱스는 같은 dict 객체를 가리키므로, 시세 패치가 그대로 반영됩니다.
+        _fishing_loot_by_name = {loot['name']: loot for loot in _fishing_loot_cache}
+    if recipe_response and recipe_response.data:
+        _set_recipes(recipe_response.data)
+    if discovered_response and discovered_response.data is not None:
+        _discovered_recipe_names = {row['recipe_name'] for row in discovered_response.data}
+    logger.info(f"✅ 게임 데이터를 DB에서 로드했습니다. (아이템: {len(_item_database_cache)}개, 낚시: {len(_fishing_loot_cache)}개, 레시피: {len(_recipes_by_signature)}개)")
 
 @supabase_retry_handler()
 async def load_exploration_data_from_db():
@@ -120,15 +341,41 @@ async def load_exploration_data_from_db():
     if locations_res and locations_res.data:
         _exploration_locations_cache = locations_res.data
     
-    _exploration_loot_cache.clear()
+    # 새 dict로 교체해야 보상 테이블 캐시가 데이터 변경을 알아챌 수 있습니다.
+    new_loot_cache: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
     if loot_res and loot_res.data:
         for item in loot_res.data:
-            _exploration_loot_cache[item['location_key']].append(item)
+            new_loot_cache[item['location_key']].append(item)
+    _exploration_loot_cache = new_loot_cache
     logger.info(f"✅ 펫 탐사 데이터를 DB에서 로드했습니다. (지역: {len(_exploration_locations_cache)}개, 보상 설정: {len(loot_res.data)}개)")
 
+@supabase_retry_handler()
+async def load_embed_templates_from_db():
+    """embeds / panel_components 테이블 전체를 읽어 템플릿 캐시를 새 버전으로 교체합니다."""
+    global _embed_cache, _panel_components_cache, _missing_embed_keys, _template_cache_version
+    embeds_res, components_res = await asyncio.gather(
+        supabase.table('embeds').select('embed_key, embed_data').execute(),
+        supabase.table('panel_components').select('*').order('panel_key').order('row').order('order_in_row').execute()
+    )
+    version = _template_cache_version + 1
+    new_embed_cache = {
+        row['embed_key']: EmbedTemplate(row['embed_data'], row['embed_key'], version)
+        for row in (embeds_res.data if embeds_res and embeds_res.data else []) if isinstance(row.get('embed_data'), dict)
+    }
+    new_components_cache: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for component in (components_res.data if components_res and components_res.data else []):
+        new_components_cache[component['panel_key']].append(component)
+
+    # 모든 데이터를 다 만든 뒤 한 번에 교체하여, 읽는 쪽이 반쯤 갱신된 캐시를 보지 않도록 합니다.
+    _embed_cache, _panel_components_cache, _missing_embed_keys = new_embed_cache, dict(new_components_cache), set()
+    _template_cache_version = version
+    logger.info(f"✅ 템플릿 캐시를 로드했습니다. (버전: {version}, 임베드: {len(_embed_cache)}개, 패널 컴포넌트: {len(_panel_components_cache)}개 패널)")
+
+def get_template_cache_version() -> int:
+    return _template_cache_version
+
 @supabase_retry_handler()
 async def reload_game_data_from_db():
-    global _item_database_cache, _fishing_loot_cache
     try:
         await load_game_data_from_db()
         return True
@@ -136,30 +383,94 @@ async def reload_game_data_from_db():
         logger.error(f"게임 데이터 리로드 중 오류가 발생했습니다: {e}", exc_info=True)
         return False
 
+def get_db_pool_stats(reset_peak: bool = False) -> Dict[str, Any]:
+    """Supabase HTTP 커넥션 풀의 포화도 및 지연 시간 통계를 반환합니다."""
+    return get_pool_stats(reset_peak)
+
+@supabase_retry_handler()
+async def _get_market_price_history_page(since: str, start: int, page_size: int) -> List[Dict[str, Any]]:
+    # 같은 시각에 기록된 이력이 페이지 경계에서 섞이지 않도록 항목 키까지 정렬합니다.
+    response = await supabase.table('market_price_history').select('item_type, item_key, price').gte('recorded_at', since) \
+        .order('recorded_at').order('item_type').order('item_key').range(start, start + page_size - 1).execute()
+    return response.data if response and response.data else []
+
+async def get_market_price_history(days: int, page_size: int = 1000) -> Optional[List[Dict[str, Any]]]:
+    """
+    최근 N일간의 시세 이력을 시간순으로 가져옵니다. PostgREST 응답 행 수 제한을 넘지 않도록 페이지 단위로 읽고,
+    페이지마다 재시도/마감 시간을 따로 적용합니다. 한 페이지라도 읽지 못하면 None을 반환합니다.
+    """
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    history, start = [], 0
+    while True:
+        if (rows := await _get_market_price_history_page(since, start, page_size)) is None:
+            return None
+        history.extend(rows)
+        if len(rows) < page_size:
+            return history
+        start += page_size
+
+@supabase_retry_handler(idempotent=False)
+async def apply_market_price_changes(item_changes: List[Dict[str, Any]], fish_changes: List[Dict[str, Any]]) -> bool:
+    """
+    바뀐 시세만 한 번의 RPC로 반영합니다.
+    'apply_market_prices' 함수는 items.current_price / fishing_loots.current_base_value를 갱신하고
+    같은 트랜잭션에서 market_price_history(item_type, item_key, price)에 이력을 추가합니다.
+    """
+    await supabase.rpc('apply_market_prices', {'p_items': item_changes, 'p_fish': fish_changes}).execute()
+    return True
+
+def patch_market_prices_in_cache(item_changes: List[Dict[str, Any]], fish_changes: List[Dict[str, Any]]):
+    """DB 재조회 없이 메모리의 아이템/낚시 캐시에 새 시세를 반영합니다."""
+    for change in item_changes:
+        if item := _item_database_cache.get(change['name']):
+            item['current_price'] = change['current_price']
+    fish_prices = {change['id']: change['current_base_value'] for change in fish_changes}
+    for fish in _fishing_loot_cache:
+        if fish.get('id') in fish_prices:
+            fish['current_base_value'] = fish_prices[fish['id']]
+
 def get_config(key: str, default: Any = None) -> Any: return _bot_configs_cache.get(key, default)
 def get_id(key: str) -> Optional[int]: return _channel_id_cache.get(key)
 def get_item_database() -> Dict[str, Dict[str, Any]]: return _item_database_cache
+def get_item_name_by_id_key(id_key: str) -> Optional[str]: return _item_name_by_id_key.get(id_key)
+def get_item_names_in_category(category: str) -> frozenset: return _item_names_by_category.get(category, frozenset())
+
+def get_buyable_items(*categories: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """카테고리별로 미리 가격순 정렬해 둔 구매 가능 아이템 목록을 반환합니다. 여러 카테고리는 가격순으로 병합합니다."""
+    if len(categories) == 1: return _buyable_items_by_category.get(categories[0], [])
+    return list(heapq.merge(*(_buyable_items_by_category.get(c, []) for c in categories), key=lambda item: int(item[1].get('price') or 0)))
 def get_fishing_loot() -> List[Dict[str, Any]]: return _fishing_loot_cache
+def get_fishing_loot_by_name() -> Dict[str, Dict[str, Any]]: return _fishing_loot_by_name
+
+def get_fish_sell_price(fish_name: str, size: float) -> int:
+    """현재 시세 기준으로 물고기 한 마리의 판매가를 계산합니다. (기본 가치 + 크기 보너스)"""
+    loot_info = _fishing_loot_by_name.get(fish_name, {})
+    base_value = loot_info.get('current_base_value')
+    if base_value is None: base_value = loot_info.get('base_value', 0)
+    return int(base_value + size * loot_info.get('size_multiplier', 0))
 
 def get_exploration_locations() -> List[Dict[str, Any]]:
     return _exploration_locations_cache
 
+def get_exploration_loot_cache() -> Dict[str, List[Dict[str, Any]]]: return _exploration_loot_cache
+
 def get_exploration_loot(location_key: str, pet_level: int) -> List[Dict[str, Any]]:
     """특정 지역에서 해당 펫 레벨에 맞는 모든 보상 목록을 반환합니다."""
     all_loot_for_location = _exploration_loot_cache.get(location_key, [])
     return [loot for loot in all_loot_for_location]
 
 
+@lru_cache(maxsize=1024)
+def _split_key_path(key_path: str) -> Tuple[str, ...]:
+    return tuple(key_path.split('.'))
+
 def get_string(key_path: str, default: Any = None, **kwargs) -> Any:
     try:
-        keys = key_path.split('.')
         value = get_config("strings", {})
-        for key in keys:
+        for key in _split_key_path(key_path):
             value = value[key]
         if isinstance(value, str) and kwargs:
-            class SafeFormatter(dict):
-                def __missing__(self, key: str) -> str: return f'{{{key}}}'
-            return value.format_map(SafeFormatter(**kwargs))
+            return compile_template(value).render(kwargs)
         return value
     except (KeyError, TypeError):
         return default if default is not None else f"[{key_path}]"
@@ -183,9 +494,14 @@ async def save_id_to_db(key: str, object_id: int):
     await supabase.table('channel_configs').upsert({"channel_key": key, "channel_id": str(object_id)}, on_conflict="channel_key").execute()
     _channel_id_cache[key] = object_id
 
+@supabase_retry_handler()
 async def save_panel_id(panel_name: str, message_id: int, channel_id: int):
-    await save_id_to_db(f"panel_{panel_name}_message_id", message_id)
-    await save_id_to_db(f"panel_{panel_name}_channel_id", channel_id)
+    """패널의 메시지/채널 ID를 저장합니다. 값이 바뀐 항목만 한 번의 upsert로 기록합니다."""
+    changed = {key: object_id for key, object_id in ((f"panel_{panel_name}_message_id", message_id), (f"panel_{panel_name}_channel_id", channel_id)) if _channel_id_cache.get(key) != object_id}
+    if not changed:
+        return
+    await supabase.table('channel_configs').upsert([{"channel_key": key, "channel_id": str(object_id)} for key, object_id in changed.items()], on_conflict="channel_key").execute()
+    _channel_id_cache.update(changed)
 
 def get_panel_id(panel_name: str) -> Optional[Dict[str, int]]:
     message_id = get_id(f"panel_{panel_name}_message_id")
@@ -198,15 +514,34 @@ def is_whale_available() -> bool:
 async def set_whale_caught():
     await save_config_to_db("whale_announcement_message_id", None)
 
-@supabase_retry_handler()
 async def get_embed_from_db(embed_key: str) -> Optional[dict]:
+    """
+    임베드 템플릿을 캐시에서 꺼내 사본(EmbedTemplate)으로 반환합니다.
+    캐시에 없는 키는 DB에서 한 번 조회한 뒤 캐시에 추가합니다.
+    """
+    if embed_key not in _embed_cache and embed_key not in _missing_embed_keys:
+        await _fetch_embed_template(embed_key)
+    template = _embed_cache.get(embed_key)
+    return template.clone() if template is not None else None
+
+async def get_panel_components_from_db(panel_key: str) -> list:
+    """패널 컴포넌트 목록을 캐시에서 꺼내 사본으로 반환합니다."""
+    if panel_key not in _panel_components_cache:
+        await _fetch_panel_components(panel_key)
+    return [dict(component) for component in _panel_components_cache.get(panel_key, [])]
+
+@supabase_retry_handler()
+async def _fetch_embed_template(embed_key: str):
     response = await supabase.table('embeds').select('embed_data').eq('embed_key', embed_key).limit(1).execute()
-    return response.data[0]['embed_data'] if response and response.data else None
+    if response and response.data and isinstance(embed_data := response.data[0]['embed_data'], dict):
+        _embed_cache[embed_key] = EmbedTemplate(embed_data, embed_key, _template_cache_version)
+    else:
+        _missing_embed_keys.add(embed_key)
 
 @supabase_retry_handler()
-async def get_panel_components_from_db(panel_key: str) -> list:
+async def _fetch_panel_components(panel_key: str):
     response = await supabase.table('panel_components').select('*').eq('panel_key', panel_key).order('row').order('order_in_row').execute()
-    return response.data if response and response.data else []
+    _panel_components_cache[panel_key] = response.data if response and response.data else []
 
 @supabase_retry_handler()
 async def get_or_create_user(table_name: str, user_id: int, default_data: dict) -> dict:
@@ -224,7 +559,7 @@ async def get_or_create_user(table_name: str, user_id: int, default_data: dict)
 async def get_wallet(user_id: int) -> dict:
     return await get_or_create_user('wallets', user_id, {"balance": 0})
 
-@supabase_retry_handler()
+@supabase_retry_handler(idempotent=False)
 async def update_wallet(user: discord.User, amount: int) -> Optional[dict]:
     params = {'p_user_id': str(user.id), 'p_amount': amount}
     response = await supabase.rpc('update_wallet_balance', params).select().maybe_single().execute()
@@ -235,11 +570,103 @@ async def get_inventory(user: discord.User) -> Dict[str, int]:
     response = await supabase.table('inventories').select('item_name, quantity').eq('user_id', str(user.id)).gt('quantity', 0).execute()
     return {item['item_name']: item['quantity'] for item in response.data} if response and response.data else {}
 
-@supabase_retry_handler()
+@supabase_retry_handler(idempotent=False)
 async def update_inventory(user_id: int, item_name: str, quantity: int):
     params = {'p_user_id': str(user_id), 'p_item_name': item_name, 'p_quantity_delta': quantity}
     await supabase.rpc('update_inventory_quantity', params).execute()
 
+@supabase_retry_handler(idempotent=False)
+async def update_inventories(deltas_by_user: Dict[Any, Dict[str, int]]) -> Optional[bool]:
+    """
+    여러 유저/아이템의 수량 변화를 apply_inventory_deltas RPC 한 번(한 트랜잭션)으로 적용합니다.
+    어느 하나라도 수량이 음수가 되면 전체를 취소하고 False를, 적용되면 True를, DB 오류면 None을 반환합니다.
+    """
+    rows = [
+        {'user_id': str(user_id), 'item_name': item_name, 'delta': int(delta)}
+        for user_id, deltas in deltas_by_user.items() for item_name, delta in deltas.items() if delta
+    ]
+    if not rows: return True
+    res = await supabase.rpc('apply_inventory_deltas', {'p_deltas': rows}).execute()
+    return bool(res and res.data)
+
+async def update_inventory_many(user_id: int, deltas: Dict[str, int]) -> Optional[bool]:
+    """한 유저의 여러 아이템 수량 변화를 한 번에 적용합니다. (예: {"밀가루": -2, "호박죽": 1})"""
+    return await update_inventories({user_id: deltas})
+
+# --- 우편 ---
+# 발송과 수령은 각각 RPC 한 번(한 트랜잭션)으로 처리합니다.
+# 잔액/재고 검증, 코인과 아이템 이동, 우편 행 생성 또는 수령 표시가 함께 커밋되거나 함께 취소됩니다.
+# 유저별 '받지 않은 우편' 수는 우편함 조회 결과로 채우고, 이 프로세스의 발송/수령/삭제/만료 정리로 갱신합니다.
+# (우편은 이 봇에서만 만들어지므로, 캐시된 0은 그대로 믿고 우편함을 조회하지 않습니다.)
+MAIL_EXPIRY_DAYS = 30
+MAILBOX_PAGE_SIZE = 5
+MAIL_SWEEP_BATCH_SIZE = 500
+
+def get_cached_unread_mail_count(user_id: int) -> Optional[int]:
+    return _unread_mail_counts.get(user_id)
+
+def _adjust_unread_mail_count(user_id: int, delta: int):
+    if (count := _unread_mail_counts.get(user_id)) is not None:
+        _unread_mail_counts[user_id] = max(0, count + delta)
+
+def _rpc_row(res) -> Optional[Dict[str, Any]]:
+    if not (res and res.data): return None
+    return res.data[0] if isinstance(res.data, list) else res.data
+
+@supabase_retry_handler()
+async def create_mail(request_id: str, sender_id: int, recipient_id: int, message: str, items: Dict[str, int], shipping_fee: int) -> Optional[Dict[str, Any]]:
+    """
+    배송비와 첨부 아이템을 차감하고 우편을 만듭니다. 결과는 {"ok", "mail_id", "reason"}이며,
+    reason은 'insufficient_coins' 또는 'insufficient_items'입니다.
+    같은 request_id로 다시 호출하면 이미 만든 우편을 돌려주므로 재시도되어도 두 번 발송되지 않습니다.
+    """
+    res = await supabase.rpc('send_mail', {
+        'p_request_id': request_id, 'p_sender_id': str(sender_id), 'p_recipient_id': str(recipient_id),
+        'p_message': message, 'p_items': {name: int(qty) for name, qty in items.items() if qty > 0},
+        'p_shipping_fee': shipping_fee,
+        'p_expires_at': (datetime.now(timezone.utc) + timedelta(days=MAIL_EXPIRY_DAYS)).isoformat()
+    }).execute()
+    if (row := _rpc_row(res)) and row.get('ok'): _adjust_unread_mail_count(recipient_id, 1)
+    return row
+
+@supabase_retry_handler()
+async def claim_mails(user_id: int, mail_ids: List[int]) -> Optional[Dict[str, Any]]:
+    """
+    받는 사람이 user_id이고 아직 받지 않은 우편만 수령 처리하고 첨부 아이템을 지급합니다.
+    결과는 {"claimed_count", "items": {아이템: 수량}}이며, 이미 받은 우편은 건너뛰므로 다시 호출해도 중복 지급되지 않습니다.
+    """
+    res = await supabase.rpc('claim_mails', {'p_user_id': str(user_id), 'p_mail_ids': [int(mid) for mid in mail_ids]}).execute()
+    if row := _rpc_row(res): _adjust_unread_mail_count(user_id, -int(row.get('claimed_count') or 0))
+    return row
+
+@supabase_retry_handler()
+async def get_mailbox_page(user_id: int, page: int, page_size: int = MAILBOX_PAGE_SIZE) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+    """받지 않았고 만료되지 않은 우편 한 페이지와 전체 개수를 한 번의 조회로 가져옵니다."""
+    if get_cached_unread_mail_count(user_id) == 0: return [], 0
+    start = page * page_size
+    res = await supabase.table('mails').select('*, mail_attachments(*)', count='exact') \
+        .eq('recipient_id', str(user_id)).is_('claimed_at', None).gt('expires_at', datetime.now(timezone.utc).isoformat()) \
+        .order('sent_at', desc=True).range(start, start + page_size - 1).execute()
+    total = (res.count or 0) if res else 0
+    _unread_mail_counts[user_id] = total
+    return (res.data or [] if res else []), total
+
+@supabase_retry_handler()
+async def delete_mails(user_id: int, mail_ids: List[int]) -> int:
+    res = await supabase.table('mails').delete().in_('id', [int(mid) for mid in mail_ids]).eq('recipient_id', str(user_id)).execute()
+    deleted = (res.data or []) if res else []
+    _adjust_unread_mail_count(user_id, -sum(1 for row in deleted if not row.get('claimed_at')))
+    return len(deleted)
+
+@supabase_retry_handler()
+async def archive_expired_mails(batch_size: int = MAIL_SWEEP_BATCH_SIZE) -> int:
+    """만료된 우편을 batch_size통까지 첨부와 함께 mails_archive로 옮기고 원본을 지웁니다. 옮긴 개수를 반환합니다."""
+    res = await supabase.rpc('archive_expired_mails', {'p_batch_size': batch_size}).execute()
+    archived = int(res.data or 0) if res else 0
+    # 누구의 우편이 정리됐는지 모르므로, 다음 조회에서 다시 셉니다.
+    if archived: _unread_mail_counts.clear()
+    return archived
+
 @supabase_retry_handler()
 async def ensure_user_gear_exists(user_id: int):
     await supabase.rpc('create_user_gear_if_not_exists', {'p_user_id': str(user_id)}).execute()
@@ -255,7 +682,36 @@ async def get_user_gear(user: discord.User) -> dict:
         return response.data
     
     logger.warning(f"DB에서 유저(ID: {user.id})의 장비 정보를 가져오지 못했습니다. 기본값을 반환합니다.")
-    return {"rod": BARE_HANDS, "bait": "미끼 없음", "hoe": BARE_HANDS, "watering_can": BARE_HANDS, "pickaxe": BARE_HANDS}
+    return dict(DEFAULT_GEAR_SETUP)
+
+@supabase_retry_handler()
+async def _get_gear_user_id_page(after: Optional[str], page_size: int) -> List[str]:
+    query = supabase.table('gear_setups').select('user_id')
+    if after is not None: query = query.gt('user_id', after)
+    response = await query.order('user_id').limit(page_size).execute()
+    return [row['user_id'] for row in response.data] if response and response.data else []
+
+async def get_all_gear_user_ids(page_size: int = 1000) -> Optional[set]:
+    """
+    gear_setups에 행이 있는 모든 user_id를 집합으로 반환합니다. 한 페이지라도 읽지 못하면 None을 반환합니다.
+    페이지마다 재시도/마감 시간을 따로 적용하고, 마지막으로 읽은 user_id 다음부터 이어 읽습니다. (키셋 페이지네이션)
+    """
+    user_ids, last = set(), None
+    while True:
+        if (page := await _get_gear_user_id_page(last, page_size)) is None:
+            return None
+        user_ids.update(int(user_id) for user_id in page)
+        if len(page) < page_size:
+            return user_ids
+        last = page[-1]
+
+@supabase_retry_handler()
+async def bulk_create_user_gear(user_ids: List[int]):
+    """여러 유저의 기본 장비 행을 한 번의 upsert로 생성합니다. 이미 있는 행은 건드리지 않습니다."""
+    if not user_ids:
+        return
+    rows = [{"user_id": str(uid), **DEFAULT_GEAR_SETUP} for uid in user_ids]
+    await supabase.table('gear_setups').upsert(rows, on_conflict="user_id", ignore_duplicates=True).execute()
 
 @supabase_retry_handler()
 async def set_user_gear(user_id: int, **kwargs):
@@ -269,10 +725,105 @@ async def get_aquarium(user_id: int) -> list:
     return response.data if response and response.data else []
 
 @supabase_retry_handler()
+async def get_aquarium_page(user_id: int, after_id: Optional[int] = None, limit: int = 25) -> list:
+    """어항을 id 기준 키셋 방식으로 한 페이지씩 가져옵니다. (after_id보다 큰 id부터 limit개)"""
+    query = supabase.table('aquariums').select('id, name, size, emoji').eq('user_id', str(user_id))
+    if after_id is not None:
+        query = query.gt('id', after_id)
+    response = await query.order('id').limit(limit).execute()
+    return response.data if response and response.data else []
+
+@supabase_retry_handler()
+async def get_aquarium_summary(user_id: int) -> list:
+    """어종별 집계(마릿수, 최소/최대/평균 크기)를 DB에서 계산해 가져옵니다."""
+    response = await supabase.rpc('get_aquarium_summary', {'p_user_id': str(user_id)}).execute()
+    return response.data if response and response.data else []
+
+@supabase_retry_handler(idempotent=False)
+async def sell_fishes_by_filter(
+    user_id: int, species: Optional[str] = None, min_size: Optional[float] = None,
+    max_size: Optional[float] = None, max_value: Optional[int] = None
+) -> Optional[Dict[str, int]]:
+    """
+    조건(어종, 크기 범위, 판매가 상한)에 맞는 물고기를 한 번의 RPC로 모두 판매합니다.
+    판매가는 현재 캐시된 시세(기본 가치 + 크기 * 배율)로 DB에서 계산되며,
+    삭제, 지갑 입금, sell_fish 활동 기록이 한 트랜잭션으로 처리됩니다. {'sold_count', 'total_value'}를 반환합니다.
+    """
+    loots = [_fishing_loot_by_name[species]] if species in _fishing_loot_by_name else ([] if species else _fishing_loot_cache)
+    # 어항에 들어가는 것은 크기가 있는 물고기뿐이므로, 가격표도 물고기 행만으로 만듭니다. (NULL 값은 0으로)
+    price_table = {
+        loot['name']: {
+            'base_value': (loot['current_base_value'] if loot.get('current_base_value') is not None else loot.get('base_value')) or 0,
+            'size_multiplier': loot.get('size_multiplier') or 0
+        }
+        for loot in loots if loot.get('min_size') is not None
+    }
+    if not price_table:
+        return {'sold_count': 0, 'total_value': 0}
+    params = {
+        'p_user_id': str(user_id), 'p_price_table': price_table, 'p_species': species,
+        'p_min_size': min_size, 'p_max_size': max_size, 'p_max_value': max_value
+    }
+    response = await supabase.rpc('sell_fishes_by_filter', params).execute()
+    result = response.data[0] if response and isinstance(response.data, list) and response.data else (response.data if response else None)
+    if not isinstance(result, dict):
+        return None
+    sold = {'sold_count': int(result.get('sold_count') or 0), 'total_value': int(result.get('total_value') or 0)}
+    if sold['sold_count']: publish_activity(user_id, 'sell_fish', amount=sold['sold_count'])
+    return sold
+
+@supabase_retry_handler(idempotent=False)
 async def add_to_aquarium(user_id: int, fish_data: dict):
     await supabase.table('aquariums').insert({"user_id": str(user_id), **fish_data}).execute()
 
+@supabase_retry_handler(idempotent=False)
+async def resolve_fishing_catch(
+    user_id: int, bait_used: Optional[str] = None, fish: Optional[Dict[str, Any]] = None,
+    coin_delta: int = 0, xp: int = 0, claim_whale: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    낚시 한 번의 결과를 하나의 RPC(한 트랜잭션)로 처리합니다.
+    미끼 차감, 어항 추가 또는 코인 증감, XP 지급, 활동 기록, 고래 공지 해제를 함께 반영하고
+    {'whale_claimed': bool, 'level_result': add_xp와 같은 형식의 레벨업 정보}를 반환합니다.
+    놓치거나 시간이 초과된 경우에는 fish 없이 호출해 미끼만 차감합니다.
+    """
+    params = {
+        'p_user_id': str(user_id), 'p_bait': bait_used, 'p_fish': fish,
+        'p_coin_delta': coin_delta, 'p_xp': xp, 'p_claim_whale': claim_whale
+    }
+    response = await supabase.rpc('resolve_fishing_catch', params).execute()
+    result = response.data[0] if response and isinstance(response.data, list) and response.data else (response.data if response else None)
+    if not isinstance(result, dict):
+        return None
+    if result.get('whale_claimed'):
+        # 고래 공지 키는 RPC 안에서 지워졌으므로 로컬 캐시만 맞춰 줍니다.
+        _bot_configs_cache["whale_announcement_message_id"] = None
+    return {'whale_claimed': bool(result.get('whale_claimed')), 'level_result': result.get('level_result') or []}
+
+@supabase_retry_handler()
+async def checkpoint_mining_session(user_id: int, mined_ores: Dict[str, int], xp_earned: int, mined_count: int):
+    """진행 중인 광산 세션의 누적 채굴량을 저장합니다. (재시작 시 복구용 체크포인트)"""
+    await supabase.table('mining_sessions').update({
+        'mined_ores_json': mined_ores, 'xp_earned': xp_earned, 'mined_count': mined_count
+    }).eq('user_id', str(user_id)).execute()
+
 @supabase_retry_handler()
+async def settle_mining_session(
+    user_id: int, mined_ores: Optional[Dict[str, int]] = None, xp_earned: Optional[int] = None, mined_count: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    광산 세션을 한 번의 RPC로 정산하고 종료합니다.
+    광석 지급, XP 지급, 활동 기록, 세션 삭제를 한 트랜잭션으로 처리합니다.
+    mined_ores가 None이면 마지막 체크포인트 값으로 정산합니다. (메모리 상태가 없는 방치된 세션)
+    정산된 세션 정보 {'thread_id', 'pickaxe_name', 'mined_ores_json', 'level_result'}를 반환하며,
+    세션이 이미 정산되었다면 빈 dict를, DB 오류로 정산하지 못했다면 None을 반환합니다.
+    """
+    params = {'p_user_id': str(user_id), 'p_ores': mined_ores, 'p_xp': xp_earned, 'p_mined_count': mined_count}
+    response = await supabase.rpc('settle_mining_session', params).execute()
+    result = response.data[0] if isinstance(response.data, list) and response.data else response.data
+    return result if isinstance(result, dict) and result.get('thread_id') else {}
+
+@supabase_retry_handler(idempotent=False)
 async def sell_fish_from_db(user_id: int, fish_ids: List[int], total_sell_price: int):
     params = {'p_user_id': str(user_id), 'p_fish_ids': fish_ids, 'p_total_value': total_sell_price}
     await supabase.rpc('sell_fishes', params).execute()
@@ -320,21 +871,87 @@ async def create_initial_user_data(user_id: int):
     except Exception as e:
         logger.error(f"신규 유저(ID: {user_id}) 데이터 생성 중 오류 발생: {e}", exc_info=True)
 
-@supabase_retry_handler()
+@supabase_retry_handler(idempotent=False)
 async def log_activity(
     user_id: int, activity_type: str, amount: int = 1,
     xp_earned: int = 0, coin_earned: int = 0
 ):
-    try:
-        await supabase.table('user_activities').insert({
-            'user_id': str(user_id),
-            'activity_type': activity_type,
-            'amount': amount,
-            'xp_earned': xp_earned,
-            'coin_earned': coin_earned
-        }).execute()
-    except Exception as e:
-        logger.error(f"활동 기록(log_activity) 중 오류가 발생했습니다: {e}", exc_info=True)
+    # 오류는 재시도 핸들러가 분류/기록하도록 그대로 올려 보내고, 기록이 저장된 뒤에만 이벤트를 발행합니다.
+    # (저장되지 않은 활동으로 튜토리얼 마일스톤이나 퀘스트 카운터가 올라가지 않도록)
+    await supabase.table('user_activities').insert({
+        'user_id': str(user_id),
+        'activity_type': activity_type,
+        'amount': amount,
+        'xp_earned': xp_earned,
+        'coin_earned': coin_earned
+    }).execute()
+    publish_activity(user_id, activity_type, amount=amount)
+
+# --- 튜토리얼 진행도 ---
+# user_tutorials 한 행(current_step, is_completed, milestones)을 캐시해 두고,
+# 마일스톤은 활동 이벤트가 들어올 때 add_tutorial_milestones RPC로 합집합만 기록합니다.
+
+def _cache_tutorial_progress(user_id: int, row: Dict[str, Any]) -> Dict[str, Any]:
+    progress = {
+        'user_id': str(user_id), 'current_step': row.get('current_step') or 1,
+        'is_completed': bool(row.get('is_completed')), 'milestones': frozenset(row.get('milestones') or ())
+    }
+    _tutorial_progress_cache[user_id] = progress
+    return progress
+
+def get_cached_tutorial_progress(user_id: int) -> Optional[Dict[str, Any]]:
+    return _tutorial_progress_cache.get(user_id)
+
+@supabase_retry_handler()
+async def get_tutorial_progress(user_id: int) -> Dict[str, Any]:
+    """튜토리얼 진행도를 캐시에서 읽습니다. 처음 조회하는 유저는 행을 만들거나 읽어 캐시에 넣습니다."""
+    if (cached := _tutorial_progress_cache.get(user_id)) is not None: return cached
+    res = await supabase.table('user_tutorials').upsert({'user_id': str(user_id)}, on_conflict='user_id', ignore_duplicates=True).execute()
+    if not (res and res.data):
+        res = await supabase.table('user_tutorials').select('*').eq('user_id', str(user_id)).maybe_single().execute()
+    return _cache_tutorial_progress(user_id, (res.data[0] if isinstance(res.data, list) else res.data) if res and res.data else {})
+
+@supabase_retry_handler()
+async def add_tutorial_milestones(user_id: int, milestones: List[str]) -> Optional[Dict[str, Any]]:
+    """마일스톤을 기록합니다. 이미 기록된 것만 있으면 DB를 호출하지 않습니다."""
+    cached = _tutorial_progress_cache.get(user_id)
+    if cached is not None and (cached['is_completed'] or cached['milestones'].issuperset(milestones)): return cached
+    res = await supabase.rpc('add_tutorial_milestones', {'p_user_id': str(user_id), 'p_milestones': list(milestones)}).execute()
+    if not (res and res.data): return None
+    return _cache_tutorial_progress(user_id, res.data[0] if isinstance(res.data, list) else res.data)
+
+@supabase_retry_handler()
+async def advance_tutorial_step(user_id: int, next_step: int, is_completed: bool):
+    await supabase.table('user_tutorials').update({
+        'current_step': next_step, 'is_completed': is_completed,
+        'last_updated': datetime.now(timezone.utc).isoformat()
+    }).eq('user_id', str(user_id)).execute()
+    if (cached := _tutorial_progress_cache.get(user_id)) is not None:
+        _tutorial_progress_cache[user_id] = {**cached, 'current_step': next_step, 'is_completed': is_completed}
+
+# --- 출석 체크 ---
+# claim_daily_check_in RPC가 (유저, KST 날짜) 기준으로 출석 기록, 활동 로그, 보상 지급을 한 트랜잭션에서 처리하고
+# 새로 출석했는지 여부를 반환합니다. 오늘 출석한 유저는 날짜별 집합에 기억해 두어 다시 누르면 DB를 호출하지 않습니다.
+
+def _today_check_in_users() -> set:
+    today = datetime.now(KST).date().isoformat()
+    if _daily_check_in_cache["date"] != today:
+        _daily_check_in_cache["date"], _daily_check_in_cache["users"] = today, set()
+    return _daily_check_in_cache["users"]
+
+def has_checked_in_today(user_id: int) -> bool:
+    return user_id in _today_check_in_users()
+
+@supabase_retry_handler()
+async def claim_daily_check_in(user_id: int, reward: int) -> Optional[bool]:
+    """오늘 첫 출석이면 보상을 지급하고 True를, 이미 출석했다면 False를, DB 오류로 처리하지 못했다면 None을 반환합니다."""
+    if has_checked_in_today(user_id): return False
+    check_date = _daily_check_in_cache["date"]
+    res = await supabase.rpc('claim_daily_check_in', {'p_user_id': str(user_id), 'p_check_date': check_date, 'p_reward': reward}).execute()
+    claimed = bool(res and res.data)
+    if _daily_check_in_cache["date"] == check_date: _daily_check_in_cache["users"].add(user_id)
+    if claimed: publish_activity(user_id, 'daily_check_in', amount=1)
+    return claimed
 
 @supabase_retry_handler()
 async def get_all_user_stats(user_id: int) -> Dict[str, Any]:
@@ -356,8 +973,14 @@ async def get_all_user_stats(user_id: int) -> Dict[str, Any]:
         logger.error(f"전체 유저 통계 VIEW 조회 중 오류가 발생했습니다: {e}")
         return {}
 
-# --- ▼▼▼▼▼ 핵심 수정 시작 ▼▼▼▼▼ ---
 @supabase_retry_handler()
+async def get_period_stats(user_id: int, view_name: str) -> Optional[Dict[str, Any]]:
+    """daily_stats/weekly_stats 같은 기간 통계 뷰에서 한 유저의 행을 읽습니다. 조회에 실패하면 None을 반환합니다."""
+    res = await supabase.table(view_name).select('*').eq('user_id', str(user_id)).maybe_single().execute()
+    return res.data if res and res.data else {}
+
+# --- ▼▼▼▼▼ 핵심 수정 시작 ▼▼▼▼▼ ---
+@supabase_retry_handler(idempotent=False)
 async def log_chest_reward(user_id: int, chest_type: str, contents: Dict[str, Any]):
     """
     유저가 획득한 보물 상자의 내용물을 DB에 기록합니다.
@@ -370,7 +993,7 @@ async def log_chest_reward(user_id: int, chest_type: str, contents: Dict[str, An
 
 
 # --- ▼▼▼▼▼ 핵심 수정 시작 ▼▼▼▼▼ ---
-@supabase_retry_handler()
+@supabase_retry_handler(idempotent=False)
 async def open_boss_chest(user_id: int, chest_type: str) -> Optional[Dict[str, Any]]:
     """
     [수정됨] DB 함수 대신 Python에서 직접 상자를 열고 내용물을 처리합니다.
@@ -455,7 +1078,7 @@ async def get_farmable_item_info(item_name: str) -> Optional[Dict[str, Any]]:
     response = await supabase.table('farm_item_details').select('*').eq('item_name', item_name).maybe_single().execute()
     return response.data if response and hasattr(response, 'data') else None
 
-@supabase_retry_handler()
+@supabase_retry_handler(idempotent=False)
 async def add_xp_to_pet_db(user_id: int, xp_to_add: int) -> Optional[List[Dict]]:
     """
     [최종 수정] 펫에게 경험치를 추가하고, 'Pet not found' 오류를 정상 처리하며, user_id를 int로 전달하는 DB 함수를 안전하게 호출합니다.
@@ -493,7 +1116,7 @@ async def add_xp_to_pet_db(user_id: int, xp_to_add: int) -> Optional[List[Dict]]
         # 알 수 없는 기타 예외도 재시도를 위해 상위로 전달
         raise e
         
-@supabase_retry_handler()
+@supabase_retry_handler(idempotent=False)
 async def start_pet_exploration(pet_id: int, user_id: int, location_key: str, start_time: datetime, end_time: datetime) -> Optional[Dict]:
     """새로운 펫 탐사를 시작하고, pets 테이블 상태를 업데이트합니다."""
     # 1. pet_explorations 테이블에 새로운 탐사 기록 생성
@@ -588,7 +1211,7 @@ async def get_inventories_for_users(user_ids: List[int]) -> Dict[int, Dict[str,
     
     return dict(inventories)
 
-@supabase_retry_handler()
+@supabase_retry_handler(idempotent=False)
 async def create_pvp_match(challenger_id: int, opponent_id: int) -> Optional[Dict]:
     """새로운 PvP 대전 기록을 생성하고 반환합니다."""
     res = await supabase.table('pet_pvp_matches').insert({
@@ -0,0 +1,114 @@
+# game-bot/utils/db_transport.py
+"""
+Supabase 클라이언트가 공유하는 HTTP 커넥션 풀과 계측(metrics)을 정의하는 파일입니다.
+환경 변수로 풀 크기, keep-alive, 타임아웃, HTTP/2 사용 여부를 조정할 수 있습니다.
+"""
+import os
+import time
+import logging
+import importlib.util
+from collections import deque
+from typing import Any, Deque, Dict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+def _env_int(name: str, default: int) -> int:
+    try: return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        logger.warning(f"환경 변수 {name}의 값이 올바르지 않아 기본값 {default}을(를) 사용합니다.")
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    try: return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        logger.warning(f"환경 변수 {name}의 값이 올바르지 않아 기본값 {default}을(를) 사용합니다.")
+        return default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None: return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+POOL_MAX_CONNECTIONS = _env_int("SUPABASE_POOL_MAX_CONNECTIONS", 100)
+POOL_MAX_KEEPALIVE = _env_int("SUPABASE_POOL_MAX_KEEPALIVE", 20)
+POOL_KEEPALIVE_EXPIRY = _env_float("SUPABASE_POOL_KEEPALIVE_EXPIRY", 30.0)
+REQUEST_TIMEOUT = _env_float("SUPABASE_TIMEOUT", 10.0)
+CONNECT_TIMEOUT = _env_float("SUPABASE_CONNECT_TIMEOUT", 5.0)
+POOL_TIMEOUT = _env_float("SUPABASE_POOL_TIMEOUT", 5.0)
+USE_HTTP2 = _env_bool("SUPABASE_HTTP2", True)
+LATENCY_WINDOW = 1024
+
+class PoolMetrics:
+    """진행 중인 요청 수와 최근 요청 지연 시간을 기록합니다."""
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.total_errors = 0
+        self.saturated_requests = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        def percentile(p: float) -> float:
+            if not latencies: return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+        return {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_connections": self.max_connections,
+            "saturation": self.in_flight / self.max_connections if self.max_connections else 0.0,
+            "saturated_requests": self.saturated_requests,
+            "total_requests": self.total_requests,
+            "total_errors": self.total_errors,
+            "latency_avg_ms": (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+            "latency_p50_ms": percentile(0.50) * 1000,
+            "latency_p95_ms": percentile(0.95) * 1000,
+        }
+
+pool_metrics = PoolMetrics(POOL_MAX_CONNECTIONS)
+
+class MeteredTransport(httpx.AsyncHTTPTransport):
+    """요청마다 풀 포화도와 지연 시간을 pool_metrics에 기록하는 전송 계층입니다."""
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        pool_metrics.total_requests += 1
+        pool_metrics.in_flight += 1
+        pool_metrics.peak_in_flight = max(pool_metrics.peak_in_flight, pool_metrics.in_flight)
+        if pool_metrics.in_flight > pool_metrics.max_connections:
+            pool_metrics.saturated_requests += 1
+        started = time.perf_counter()
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            pool_metrics.total_errors += 1
+            raise
+        finally:
+            pool_metrics.in_flight -= 1
+            pool_metrics.latencies.append(time.perf_counter() - started)
+
+def create_http_client() -> httpx.AsyncClient:
+    """환경 변수 설정을 반영한 공유 httpx.AsyncClient를 생성합니다."""
+    http2 = USE_HTTP2 and importlib.util.find_spec("h2") is not None
+    if USE_HTTP2 and not http2:
+        logger.warning("h2 패키지가 설치되지 않아 Supabase 연결에 HTTP/1.1을 사용합니다.")
+    limits = httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT, pool=POOL_TIMEOUT)
+    transport = MeteredTransport(http2=http2, limits=limits)
+    logger.info(
+        f"Supabase HTTP 풀 설정: http2={http2}, max_connections={POOL_MAX_CONNECTIONS}, "
+        f"keepalive={POOL_MAX_KEEPALIVE}/{POOL_KEEPALIVE_EXPIRY}s, timeout={REQUEST_TIMEOUT}s"
+    )
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
+
+def get_pool_stats(reset_peak: bool = False) -> Dict[str, Any]:
+    stats = pool_metrics.snapshot()
+    if reset_peak:
+        pool_metrics.peak_in_flight = pool_metrics.in_flight
+    return stats
@@ -0,0 +1,249 @@
+# game-bot/utils/economy_sim.py
+"""
+확률/보상 밸런스를 배포 전에 확인하기 위한 오프라인 시뮬레이션 스크립트입니다.
+
+봇과 같은 확률 코드(utils/game_odds.py, utils/loot_tables.py)를 그대로 사용하고,
+DB 대신 JSON 스냅샷 파일(테이블/설정을 내보낸 것)에서 데이터를 읽습니다.
+시드를 고정해 여러 프로세스에서 나눠 돌리며, 게임별 기대값/분산/코인 유입·유출을 보고합니다.
+
+사용 예:
+    python -m utils.economy_sim --games slot dice mining --trials 2000000 --seed 42
+    python -m utils.economy_sim --games fishing --fishing-loot fishing_loots.json --location sea --rod-tier 5
+    python -m utils.economy_sim --games boss --boss-tiers boss_reward_tiers.json --boss-participants 30
+"""
+import os
+import json
+import math
+import random
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.game_odds import (
+    PICKAXE_LUCK_BONUS, ORE_XP_MAP, spin_slot_reels, calculate_slot_payout, roll_dice,
+    get_ore_table, roll_mining_yield, roll_fish_size, pick_boss_reward_tier, roll_boss_chest
+)
+from utils.loot_tables import WHALE_MIN_ROD_TIER, build_fishing_table
+
+DEFAULT_CHUNK_SIZE = 100_000
+MAX_REPORTED_OUTCOMES = 8
+
+@dataclass
+class GameStats:
+    """한 게임의 시행 결과 누적값입니다. 청크별 결과를 merge로 합칩니다."""
+    trials: int = 0
+    total: float = 0.0
+    total_sq: float = 0.0
+    inflow: float = 0.0     # 유저에게 지급된 코인 (경제로 유입)
+    outflow: float = 0.0    # 유저에게서 회수된 코인 (경제에서 유출)
+    xp: float = 0.0
+    outcomes: Counter = field(default_factory=Counter)
+
+    def add(self, coin_delta: float, outcome: str, xp: float = 0.0):
+        self.trials += 1
+        self.total += coin_delta
+        self.total_sq += coin_delta * coin_delta
+        if coin_delta > 0: self.inflow += coin_delta
+        else: self.outflow -= coin_delta
+        self.xp += xp
+        self.outcomes[outcome] += 1
+
+    def merge(self, other: 'GameStats') -> 'GameStats':
+        self.trials += other.trials
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.inflow += other.inflow
+        self.outflow += other.outflow
+        self.xp += other.xp
+        self.outcomes.update(other.outcomes)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.trials if self.trials else 0.0
+
+    @property
+    def variance(self) -> float:
+        if self.trials < 2: return 0.0
+        return max(0.0, (self.total_sq - self.total * self.total / self.trials) / (self.trials - 1))
+
+    def summary(self) -> Dict[str, Any]:
+        stddev = math.sqrt(self.variance)
+        return {
+            "trials": self.trials,
+            "expected_value": self.mean,
+            "variance": self.variance,
+            "stddev": stddev,
+            "stderr": stddev / math.sqrt(self.trials) if self.trials else 0.0,
+            "coin_inflow": self.inflow,
+            "coin_outflow": self.outflow,
+            "net_coin_flow": self.inflow - self.outflow,
+            "expected_xp": self.xp / self.trials if self.trials else 0.0,
+            "outcomes": {k: v / self.trials for k, v in self.outcomes.most_common(MAX_REPORTED_OUTCOMES)},
+        }
+
+# --- 게임별 1회 시행 함수: (rng, params) -> (코인 증감, 결과 이름, XP) ---
+
+def _trial_slot(rng: random.Random, params: Dict[str, Any]) -> Tuple[float, str, float]:
+    bet = params['bet']
+    payout_rate, payout_name = calculate_slot_payout(spin_slot_reels(rng))
+    return (int(bet * payout_rate) - bet if payout_rate > 0 else -bet), payout_name, 0.0
+
+def _trial_dice(rng: random.Random, params: Dict[str, Any]) -> Tuple[float, str, float]:
+    bet, chosen = params['bet'], rng.randint(1, 6)
+    won = roll_dice(chosen, rng) == chosen
+    return (bet if won else -bet), ("승리" if won else "패배"), 0.0
+
+def _item_sell_price(item: Dict[str, Any]) -> int:
+    """판매함(SellStackableView)과 같은 규칙으로 아이템 판매가를 계산합니다."""
+    if (price := item.get('current_price')) is not None: return price
+    if (sell_price := item.get('sell_price')) is not None: return sell_price
+    return int((item.get('price') or 0) * 0.8)
+
+def _trial_mining(rng: random.Random, params: Dict[str, Any]) -> Tuple[float, str, float]:
+    ore = get_ore_table(params['luck_bonus']).sample(rng)
+    if ore == "꽝": return 0.0, ore, 0.0
+    quantity = roll_mining_yield(params['double_yield'], rng)
+    price = params['ore_prices'].get(ore, 0)
+    return price * quantity, ore, ORE_XP_MAP.get(ore, 0) * quantity
+
+def _trial_fishing(rng: random.Random, params: Dict[str, Any]) -> Tuple[float, str, float]:
+    table = params['fishing_table']
+    if table is None: return 0.0, "없음", params['fishing_xp']
+    catch = table.sample(rng)
+    if catch.get("min_size") is not None:
+        size = roll_fish_size(catch, params['size_multiplier'], rng)
+        base_value = catch['current_base_value'] if catch.get('current_base_value') is not None else (catch.get('base_value') or 0)
+        return int(base_value + size * (catch.get('size_multiplier') or 0)), catch['name'], params['fishing_xp']
+    return float(catch.get('value') or 0), catch.get('title') or catch.get('name', '기타'), params['fishing_xp']
+
+def _trial_boss(rng: random.Random, params: Dict[str, Any]) -> Tuple[float, str, float]:
+    tiers, total = params['boss_tiers'], params['boss_participants']
+    coins, xp, rare = 0, 0, 0
+    for rank in range(1, total + 1):
+        chest = roll_boss_chest(pick_boss_reward_tier(rank, total, tiers), rng)
+        coins += chest['coins']; xp += chest['xp']; rare += sum(chest['items'].values())
+    return float(coins), f"희귀 아이템 {min(rare, 5)}{'+' if rare >= 5 else ''}개", float(xp)
+
+GAMES: Dict[str, Callable[[random.Random, Dict[str, Any]], Tuple[float, str, float]]] = {
+    "slot": _trial_slot,
+    "dice": _trial_dice,
+    "mining": _trial_mining,
+    "fishing": _trial_fishing,
+    "boss": _trial_boss,
+}
+
+def _run_chunk(game: str, trials: int, seed: str, params: Dict[str, Any]) -> GameStats:
+    rng, trial, stats = random.Random(seed), GAMES[game], GameStats()
+    if game == "fishing":
+        params = {**params, "fishing_table": build_fishing_table(
+            params['fishing_loot'], params['location'], params['rod_bonus'], params['rare_up_bonus'],
+            params['rod_tier'] >= WHALE_MIN_ROD_TIER and params['whale']
+        )}
+    for _ in range(trials):
+        stats.add(*trial(rng, params))
+    return stats
+
+def simulate(game: str, trials: int, params: Dict[str, Any], seed: int = 0, workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> GameStats:
+    """
+    trials번의 시행을 청크로 나눠 프로세스 풀에서 실행하고 결과를 합칩니다.
+    청크마다 (seed, game, 청크 번호)로 시드를 정하므로, 워커 수와 관계없이 같은 결과가 나옵니다.
+    """
+    chunks = [(game, min(chunk_size, trials - start), f"{seed}:{game}:{i}", params) for i, start in enumerate(range(0, trials, chunk_size))]
+    if workers == 1 or len(chunks) == 1:
+        results = [_run_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_chunk, *zip(*chunks)))
+    total = GameStats()
+    for result in results: total.merge(result)
+    return total
+
+def _load_json(path: Optional[str], default: Any = None) -> Any:
+    if not path: return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def build_params(args: argparse.Namespace) -> Dict[str, Any]:
+    items = _load_json(args.items, [])
+    item_db = {item['name']: item for item in items} if isinstance(items, list) else items
+    boss_tiers = _load_json(args.boss_tiers, {})
+    if isinstance(boss_tiers, dict): boss_tiers = boss_tiers.get(args.boss_type, [])
+    return {
+        "bet": args.bet,
+        "luck_bonus": PICKAXE_LUCK_BONUS.get(args.pickaxe, 1.0) + (0.5 if args.mine_rare_up else 0.0),
+        "double_yield": args.mine_double_yield,
+        "ore_prices": {name: _item_sell_price(item_db[name]) for name in ORE_XP_MAP if name in item_db},
+        "fishing_loot": _load_json(args.fishing_loot, []),
+        "location": args.location,
+        "rod_tier": args.rod_tier,
+        "rod_bonus": args.rod_bonus,
+        "rare_up_bonus": 0.2 if args.fish_rare_up else 0.0,
+        "size_multiplier": 1.2 if args.fish_size_up else 1.0,
+        "whale": args.whale,
+        "fishing_xp": args.fishing_xp,
+        "boss_tiers": boss_tiers,
+        "boss_participants": args.boss_participants,
+    }
+
+def _missing_data(game: str, params: Dict[str, Any]) -> Optional[str]:
+    if game == "fishing" and not params['fishing_loot']: return "--fishing-loot 스냅샷이 필요합니다."
+    if game == "boss" and not params['boss_tiers']: return "--boss-tiers 스냅샷이 필요합니다."
+    return None
+
+def format_report(game: str, summary: Dict[str, Any], bet: Optional[int] = None) -> str:
+    lines = [
+        f"[{game}] {summary['trials']:,}회",
+        f"  기대값: {summary['expected_value']:+.4f} 코인/회 (표준오차 {summary['stderr']:.4f})",
+        f"  분산: {summary['variance']:.4f} / 표준편차: {summary['stddev']:.4f}",
+        f"  코인 유입: {summary['coin_inflow']:,.0f} / 유출: {summary['coin_outflow']:,.0f} / 순증감: {summary['net_coin_flow']:+,.0f}",
+    ]
+    if bet: lines.append(f"  환급률(RTP): {(bet + summary['expected_value']) / bet:.4%}")
+    if summary['expected_xp']: lines.append(f"  기대 XP: {summary['expected_xp']:.4f}/회")
+    lines.append("  결과 분포: " + ", ".join(f"{name} {ratio:.3%}" for name, ratio in summary['outcomes'].items()))
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="게임 확률/경제 밸런스 오프라인 시뮬레이션")
+    parser.add_argument("--games", nargs="+", choices=sorted(GAMES), default=["slot", "dice", "mining"])
+    parser.add_argument("--trials", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력합니다.")
+    parser.add_argument("--bet", type=int, default=100)
+    parser.add_argument("--items", help="items 테이블 스냅샷(JSON)")
+    parser.add_argument("--pickaxe", default="나무 곡괭이")
+    parser.add_argument("--mine-rare-up", action="store_true")
+    parser.add_argument("--mine-double-yield", action="store_true")
+    parser.add_argument("--fishing-loot", help="fishing_loots 테이블 스냅샷(JSON)")
+    parser.add_argument("--location", choices=["river", "sea"], default="river")
+    parser.add_argument("--rod-tier", type=int, default=1)
+    parser.add_argument("--rod-bonus", type=float, default=0.0)
+    parser.add_argument("--fish-rare-up", action="store_true")
+    parser.add_argument("--fish-size-up", action="store_true")
+    parser.add_argument("--whale", action="store_true", help="고래 출현 중으로 가정합니다.")
+    parser.add_argument("--fishing-xp", type=int, default=20)
+    parser.add_argument("--boss-tiers", help="BOSS_REWARD_TIERS 설정 스냅샷(JSON)")
+    parser.add_argument("--boss-type", choices=["weekly", "monthly"], default="weekly")
+    parser.add_argument("--boss-participants", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    params = build_params(args)
+    report = {}
+    for game in args.games:
+        if message := _missing_data(game, params):
+            print(f"[{game}] 건너뜀: {message}"); continue
+        if game == "mining" and not params['ore_prices']:
+            print("[mining] --items 스냅샷이 없어 광석 판매가를 0으로 계산합니다.")
+        summary = simulate(game, args.trials, params, args.seed, args.workers, args.chunk_size).summary()
+        report[game] = summary
+        if not args.json:
+            print(format_report(game, summary, args.bet if game in ("slot", "dice") else None))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# game-bot/utils/game_events.py
+"""
+Cog 사이에 게임 이벤트를 전달하는 프로세스 내부 이벤트 버스입니다.
+
+- 이벤트는 GameEvent를 상속한 dataclass이며, 구독은 이벤트 타입 단위로 합니다.
+- 구독자마다 크기가 정해진 큐와 전용 워커 태스크가 있어, 한 구독자가 느려도 다른 구독자나 발행한 쪽은 기다리지 않습니다.
+- publish()는 동기 함수라 상호작용 처리 중에 호출해도 대기하지 않습니다. 큐가 가득 차면 가장 오래된 이벤트를 버리고 집계합니다.
+  백그라운드 루프처럼 기다려도 되는 곳은 publish_wait()로 큐에 자리가 날 때까지 기다립니다. (배압)
+- 구독자에서 발생한 예외는 로그만 남기고 집계하며, 처리량/드롭/대기 시간은 stats()로 확인할 수 있습니다.
+- 같은 프로세스 안의 신호(레벨업 → 등급 역할/전직 안내, 펫 레벨업 알림 등)는 bot_configs 요청 행을 거치지 않고 이 버스로 전달합니다.
+  bot_configs 요청은 관리자 대시보드처럼 다른 프로세스에서 들어오는 요청에만 사용합니다.
+"""
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 1000
+
+@dataclass(frozen=True)
+class GameEvent:
+    user_id: int
+
+@dataclass(frozen=True)
+class ActivityLogged(GameEvent):
+    """활동이 기록됨 (log_activity, 또는 RPC 안에서 기록되는 활동을 publish_activity로 직접 발행)"""
+    activity_type: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass(frozen=True)
+class LevelUp(GameEvent):
+    """유저 레벨업 (add_xp 계열 RPC 결과의 leveled_up)"""
+    new_level: int
+
+@dataclass(frozen=True)
+class PetLevelUp(GameEvent):
+    """펫 레벨업 (add_xp_to_pet_db 결과의 leveled_up)"""
+    new_level: int
+    points_awarded: int
+    check_evolution: bool = True
+
+EventHandler = Callable[[Any], Awaitable[None]]
+
+class _Subscription:
+    def __init__(self, event_type: Type[GameEvent], handler: EventHandler, name: str, maxsize: int):
+        self.event_type = event_type
+        self.handler = handler
+        self.name = name
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.worker: Optional[asyncio.Task] = None
+        self.counts = {"delivered": 0, "handled": 0, "dropped": 0, "errors": 0, "max_depth": 0}
+        self._total_handle = 0.0
+        self._max_handle = 0.0
+        self._max_wait = 0.0
+
+    def ensure_worker(self):
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.get_running_loop().create_task(self._work(), name=f"game_events:{self.name}")
+
+    def offer(self, event: GameEvent):
+        self.ensure_worker()
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except asyncio.QueueEmpty: pass
+            self.counts["dropped"] += 1
+            if self.counts["dropped"] == 1 or self.counts["dropped"] % 100 == 0:
+                logger.warning(f"[이벤트 버스] '{self.name}' 큐가 가득 차 오래된 이벤트를 버렸습니다. (누적 {self.counts['dropped']}건)")
+        self.queue.put_nowait((time.monotonic(), event))
+        self._delivered()
+
+    async def offer_wait(self, event: GameEvent):
+        self.ensure_worker()
+        await self.queue.put((time.monotonic(), event))
+        self._delivered()
+
+    def _delivered(self):
+        self.counts["delivered"] += 1
+        self.counts["max_depth"] = max(self.counts["max_depth"], self.queue.qsize())
+
+    async def _work(self):
+        while True:
+            enqueued_at, event = await self.queue.get()
+            started = time.monotonic()
+            self._max_wait = max(self._max_wait, started - enqueued_at)
+            try: await self.handler(event)
+            except asyncio.CancelledError: raise
+            except Exception as e:
+                self.counts["errors"] += 1
+                logger.error(f"[이벤트 버스] '{self.name}' 구독자가 {type(event).__name__}(유저: {event.user_id}) 처리 중 오류: {e}", exc_info=True)
+            finally:
+                elapsed = time.monotonic() - started
+                self.counts["handled"] += 1
+                self._total_handle += elapsed
+                self._max_handle = max(self._max_handle, elapsed)
+                self.queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        handled = self.counts["handled"]
+        return {
+            "name": self.name, "event": self.event_type.__name__, **self.counts, "queued": self.queue.qsize(),
+            "avg_handle_ms": round(self._total_handle / handled * 1000, 1) if handled else 0.0,
+            "max_handle_ms": round(self._max_handle * 1000, 1), "max_wait_ms": round(self._max_wait * 1000, 1),
+        }
+
+class GameEventBus:
+    def __init__(self):
+        self._subscriptions: Dict[Type[GameEvent], List[_Subscription]] = {}
+
+    def subscribe(self, event_type: Type[GameEvent], handler: EventHandler, *, name: Optional[str] = None, maxsize: int = DEFAULT_QUEUE_SIZE):
+        subscriptions = self._subscriptions.setdefault(event_type, [])
+        if any(sub.handler == handler for sub in subscriptions): return
+        subscriptions.append(_Subscription(event_type, handler, name or getattr(handler, '__qualname__', repr(handler)), maxsize))
+
+    def unsubscribe(self, event_type: Type[GameEvent], handler: EventHandler):
+        subscriptions = self._subscriptions.get(event_type, [])
+        for sub in [s for s in subscriptions if s.handler == handler]:
+            subscriptions.remove(sub)
+            if sub.worker and not sub.worker.done(): sub.worker.cancel()
+
+    def publish(self, event: GameEvent):
+        """구독자 큐에 이벤트를 넣고 바로 반환합니다. 상호작용 처리 중에는 이 함수를 사용합니다."""
+        for sub in self._subscriptions.get(type(event), ()): sub.offer(event)
+
+    async def publish_wait(self, event: GameEvent):
+        """구독자 큐에 자리가 날 때까지 기다렸다가 넣습니다. 대량으로 발행하는 백그라운드 루프에서 사용합니다."""
+        for sub in list(self._subscriptions.get(type(event), ())): await sub.offer_wait(event)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [sub.stats() for subs in self._subscriptions.values() for sub in subs]
+
+game_events = GameEventBus()
+
+def publish_activity(user_id: int, activity_type: str, **data: Any):
+    """활동 이벤트를 발행합니다. (예: publish_activity(user.id, "item_purchase", item_name="호박 씨앗"))"""
+    game_events.publish(ActivityLogged(int(user_id), activity_type, data))
+
+def level_up_from_result(user_id: int, result_data: Optional[List[Dict]]) -> Optional[LevelUp]:
+    if not result_data or not isinstance(result_data, list) or not result_data[0].get('leveled_up'): return None
+    return LevelUp(int(user_id), result_data[0].get('new_level'))
+
+def publish_level_result(user_id: int, result_data: Optional[List[Dict]]):
+    """add_xp 계열 RPC 결과에 레벨업이 있으면 LevelUp 이벤트를 발행합니다."""
+    if event := level_up_from_result(user_id, result_data): game_events.publish(event)
+
+def pet_level_up_from_result(user_id: int, result_data: Optional[List[Dict]], check_evolution: bool = True) -> Optional[PetLevelUp]:
+    if not result_data or not isinstance(result_data, list) or not result_data[0].get('leveled_up'): return None
+    return PetLevelUp(int(user_id), result_data[0].get('new_level'), result_data[0].get('points_awarded'), check_evolution)
+
+def publish_pet_level_result(user_id: int, result_data: Optional[List[Dict]], check_evolution: bool = True):
+    """add_xp_to_pet_db 결과에 레벨업이 있으면 PetLevelUp 이벤트를 발행합니다."""
+    if event := pet_level_up_from_result(user_id, result_data, check_evolution): game_events.publish(event)
@@ -0,0 +1,117 @@
+# game-bot/utils/game_odds.py
+"""
+미니게임의 확률/보상 계산만 모아 둔 파일입니다.
+
+디스코드 UI나 DB 호출 없이 순수하게 결과만 계산하므로, 게임 Cog와 오프라인 시뮬레이션
+(utils/economy_sim.py)이 같은 코드를 사용합니다. 모든 함수는 rng 인자로 random.Random을 받을 수 있습니다.
+"""
+import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.loot_tables import get_weighted_table
+
+# --- 슬롯머신 ---
+REEL_SYMBOLS = ['🍒', '🍊', '🍇', '🍋', '🔔', '5️⃣', '7️⃣']
+FRUIT_SYMBOLS = ['🍒', '🍊', '🍇', '🍋', '🔔']
+SLOT_FORCED_WIN_CHANCE = 0.50
+SLOT_WIN_WEIGHTS = (('fruit', 30), ('number', 15), ('seven', 5))
+
+# --- 주사위 ---
+DICE_FORCED_WIN_CHANCE = 0.30
+DICE_FACES = (1, 2, 3, 4, 5, 6)
+
+# --- 채굴 ---
+PICKAXE_LUCK_BONUS = {
+    "나무 곡괭이": 1.0, "구리 곡괭이": 1.1, "철 곡괭이": 1.25,
+    "금 곡괭이": 1.5, "다이아 곡괭이": 2.0,
+}
+
+ORE_DATA = {
+    "꽝":       {"weight": 40, "image_url": "https://saewayvzcyzueviasftu.supabase.co/storage/v1/object/public/game_assets/stone.jpg"},
+    "구리 광석": {"weight": 30, "image_url": "https://saewayvzcyzueviasftu.supabase.co/storage/v1/object/public/game_assets/cooper.jpg"},
+    "철 광석":   {"weight": 20, "image_url": "https://saewayvzcyzueviasftu.supabase.co/storage/v1/object/public/game_assets/Iron.jpg"},
+    "금 광석":    {"weight": 8,  "image_url": "https://saewayvzcyzueviasftu.supabase.co/storage/v1/object/public/game_assets/gold.jpg"},
+    "다이아몬드": {"weight": 2,  "image_url": "https://saewayvzcyzueviasftu.supabase.co/storage/v1/object/public/game_assets/diamond.jpg"}
+}
+
+ORE_XP_MAP = { "구리 광석": 10, "철 광석": 15, "금 광석": 30, "다이아몬드": 75 }
+MINING_DOUBLE_YIELD_CHANCE = 0.20
+
+# --- 보스 레이드 ---
+BOSS_RARE_REWARD_ITEMS = ["각성의 코어", "초월의 핵"]
+
+def _rng(rng: Optional[random.Random]):
+    return rng or random
+
+def spin_slot_reels(rng: Optional[random.Random] = None) -> List[str]:
+    """슬롯 결과 릴 3개를 결정합니다. 일정 확률로 당첨이 확정되고, 그 외에는 세 개가 같지 않은 조합이 나옵니다."""
+    rng = _rng(rng)
+    if rng.random() < SLOT_FORCED_WIN_CHANCE:
+        win_types, weights = zip(*SLOT_WIN_WEIGHTS)
+        chosen_win = rng.choices(win_types, weights=weights, k=1)[0]
+        symbol = {'fruit': rng.choice(FRUIT_SYMBOLS), 'number': '5️⃣', 'seven': '7️⃣'}[chosen_win]
+        return [symbol, symbol, symbol]
+    while True:
+        reels = [rng.choice(REEL_SYMBOLS) for _ in range(3)]
+        if not (reels[0] == reels[1] == reels[2]):
+            return reels
+
+def calculate_slot_payout(reels: Sequence[str]) -> Tuple[float, str]:
+    """릴 조합에 따른 배당률과 이름을 반환합니다. (배당률은 베팅액 대비 지급 배수)"""
+    r = reels
+
+    # 3개 심볼이 모두 같을 경우
+    if r[0] == r[1] == r[2]:
+        if r[0] == '7️⃣':
+            return 4.0, "트리플 세븐 (대박!)" # 기존 2.0 -> 4.0배 (4배 잭팟)
+        if r[0] == '5️⃣':
+            return 2.5, "숫자 맞춤"         # 기존 1.5 -> 2.5배
+        return 1.5, "과일 맞춤"             # 기존 1.0 -> 1.5배 (이제 과일만 맞춰도 이득)
+
+    # 체리 2개 보너스
+    if list(r).count('🍒') == 2:
+        return 0.5, "체리 보너스"           # 기존 0.2 -> 0.5배 (절반 환급)
+
+    return 0.0, "꽝"
+
+def roll_dice(chosen_number: int, rng: Optional[random.Random] = None) -> int:
+    """주사위 결과를 굴립니다. 일정 확률로 선택한 숫자가 나오고, 그 외에는 나머지 다섯 면 중 하나가 나옵니다."""
+    rng = _rng(rng)
+    if rng.random() < DICE_FORCED_WIN_CHANCE:
+        return chosen_number
+    return rng.choice([face for face in DICE_FACES if face != chosen_number])
+
+def get_ore_table(luck_bonus: float):
+    """행운 보너스별 광석 추첨 테이블 ('꽝'에는 보너스가 적용되지 않습니다)"""
+    weights = tuple((ore, data['weight'] * luck_bonus if ore != "꽝" else data['weight']) for ore, data in ORE_DATA.items())
+    return get_weighted_table("mining_ores", weights)
+
+def roll_mining_yield(can_double_yield: bool, rng: Optional[random.Random] = None) -> int:
+    return 2 if can_double_yield and _rng(rng).random() < MINING_DOUBLE_YIELD_CHANCE else 1
+
+def roll_fish_size(catch_proto: Dict[str, Any], size_multiplier: float = 1.0, rng: Optional[random.Random] = None) -> float:
+    min_s, max_s = catch_proto["min_size"] * size_multiplier, catch_proto["max_size"] * size_multiplier
+    return round(_rng(rng).uniform(min_s, max_s), 1)
+
+def pick_boss_reward_tier(rank: int, total_participants: int, reward_tiers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """순위 백분위에 맞는 보상 티어를 고릅니다. 어느 티어에도 속하지 않으면 마지막 티어를 사용합니다."""
+    percentile = rank / total_participants
+    return next((tier for tier in reward_tiers if percentile <= tier['percentile']), reward_tiers[-1])
+
+def roll_boss_chest(tier: Dict[str, Any], rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    """보스 보물 상자 내용물(코인, XP, 희귀 아이템)을 굴립니다."""
+    rng = _rng(rng)
+    coins = rng.randint(*tier['coins'])
+    xp = rng.randint(*tier['xp'])
+
+    rolled_items = {}
+    if rng.random() < tier['rare_item_chance']:
+        rare_item = rng.choice(BOSS_RARE_REWARD_ITEMS)
+        # 설정된 수량 범위 가져오기 (없으면 기본값 1개)
+        qty_range = tier.get('rare_item_qty', [1, 1])
+        qty = rng.randint(qty_range[0], qty_range[1])
+
+        if qty > 0:
+            rolled_items[rare_item] = qty
+
+    return {"coins": coins, "xp": xp, "items": rolled_items}
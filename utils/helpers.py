@@ -1,38 +1,149 @@
 # game-bot/utils/helpers.py
 import discord
-import copy
 import logging
-from typing import Any, Dict
+import string
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Union
 from datetime import datetime, timezone, timedelta
 import re
 
 logger = logging.getLogger(__name__)
 
+class SafeFormatter(dict):
+    """format_map에서 전달되지 않은 키는 '{key}' 그대로 남겨둡니다."""
+    def __missing__(self, key: str) -> str: return f'{{{key}}}'
+
+class EmbedTemplate(dict):
+    """
+    캐시된 DB 임베드 데이터의 사본입니다.
+    캐시 키/버전과, 치환자('{...}')가 들어 있는 텍스트 위치를 미리 계산해 함께 보관합니다.
+    """
+    __slots__ = ('key', 'version', 'placeholder_paths')
+
+    def __init__(self, data: Dict[str, Any], key: Optional[str] = None, version: int = 0, placeholder_paths: Optional[Tuple[tuple, ...]] = None):
+        super().__init__(copy_embed_data(data))
+        self.key = key
+        self.version = version
+        self.placeholder_paths = placeholder_paths if placeholder_paths is not None else find_placeholder_paths(self)
+
+    def clone(self) -> 'EmbedTemplate':
+        return EmbedTemplate(self, self.key, self.version, self.placeholder_paths)
+
+def copy_embed_data(embed_data: Dict[str, Any]) -> Dict[str, Any]:
+    """임베드 dict 구조(footer, author, fields 등)만 새로 만들어 복사합니다. copy.deepcopy보다 훨씬 가볍습니다."""
+    copied = dict(embed_data)
+    for key, value in copied.items():
+        if isinstance(value, dict):
+            copied[key] = dict(value)
+        elif key == 'fields' and isinstance(value, list):
+            copied[key] = [dict(field) if isinstance(field, dict) else field for field in value]
+    return copied
+
+def find_placeholder_paths(embed_data: Dict[str, Any]) -> Tuple[tuple, ...]:
+    """치환자가 들어 있어 format이 필요한 텍스트의 위치 목록을 반환합니다."""
+    def has_placeholder(value: Any) -> bool: return isinstance(value, str) and '{' in value
+    paths = [(key,) for key in ('title', 'description') if has_placeholder(embed_data.get(key))]
+    if isinstance(footer := embed_data.get('footer'), dict) and has_placeholder(footer.get('text')):
+        paths.append(('footer', 'text'))
+    if isinstance(fields := embed_data.get('fields'), list):
+        for i, field in enumerate(fields):
+            if isinstance(field, dict):
+                paths.extend(('fields', i, part) for part in ('name', 'value') if has_placeholder(field.get(part)))
+    return tuple(paths)
+
+class CompiledTemplate:
+    """
+    str.format_map 템플릿을 미리 리터럴/치환자 조각으로 나눠 둔 것입니다.
+    단순한 '{name}' 치환자는 dict 조회 + join으로 처리하고, 서식 지정('{amount:,}')이나
+    속성 접근('{user.name}')이 있는 치환자는 해당 조각만 기존 format_map 방식으로 처리합니다.
+    전달되지 않은 키는 SafeFormatter와 동일하게 '{key}' 그대로 남깁니다.
+    """
+    __slots__ = ('source', 'segments', 'valid')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.valid = True
+        segments = []
+        try:
+            for literal, field_name, format_spec, conversion in string.Formatter().parse(source):
+                if literal:
+                    segments.append(literal)
+                if field_name is None:
+                    continue
+                if field_name.isidentifier() and not format_spec and not conversion:
+                    segments.append((field_name,))
+                else:
+                    raw = '{' + field_name + (f'!{conversion}' if conversion else '') + (f':{format_spec}' if format_spec else '') + '}'
+                    segments.append((None, raw))
+        except ValueError:
+            # 잘못된 템플릿은 기존과 동일하게 format_map 단계에서 오류가 나도록 둡니다.
+            self.valid = False
+        self.segments: Tuple[Union[str, tuple], ...] = tuple(segments)
+
+    def render(self, values: Dict[str, Any]) -> str:
+        if not self.valid:
+            return self.source.format_map(SafeFormatter(**values))
+        parts = []
+        for segment in self.segments:
+            if isinstance(segment, str):
+                parts.append(segment)
+            elif segment[0] is not None:
+                name = segment[0]
+                parts.append(format(values[name], '') if name in values else f'{{{name}}}')
+            else:
+                parts.append(segment[1].format_map(SafeFormatter(**values)))
+        return ''.join(parts)
+
+@lru_cache(maxsize=2048)
+def compile_template(source: str) -> CompiledTemplate:
+    return CompiledTemplate(source)
+
+class CompiledEmbed:
+    """EmbedTemplate 하나의 치환 대상 텍스트를 모두 컴파일해 둔 것입니다."""
+    __slots__ = ('version', 'entries')
+
+    def __init__(self, template: 'EmbedTemplate'):
+        self.version = template.version
+        entries = []
+        for path in template.placeholder_paths:
+            source = _get_path(template, path)
+            entries.append((path, source, compile_template(source)))
+        self.entries = tuple(entries)
+
+_compiled_embed_cache: Dict[str, CompiledEmbed] = {}
+
+def _get_path(data: Dict[str, Any], path: tuple) -> Any:
+    for part in path:
+        data = data[part]
+    return data
+
+def get_compiled_embed(template: 'EmbedTemplate') -> CompiledEmbed:
+    """(임베드 키, 캐시 버전) 기준으로 컴파일된 임베드를 재사용합니다."""
+    compiled = _compiled_embed_cache.get(template.key)
+    if compiled is None or compiled.version != template.version:
+        compiled = CompiledEmbed(template)
+        _compiled_embed_cache[template.key] = compiled
+    return compiled
+
 def format_embed_from_db(embed_data: Dict[str, Any], **kwargs: Any) -> discord.Embed:
     if not isinstance(embed_data, dict):
         logger.error(f"임베드 데이터가 딕셔너리(dict) 형식이 아닙니다. 타입: {type(embed_data)}")
         return discord.Embed(title="오류", description="임베드 데이터를 불러오는 데 실패했습니다.", color=discord.Color.red())
     
-    formatted_data = copy.deepcopy(embed_data)
-    class SafeFormatter(dict):
-        def __missing__(self, key: str) -> str: return f'{{{key}}}'
-    safe_kwargs = SafeFormatter(**kwargs)
+    formatted_data = copy_embed_data(embed_data)
+    if isinstance(embed_data, EmbedTemplate) and embed_data.key:
+        entries = get_compiled_embed(embed_data).entries
+    else:
+        entries = tuple((path, None, None) for path in find_placeholder_paths(embed_data))
     
     try:
-        if 'title' in formatted_data and isinstance(formatted_data['title'], str):
-            formatted_data['title'] = formatted_data['title'].format_map(safe_kwargs)
-        if 'description' in formatted_data and isinstance(formatted_data['description'], str):
-            formatted_data['description'] = formatted_data['description'].format_map(safe_kwargs)
-        if 'footer' in formatted_data and isinstance(formatted_data.get('footer'), dict):
-            if 'text' in formatted_data['footer'] and isinstance(formatted_data['footer']['text'], str):
-                formatted_data['footer']['text'] = formatted_data['footer']['text'].format_map(safe_kwargs)
-        if 'fields' in formatted_data and isinstance(formatted_data.get('fields'), list):
-            for field in formatted_data['fields']:
-                if isinstance(field, dict):
-                    if 'name' in field and isinstance(field['name'], str):
-                        field['name'] = field['name'].format_map(safe_kwargs)
-                    if 'value' in field and isinstance(field['value'], str):
-                        field['value'] = field['value'].format_map(safe_kwargs)
+        for path, source, compiled in entries:
+            container = _get_path(formatted_data, path[:-1])
+            current = container[path[-1]]
+            # 캐시에서 받은 사본을 호출자가 수정한 경우에는 현재 문자열로 다시 컴파일합니다.
+            if current is not source:
+                compiled = compile_template(current)
+            container[path[-1]] = compiled.render(kwargs)
         return discord.Embed.from_dict(formatted_data)
     except Exception as e:
         logger.error(f"임베드 포맷팅 중 오류가 발생했습니다: {e}", exc_info=True)
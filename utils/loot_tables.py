@@ -0,0 +1,147 @@
+# game-bot/utils/loot_tables.py
+"""
+낚시/채굴/탐사 보상 추첨에 쓰는 가중치 테이블을 미리 만들어 두는 파일입니다.
+
+- 하나를 뽑는 추첨(낚시, 채굴)은 Vose 별칭(alias) 테이블로 만들어 O(1)에 샘플링합니다.
+- 항목별로 독립적으로 굴리는 추첨(탐사 보상)은 필요한 값만 튜플로 정리한 드롭 테이블로 만듭니다.
+- 테이블은 원본 데이터(캐시 리스트 객체)나 보정값이 바뀔 때만 다시 만들어집니다.
+- 모든 샘플링 함수는 rng 인자를 받아, 시드를 고정한 random.Random으로 결과를 재현할 수 있습니다.
+
+이 파일은 DB 모듈에 의존하지 않으므로 시뮬레이션 스크립트에서도 그대로 가져다 쓸 수 있습니다.
+"""
+import random
+from collections import defaultdict
+from typing import Any, Dict, Generic, Hashable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+WHALE_NAME = "고래"
+WHALE_MIN_ROD_TIER = 5
+RARE_FISH_VALUE_THRESHOLD = 100
+
+_default_rng = random.Random()
+_STATIC_SOURCE = object()
+
+class AliasTable(Generic[T]):
+    """Vose 별칭 방식의 가중치 추첨 테이블입니다. 생성 O(n), 샘플링 O(1)."""
+    __slots__ = ("outcomes", "weights", "_prob", "_alias")
+
+    def __init__(self, outcomes: Sequence[T], weights: Sequence[float]):
+        if len(outcomes) != len(weights) or not outcomes:
+            raise ValueError("outcomes와 weights는 길이가 같고 비어 있지 않아야 합니다.")
+        total = float(sum(weights))
+        if total <= 0 or any(w < 0 for w in weights):
+            raise ValueError("가중치는 0 이상이어야 하며 합이 0보다 커야 합니다.")
+        n = len(outcomes)
+        self.outcomes, self.weights = tuple(outcomes), tuple(weights)
+        self._prob, self._alias = [0.0] * n, [0] * n
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._prob[s], self._alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 부동소수점 오차로 남은 항목은 확률 1로 처리합니다.
+        for i in large + small:
+            self._prob[i] = 1.0
+
+    def __len__(self) -> int:
+        return len(self.outcomes)
+
+    def sample(self, rng: Optional[random.Random] = None) -> T:
+        rng = rng or _default_rng
+        i = int(rng.random() * len(self.outcomes))
+        return self.outcomes[i] if rng.random() < self._prob[i] else self.outcomes[self._alias[i]]
+
+    def probabilities(self) -> List[float]:
+        """각 결과가 뽑힐 이론상 확률을 반환합니다. (시뮬레이션 검증용)"""
+        total = sum(self.weights)
+        return [w / total for w in self.weights]
+
+class DropTable:
+    """항목마다 독립적으로 확률을 굴리는 보상 테이블입니다. (item_name, drop_chance, min_qty, max_qty)"""
+    __slots__ = ("entries",)
+
+    def __init__(self, loot_rows: Sequence[Dict[str, Any]]):
+        self.entries: Tuple[Tuple[str, float, int, int], ...] = tuple(
+            (row['item_name'], float(row.get('drop_chance') or 0), int(row.get('min_qty') or 1), int(row.get('max_qty') or 1))
+            for row in loot_rows if (row.get('drop_chance') or 0) > 0
+        )
+
+    def roll(self, rng: Optional[random.Random] = None) -> Dict[str, int]:
+        rng = rng or _default_rng
+        rewards: Dict[str, int] = defaultdict(int)
+        for name, chance, min_qty, max_qty in self.entries:
+            if rng.random() < chance:
+                rewards[name] += rng.randint(min_qty, max_qty)
+        return dict(rewards)
+
+class _SourceBoundCache:
+    """원본 리스트 객체가 바뀌면(리로드되면) 통째로 비워지는 테이블 캐시입니다."""
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._source: Any = None
+        self._tables: Dict[Hashable, Any] = {}
+        self.builds = 0
+
+    def get(self, source: Any, key: Hashable, build):
+        if source is not self._source:
+            self._source, self._tables = source, {}
+        if (table := self._tables.get(key)) is None:
+            if len(self._tables) >= self.max_entries: self._tables.clear()
+            table = self._tables[key] = build()
+            self.builds += 1
+        return table
+
+    def clear(self):
+        self._source, self._tables = None, {}
+
+_fishing_tables = _SourceBoundCache()
+_exploration_tables = _SourceBoundCache()
+_weighted_tables = _SourceBoundCache()
+
+def build_fishing_table(
+    all_loot: Sequence[Dict[str, Any]], location_type: str, rod_bonus: float = 0.0,
+    rare_up_bonus: float = 0.0, whale_catchable: bool = False
+) -> Optional[AliasTable]:
+    """장소/보정값에 맞는 낚시 보상 별칭 테이블을 만듭니다. 뽑을 것이 없으면 None을 반환합니다."""
+    pool, weights = [], []
+    for item in all_loot:
+        if item.get('location_type') not in (location_type, None): continue
+        if item.get('name') == WHALE_NAME and not whale_catchable: continue
+        weight = item.get('weight') or 0
+        if (item.get('base_value') or 0) > RARE_FISH_VALUE_THRESHOLD: weight *= (1.0 + rod_bonus + rare_up_bonus)
+        else: weight *= (1.0 + rod_bonus)
+        if weight > 0:
+            pool.append(item); weights.append(weight)
+    return AliasTable(pool, weights) if pool else None
+
+def get_fishing_table(
+    all_loot: Sequence[Dict[str, Any]], location_type: str, rod_tier: int, rod_bonus: float = 0.0,
+    rare_up_bonus: float = 0.0, whale_available: bool = False
+) -> Optional[AliasTable]:
+    """
+    낚시 보상 테이블을 캐시에서 가져옵니다.
+    낚싯대 등급은 고래 포함 여부에만 영향을 주므로, 키는 (장소, 보너스, 고래 가능 여부)입니다.
+    """
+    whale_catchable = rod_tier >= WHALE_MIN_ROD_TIER and whale_available
+    key = (location_type, float(rod_bonus), float(rare_up_bonus), whale_catchable)
+    return _fishing_tables.get(all_loot, key, lambda: build_fishing_table(all_loot, location_type, rod_bonus, rare_up_bonus, whale_catchable))
+
+def get_exploration_table(loot_by_location: Dict[str, List[Dict[str, Any]]], location_key: str) -> DropTable:
+    """탐사 지역별 드롭 테이블을 캐시에서 가져옵니다."""
+    return _exploration_tables.get(loot_by_location, location_key, lambda: DropTable(loot_by_location.get(location_key, [])))
+
+def get_weighted_table(name: str, weights: Tuple[Tuple[Any, float], ...]) -> AliasTable:
+    """고정된 (결과, 가중치) 목록으로 만든 별칭 테이블을 캐시에서 가져옵니다. (예: 채굴 광석)"""
+    return _weighted_tables.get(_STATIC_SOURCE, (name, weights), lambda: AliasTable(*zip(*weights)))
+
+def invalidate_loot_tables():
+    """게임 데이터 리로드 등으로 모든 테이블을 다시 만들어야 할 때 호출합니다."""
+    for cache in (_fishing_tables, _exploration_tables, _weighted_tables):
+        cache.clear()
+
+def get_loot_table_stats() -> Dict[str, int]:
+    return {"fishing_builds": _fishing_tables.builds, "exploration_builds": _exploration_tables.builds, "weighted_builds": _weighted_tables.builds}
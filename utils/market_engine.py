@@ -0,0 +1,102 @@
+# game-bot/utils/market_engine.py
+"""
+매일 자정 아이템/물고기 시세를 한 번에 재계산하는 시장 엔진입니다.
+
+- 변동성이 있는 모든 항목을 열(column) 단위 리스트로 모아 한 번의 패스로 새 가격을 계산합니다.
+- 최근 가격 이력의 추세를 반영해, 많이 오른 항목은 내려가고 많이 내린 항목은 오르기 쉽게 합니다.
+- 바뀐 가격만 한 번의 DB 호출로 반영(+ 이력 기록)하고, 메모리 캐시는 직접 수정합니다.
+"""
+import random
+import logging
+from dataclasses import dataclass
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.database import (
+    get_item_database, get_fishing_loot, get_market_price_history,
+    apply_market_price_changes, patch_market_prices_in_cache
+)
+
+logger = logging.getLogger(__name__)
+
+PRICE_HISTORY_DAYS = 14
+MEAN_REVERSION = 0.3
+ITEM_ALERT_THRESHOLD = 0.25
+FISH_ALERT_THRESHOLD = 0.20
+
+@dataclass
+class PriceChange:
+    kind: str            # 'item' 또는 'fish'
+    key: Any             # 아이템 이름 또는 물고기 id
+    name: str
+    old_price: int
+    new_price: int
+
+    @property
+    def ratio(self) -> float:
+        return (self.new_price - self.old_price) / self.old_price if self.old_price else 0.0
+
+def _collect_volatile_entries() -> List[Tuple[str, Any, str, int, float, Optional[int], Optional[int]]]:
+    entries = []
+    for name, data in get_item_database().items():
+        if (volatility := data.get('volatility') or 0) > 0:
+            old_price = data.get('current_price', data.get('price', 0))
+            entries.append(('item', name, name, old_price, volatility, data.get('min_price'), data.get('max_price')))
+    for fish in get_fishing_loot():
+        if (volatility := fish.get('volatility') or 0) > 0 and 'id' in fish:
+            old_price = fish.get('current_base_value', fish.get('base_value', 0))
+            entries.append(('fish', fish['id'], fish['name'], old_price, volatility, fish.get('min_price'), fish.get('max_price')))
+    return entries
+
+def compute_trends(history: List[Dict[str, Any]]) -> Dict[Tuple[str, str], float]:
+    """(종류, 키)별로 이력 기간 동안의 가격 변화율을 계산합니다. 이력은 시간순이어야 합니다."""
+    first_last: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for row in history:
+        prices = first_last[(row['item_type'], str(row['item_key']))]
+        if not prices: prices.extend([row['price'], row['price']])
+        else: prices[1] = row['price']
+    return {key: (last - first) / first for key, (first, last) in first_last.items() if first}
+
+def reprice(entries: List[Tuple[str, Any, str, int, float, Optional[int], Optional[int]]], trends: Dict[Tuple[str, str], float], rng: Optional[random.Random] = None) -> List[PriceChange]:
+    """모든 항목의 새 가격을 한 번의 패스로 계산해 실제로 바뀐 항목만 반환합니다."""
+    if not entries: return []
+    rng = rng or random.Random()
+    kinds, keys, names, olds, vols, mins, maxs = zip(*entries)
+    drifts = [-MEAN_REVERSION * trends.get((kind, str(key)), 0.0) for kind, key in zip(kinds, keys)]
+    shocks = [rng.uniform(-v, v) for v in vols]
+    news = [int(old * (1 + shock + drift)) for old, shock, drift in zip(olds, shocks, drifts)]
+    news = [min(hi, max(lo, p)) if lo is not None and hi is not None else p for p, lo, hi in zip(news, mins, maxs)]
+    return [PriceChange(*row) for row in zip(kinds, keys, names, olds, news) if row[3] != row[4]]
+
+def build_announcements(changes: List[PriceChange], currency_icon: str) -> List[str]:
+    announcements = []
+    for change in changes:
+        threshold = ITEM_ALERT_THRESHOLD if change.kind == 'item' else FISH_ALERT_THRESHOLD
+        if abs(change.ratio) <= threshold: continue
+        if change.kind == 'item':
+            status = "폭등 📈" if change.new_price > change.old_price else "폭락 📉"
+            announcements.append(f" - {change.name}: `{change.old_price}` → `{change.new_price}`{currency_icon} ({status})")
+        else:
+            status = "풍어 📈" if change.new_price > change.old_price else "흉어 📉"
+            announcements.append(f" - {change.name} (기본 가치): `{change.old_price}` → `{change.new_price}`{currency_icon} ({status})")
+    return announcements
+
+async def run_daily_repricing(currency_icon: str, rng: Optional[random.Random] = None) -> Optional[List[str]]:
+    """
+    일일 시세 변동을 수행하고 주요 변동 공지 목록을 반환합니다.
+    시세 이력을 읽지 못했거나 DB 반영에 실패하면 캐시를 건드리지 않고 None을 반환합니다.
+    """
+    entries = _collect_volatile_entries()
+    # 이력 없이 계산하면 추세 항이 조용히 빠지므로, 이력을 읽지 못한 날은 변동을 건너뜁니다.
+    if (history := await get_market_price_history(PRICE_HISTORY_DAYS)) is None:
+        logger.error("[시장] 시세 이력을 불러오지 못했습니다.")
+        return None
+    changes = reprice(entries, compute_trends(history), rng)
+    if changes:
+        item_changes = [{'name': c.key, 'current_price': c.new_price} for c in changes if c.kind == 'item']
+        fish_changes = [{'id': c.key, 'current_base_value': c.new_price} for c in changes if c.kind == 'fish']
+        if not await apply_market_price_changes(item_changes, fish_changes):
+            return None
+        patch_market_prices_in_cache(item_changes, fish_changes)
+    logger.info(f"[시장] 변동 대상 {len(entries)}개 중 {len(changes)}개의 가격이 바뀌었습니다.")
+    return build_announcements(changes, currency_icon)
@@ -0,0 +1,94 @@
+# game-bot/utils/quest_engine.py
+"""
+일일/주간 퀘스트를 활동 카운터 위에 선언적으로 정의하고, 진행도를 메모리에서 평가하는 퀘스트 엔진입니다.
+
+- 카운터 이름은 daily_stats/weekly_stats 뷰의 컬럼 이름과 같습니다. (check_in_count, chat_count 등)
+- 유저별 카운터는 기간(KST 날짜 / 주 시작일)마다 공유 캐시에 두고, ActivityLogged 이벤트로 증가시킵니다.
+- 통계 뷰는 재시작 후 그 유저의 진행도를 처음 볼 때 한 번만 읽습니다. 기간이 바뀌면 DB를 읽지 않고 0부터 다시 셉니다.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.database import get_period_stats
+from utils.game_events import ActivityLogged
+
+logger = logging.getLogger(__name__)
+
+KST = timezone(timedelta(hours=9))
+PERIOD_VIEWS = {"daily": "daily_stats", "weekly": "weekly_stats"}
+
+# 활동 타입 → 증가시킬 카운터 (amount만큼 증가, 없으면 1)
+ACTIVITY_COUNTERS = {
+    "daily_check_in": "check_in_count",
+    "chat": "chat_count",
+    "voice": "voice_minutes",
+    "dice_game_play": "dice_game_count",
+    "slot_machine_play": "slot_machine_count",
+    "fishing_catch": "fishing_count",
+}
+
+@dataclass(frozen=True)
+class QuestDefinition:
+    key: str
+    name: str
+    counter: str
+    goal: int
+    coin: int = 0
+    xp: int = 0
+
+@dataclass(frozen=True)
+class QuestProgress:
+    quest: QuestDefinition
+    current: int
+
+    @property
+    def is_complete(self) -> bool:
+        return self.current >= self.quest.goal
+
+def period_key(period: str, now: Optional[datetime] = None) -> str:
+    """기간을 나타내는 문자열을 반환합니다. 일일은 KST 날짜, 주간은 그 주 월요일 날짜입니다."""
+    now = now or datetime.now(KST)
+    if period == "weekly": now -= timedelta(days=now.weekday())
+    return now.strftime('%Y-%m-%d')
+
+def evaluate_quests(quests: Iterable[QuestDefinition], counters: Dict[str, int]) -> List[QuestProgress]:
+    return [QuestProgress(quest, int(counters.get(quest.counter, 0) or 0)) for quest in quests]
+
+class QuestCounterCache:
+    def __init__(self):
+        self._counters: Dict[Tuple[str, int], Tuple[str, Dict[str, int]]] = {}
+        self._loading: Dict[Tuple[str, int], asyncio.Task] = {}
+
+    async def get(self, period: str, user_id: int) -> Dict[str, int]:
+        """유저의 현재 기간 카운터를 반환합니다. 처음 보는 유저만 통계 뷰를 한 번 읽습니다."""
+        key, current = (period, user_id), period_key(period)
+        if entry := self._counters.get(key):
+            if entry[0] == current: return entry[1]
+            # 지난 기간의 카운터가 남아 있다면 새 기간은 활동이 없는 상태에서 시작합니다.
+            self._counters[key] = (current, {})
+            return self._counters[key][1]
+
+        if not (task := self._loading.get(key)):
+            task = self._loading[key] = asyncio.create_task(get_period_stats(user_id, PERIOD_VIEWS[period]))
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        row = await asyncio.shield(task)
+        if row is None: return {}
+        if (entry := self._counters.get(key)) and entry[0] == current: return entry[1]
+        counters = {counter: int(row.get(counter) or 0) for counter in set(ACTIVITY_COUNTERS.values())}
+        self._counters[key] = (current, counters)
+        return counters
+
+    async def on_activity(self, event: ActivityLogged):
+        if not (counter := ACTIVITY_COUNTERS.get(event.activity_type)): return
+        amount = int(event.data.get('amount', 1) or 0)
+        for period in PERIOD_VIEWS:
+            # 아직 읽지 않은 유저는 처음 조회할 때 통계 뷰에 이 활동까지 포함되어 있습니다.
+            if not (entry := self._counters.get((period, event.user_id))): continue
+            if entry[0] != (current := period_key(period)):
+                entry = self._counters[(period, event.user_id)] = (current, {})
+            entry[1][counter] = entry[1].get(counter, 0) + amount
+
+quest_counters = QuestCounterCache()
@@ -0,0 +1,108 @@
+# game-bot/utils/session_journal.py
+"""
+재시작 후에도 진행 중인 게임 세션(광산, 낚시, 가위바위보)을 복구하기 위한 세션 저널입니다.
+
+- 상태가 바뀔 때마다 한 줄짜리 JSON 레코드를 파일 끝에 덧붙입니다. (DB 왕복 없음)
+- 레코드가 일정 개수 이상 쌓이면 살아 있는 세션만 스냅샷 파일로 저장하고 저널을 비웁니다.
+- 시작 시 스냅샷을 읽고 저널을 다시 재생해 마지막 상태를 만듭니다. 잘린 마지막 줄은 무시합니다.
+
+경로는 SESSION_JOURNAL_PATH 환경 변수로 바꿀 수 있으며, 배포 간 유지되는 볼륨을 가리켜야 합니다.
+"""
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = os.environ.get("SESSION_JOURNAL_PATH", "data/session_journal.jsonl")
+SNAPSHOT_EVERY = 500
+
+class SessionJournal:
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH, snapshot_every: int = SNAPSHOT_EVERY):
+        self.path = path
+        self.snapshot_path = f"{path}.snapshot"
+        self.snapshot_every = snapshot_every
+        self._sessions: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._records_since_snapshot = 0
+        self._file = None
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded: return
+        self._loaded = True
+        if directory := os.path.dirname(self.path):
+            os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                self._sessions = json.load(f)
+        except FileNotFoundError: pass
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"[세션 저널] 스냅샷을 읽지 못해 저널만 재생합니다: {e}")
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try: self._apply(json.loads(line))
+                    except json.JSONDecodeError: logger.warning("[세션 저널] 손상된 레코드 한 줄을 건너뜁니다.")
+                    self._records_since_snapshot += 1
+        except FileNotFoundError: pass
+        self._file = open(self.path, "a", encoding="utf-8")
+        total = sum(len(v) for v in self._sessions.values())
+        if total: logger.info(f"[세션 저널] 복구 대상 세션 {total}개를 불러왔습니다.")
+
+    def _apply(self, record: Dict[str, Any]):
+        bucket = self._sessions.setdefault(record['k'], {})
+        if record['op'] == 'put': bucket[record['id']] = record['s']
+        else: bucket.pop(record['id'], None)
+
+    def _append(self, record: Dict[str, Any]):
+        self._ensure_loaded()
+        self._apply(record)
+        try:
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n")
+            self._file.flush()
+        except OSError as e:
+            logger.error(f"[세션 저널] 레코드 기록 실패: {e}")
+            return
+        self._records_since_snapshot += 1
+        if self._records_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def put(self, kind: str, session_id: Any, state: Dict[str, Any]):
+        """세션의 현재 상태 전체를 기록합니다. 같은 세션의 이전 레코드를 대체합니다."""
+        self._append({"op": "put", "k": kind, "id": str(session_id), "s": state, "t": round(time.time(), 3)})
+
+    def delete(self, kind: str, session_id: Any):
+        """끝난 세션을 저널에서 제거합니다."""
+        self._ensure_loaded()
+        if str(session_id) not in self._sessions.get(kind, {}): return
+        self._append({"op": "del", "k": kind, "id": str(session_id)})
+
+    def get(self, kind: str, session_id: Any) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded()
+        return self._sessions.get(kind, {}).get(str(session_id))
+
+    def sessions(self, kind: str) -> Dict[str, Dict[str, Any]]:
+        """복구할 세션 목록을 {세션 ID: 상태} 형태로 반환합니다."""
+        self._ensure_loaded()
+        return dict(self._sessions.get(kind, {}))
+
+    def snapshot(self):
+        """살아 있는 세션만 스냅샷으로 저장하고 저널 파일을 비웁니다."""
+        self._ensure_loaded()
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({k: v for k, v in self._sessions.items() if v}, f, ensure_ascii=False, default=str)
+                f.flush(); os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._file.close()
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._records_since_snapshot = 0
+        except OSError as e:
+            logger.error(f"[세션 저널] 스냅샷 저장 실패: {e}")
+            if self._file is None or self._file.closed:
+                self._file = open(self.path, "a", encoding="utf-8")
+
+session_journal = SessionJournal()
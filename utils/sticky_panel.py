@@ -0,0 +1,124 @@
+# game-bot/utils/sticky_panel.py
+"""
+채널 맨 아래에 패널을 유지하는 '고정 패널' 재게시를 한 곳에서 관리하는 파일입니다.
+
+게임/거래가 끝날 때마다 패널을 삭제 후 다시 보내는 대신, 채널별 요청을 모아서
+일정 간격(기본 5초)마다 최대 한 번만 재게시하고, 그 사이 쌓인 로그 임베드는
+한 메시지(최대 10개씩)로 묶어서 보냅니다.
+"""
+import time
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+
+from utils.database import get_config, get_panel_id, save_panel_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPOST_INTERVAL = 5.0
+MIN_COALESCE_DELAY = 1.0
+MAX_EMBEDS_PER_MESSAGE = 10
+
+PanelBuilder = Callable[[], Awaitable[Optional[Tuple[discord.Embed, discord.ui.View]]]]
+PostedCallback = Callable[[discord.Message], Awaitable[None]]
+
+@dataclass
+class _PanelState:
+    channel: Optional[discord.abc.Messageable] = None
+    build_panel: Optional[PanelBuilder] = None
+    on_posted: Optional[PostedCallback] = None
+    cacheable: bool = True
+    force: bool = False
+    pending_logs: List[discord.Embed] = field(default_factory=list)
+    dirty: bool = False
+    last_posted: float = 0.0
+    task: Optional[asyncio.Task] = None
+
+class StickyPanelManager:
+    def __init__(self):
+        self._states: Dict[str, _PanelState] = {}
+        self._panel_cache: Dict[str, Tuple[discord.Embed, discord.ui.View]] = {}
+
+    @property
+    def repost_interval(self) -> float:
+        try: return float(get_config("GAME_CONFIG", {}).get("STICKY_PANEL_INTERVAL", DEFAULT_REPOST_INTERVAL))
+        except (TypeError, ValueError, AttributeError): return DEFAULT_REPOST_INTERVAL
+
+    def invalidate(self, panel_name: Optional[str] = None):
+        """캐시된 패널 임베드/View를 비웁니다. panel_name이 없으면 전체를 비웁니다."""
+        if panel_name is None: self._panel_cache.clear()
+        else: self._panel_cache.pop(panel_name, None)
+
+    async def request(
+        self, channel: discord.abc.Messageable, panel_name: str, build_panel: PanelBuilder,
+        log_embed: Optional[discord.Embed] = None, on_posted: Optional[PostedCallback] = None,
+        cacheable: bool = True, force: bool = False
+    ):
+        """
+        패널 재게시를 예약합니다. 같은 패널에 대한 요청은 하나로 합쳐지며,
+        panel_name은 save_panel_id/get_panel_id에 쓰이는 키와 같아야 합니다.
+        force=True이면 캐시를 무시하고 패널을 새로 만들어 반드시 다시 게시합니다.
+        """
+        state = self._states.setdefault(panel_name, _PanelState())
+        state.channel, state.build_panel, state.on_posted, state.cacheable = channel, build_panel, on_posted, cacheable
+        state.force = state.force or force
+        if log_embed: state.pending_logs.append(log_embed)
+        state.dirty = True
+        if not state.task or state.task.done():
+            state.task = asyncio.create_task(self._run(panel_name, state))
+
+    async def _run(self, panel_name: str, state: _PanelState):
+        while state.dirty:
+            delay = max(MIN_COALESCE_DELAY, state.last_posted + self.repost_interval - time.monotonic())
+            await asyncio.sleep(delay)
+            state.dirty = False
+            try:
+                await self._flush(panel_name, state)
+            except Exception as e:
+                logger.error(f"[고정 패널] '{panel_name}' 패널 재게시 중 오류: {e}", exc_info=True)
+            state.last_posted = time.monotonic()
+
+    async def _get_panel(self, panel_name: str, state: _PanelState) -> Optional[Tuple[discord.Embed, discord.ui.View]]:
+        if state.cacheable and (cached := self._panel_cache.get(panel_name)):
+            return cached
+        panel = await state.build_panel()
+        if panel and state.cacheable:
+            self._panel_cache[panel_name] = panel
+        return panel
+
+    async def _flush(self, panel_name: str, state: _PanelState):
+        channel = state.channel
+        logs, state.pending_logs = state.pending_logs, []
+        force, state.force = state.force, False
+        if force: self.invalidate(panel_name)
+        for i in range(0, len(logs), MAX_EMBEDS_PER_MESSAGE):
+            try: await channel.send(embeds=logs[i:i + MAX_EMBEDS_PER_MESSAGE])
+            except discord.HTTPException as e: logger.error(f"[고정 패널] '{panel_name}' 로그 메시지 전송 실패: {e}")
+
+        panel_info = get_panel_id(panel_name)
+        if not force and panel_info and panel_info['channel_id'] == channel.id and getattr(channel, 'last_message_id', None) == panel_info['message_id']:
+            # 패널이 이미 채널의 마지막 메시지라면 다시 보낼 필요가 없습니다.
+            return
+
+        panel = await self._get_panel(panel_name, state)
+        if not panel:
+            logger.error(f"[고정 패널] '{panel_name}' 패널의 임베드를 만들 수 없어 재게시를 건너뜁니다.")
+            return
+        embed, view = panel
+
+        if panel_info and (old_channel := channel if panel_info['channel_id'] == channel.id else channel.guild.get_channel(panel_info['channel_id'])):
+            try: await old_channel.get_partial_message(panel_info['message_id']).delete()
+            except (discord.NotFound, discord.Forbidden): pass
+            except discord.HTTPException as e: logger.warning(f"[고정 패널] 이전 '{panel_name}' 패널 삭제 실패: {e}")
+
+        new_message = await channel.send(embed=embed, view=view)
+        await save_panel_id(panel_name, new_message.id, channel.id)
+        if state.on_posted:
+            result = state.on_posted(new_message)
+            if inspect.isawaitable(result): await result
+
+sticky_panels = StickyPanelManager()
@@ -0,0 +1,100 @@
+# game-bot/utils/user_locks.py
+"""
+유저(또는 농장/스레드 등 임의의 키)별 상호작용을 직렬화하는 공용 Lock 관리자입니다.
+
+- 키마다 Lock을 하나 두고, 그 키를 쓰는 작업(대기 포함)이 하나도 남지 않으면 바로 제거합니다.
+  Cog마다 dict에 setdefault로 쌓아 두던 방식과 달리, 메모리는 동시에 진행 중인 작업 수만큼만 사용합니다.
+- 빠른 연속 클릭은 is_busy()로 즉시 거절하고, 꼭 끝나야 하는 작업은 hold()로 제한 시간까지 기다립니다.
+- 여러 유저가 함께 쓰는 작업(거래 등)은 hold_many()로 키 순서를 고정해 교착을 막습니다.
+- 획득/경합/거절/시간 초과 횟수와 최대 대기·점유 시간을 stats()로 확인할 수 있습니다.
+"""
+import time
+import asyncio
+import logging
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCK_TIMEOUT = 15.0
+BUSY_MESSAGE = "⏳ 이전 작업을 처리 중입니다. 잠시만 기다려주세요."
+SLOW_HOLD_WARNING_SECONDS = 20.0
+
+class LockTimeoutError(asyncio.TimeoutError):
+    """제한 시간 안에 Lock을 얻지 못했을 때 발생합니다."""
+    def __init__(self, key: Hashable, timeout: float):
+        super().__init__(f"'{key}' Lock을 {timeout:.1f}초 안에 얻지 못했습니다.")
+        self.key = key
+
+class _LockEntry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+class KeyedLockManager:
+    def __init__(self, name: str, default_timeout: float = DEFAULT_LOCK_TIMEOUT):
+        self.name = name
+        self.default_timeout = default_timeout
+        self._entries: Dict[Hashable, _LockEntry] = {}
+        self._stats = {"acquired": 0, "contended": 0, "rejected": 0, "timeouts": 0, "peak_keys": 0}
+        self._max_wait = 0.0
+        self._max_hold = 0.0
+
+    def locked(self, key: Hashable) -> bool:
+        return (entry := self._entries.get(key)) is not None and entry.lock.locked()
+
+    def is_busy(self, key: Hashable) -> bool:
+        """키가 이미 사용 중인지 확인합니다. 사용 중이면 거절로 집계되므로, 호출한 쪽은 작업을 중단해야 합니다."""
+        if busy := self.locked(key): self._stats["rejected"] += 1
+        return busy
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """키의 Lock을 잡고 있는 동안 블록을 실행합니다. 제한 시간을 넘기면 LockTimeoutError가 발생합니다."""
+        timeout = self.default_timeout if timeout is None else timeout
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _LockEntry()
+            self._stats["peak_keys"] = max(self._stats["peak_keys"], len(self._entries))
+        entry.users += 1
+        try:
+            started = time.monotonic()
+            if entry.lock.locked(): self._stats["contended"] += 1
+            try: await asyncio.wait_for(entry.lock.acquire(), timeout)
+            except asyncio.TimeoutError:
+                self._stats["timeouts"] += 1
+                logger.warning(f"[{self.name} Lock] '{key}' 대기 시간 초과 ({timeout:.1f}초)")
+                raise LockTimeoutError(key, timeout) from None
+            acquired_at = time.monotonic()
+            self._stats["acquired"] += 1
+            self._max_wait = max(self._max_wait, acquired_at - started)
+            try: yield
+            finally:
+                entry.lock.release()
+                held = time.monotonic() - acquired_at
+                self._max_hold = max(self._max_hold, held)
+                if held > SLOW_HOLD_WARNING_SECONDS:
+                    logger.warning(f"[{self.name} Lock] '{key}'를 {held:.1f}초 동안 점유했습니다.")
+        finally:
+            entry.users -= 1
+            if entry.users == 0 and self._entries.get(key) is entry:
+                del self._entries[key]
+
+    @asynccontextmanager
+    async def hold_many(self, keys: Iterable[Hashable], timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """여러 키를 항상 같은 순서로 잡습니다. (예: 거래 당사자 두 명)"""
+        ordered = sorted(set(keys), key=repr)
+        async with AsyncExitStack() as stack:
+            for key in ordered:
+                await stack.enter_async_context(self.hold(key, timeout))
+            yield
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats, "active_keys": len(self._entries),
+            "max_wait_ms": round(self._max_wait * 1000, 1), "max_hold_ms": round(self._max_hold * 1000, 1),
+        }
+
+user_locks = KeyedLockManager("user")